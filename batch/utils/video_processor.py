@@ -1,10 +1,17 @@
 import os, sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
-from core import step2_whisper, step1_ytdlp, step3_1_spacy_split, step3_2_splitbymeaning
-from core import step4_1_summarize, step4_2_translate_all, step5_splitforsub, step6_generate_final_timeline 
-from core import step7_merge_sub_to_vid, step8_gen_audio_task, step9_uvr_audio, step10_gen_audio, step11_merge_audio_to_vid
+from core.lazy_import import lazy_module
+# Each step module is imported when the first video reaches it
+step1_ytdlp, step2_whisper = lazy_module('core.step1_ytdlp'), lazy_module('core.step2_whisper')
+step3_1_spacy_split, step3_2_splitbymeaning = lazy_module('core.step3_1_spacy_split'), lazy_module('core.step3_2_splitbymeaning')
+step4_1_summarize, step4_2_translate_all = lazy_module('core.step4_1_summarize'), lazy_module('core.step4_2_translate_all')
+step5_splitforsub, step6_generate_final_timeline = lazy_module('core.step5_splitforsub'), lazy_module('core.step6_generate_final_timeline')
+step7_merge_sub_to_vid, step8_gen_audio_task = lazy_module('core.step7_merge_sub_to_vid'), lazy_module('core.step8_gen_audio_task')
+step9_uvr_audio, step10_gen_audio = lazy_module('core.step9_uvr_audio'), lazy_module('core.step10_gen_audio')
+step11_merge_audio_to_vid = lazy_module('core.step11_merge_audio_to_vid')
 from core.onekeycleanup import cleanup
 from core.config_utils import load_key
+from core import telemetry
 import shutil
 from functools import partial
 
@@ -16,8 +23,10 @@ def process_video(file, dubbing=False):
         ("Splitting sentences", split_sentences),
         ("Summarizing and translating", summarize_and_translate),
         ("Processing and aligning subtitles", process_and_align_subtitles),
-        ("Merging subtitles to video", step7_merge_sub_to_vid.merge_subtitles_to_video),
     ]
+    # With single pass render, step11 burns in the subtitles together with the audio mix
+    if not (dubbing and load_key("single_pass_render.enabled")):
+        steps.append(("Merging subtitles to video", step7_merge_sub_to_vid.merge_subtitles_to_video))
     
     if dubbing:
         steps.extend([
@@ -27,13 +36,15 @@ def process_video(file, dubbing=False):
             ("Merging generated audio with video", step11_merge_audio_to_vid.merge_main),
         ])
     
+    telemetry.start_trace()
     current_step = ""
     for step_name, step_func in steps:
         current_step = step_name
         for attempt in range(3):
             try:
                 print(f"Executing: {step_name}...")
-                result = step_func()
+                with telemetry.span(step_name, attempt=attempt + 1):
+                    result = step_func()
                 if result is not None:
                     globals().update(result)
                 break
@@ -41,11 +52,13 @@ def process_video(file, dubbing=False):
                 if attempt == 2:
                     error_message = f"Error in step '{current_step}': {str(e)}"
                     print(error_message)
+                    telemetry.finish_trace()
                     cleanup("batch/output/ERROR")
                     return False, current_step, error_message
                 print(f"Attempt {attempt + 1} failed. Retrying...")
     
     print("All steps completed successfully!")
+    telemetry.finish_trace()
     cleanup("batch/output")
     return True, "", ""
 
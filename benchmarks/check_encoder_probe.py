@@ -0,0 +1,140 @@
+"""Check encoder probing and selection against a fake ffmpeg, no real ffmpeg or GPU needed.
+
+    python benchmarks/check_encoder_probe.py
+
+A fake `ffmpeg` script is put first on PATH. It lists a fixed set of encoders for `-encoders`,
+lets only some of the hardware ones encode the test frame, and logs every call. Checks:
+1. probe_capabilities keeps software encoders without a test encode, test-encodes the hardware
+   ones (vaapi with its device) and drops those that fail.
+2. The result is cached by the binary's sha256: a second probe runs no ffmpeg, a changed binary
+   is probed again, and a missing binary gives no encoders.
+3. select_encoder picks per profile in KNOWN_ENCODERS order, software only for 'archive', and
+   falls back to libx264.
+Prints one JSON report; the exit code is 1 if a check failed.
+"""
+import os, sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+import json
+import shutil
+import tempfile
+from core.encoder_probe import probe_capabilities, select_encoder
+
+LISTED = ['libx264', 'libx265', 'libsvtav1', 'h264_nvenc', 'h264_qsv', 'hevc_vaapi']
+WORKING = ['h264_nvenc', 'hevc_vaapi']
+
+FAKE_FFMPEG = '''#!{python}
+# version {version}
+import sys, json
+with open({log!r}, 'a') as f:
+    f.write(json.dumps(sys.argv[1:]) + '\\n')
+if '-encoders' in sys.argv:
+    print('Encoders:')
+    print(' V..... = Video')
+    print(' ------')
+    for name in {listed!r}:
+        print(f' V....D {{name:<20}} fake encoder')
+    print(' A....D aac                  fake audio encoder')
+    sys.exit(0)
+encoder = sys.argv[sys.argv.index('-c:v') + 1]
+sys.exit(0 if encoder in {working!r} else 1)
+'''
+
+def write_fake(folder, log, version=1):
+    path = os.path.join(folder, 'ffmpeg')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(FAKE_FFMPEG.format(python=sys.executable, version=version, log=log, listed=LISTED, working=WORKING))
+    os.chmod(path, 0o755)
+    return path
+
+def read_calls(log):
+    if not os.path.exists(log):
+        return []
+    with open(log, 'r', encoding='utf-8') as f:
+        calls = [json.loads(line) for line in f]
+    os.remove(log)
+    return calls
+
+def check_probe(folder):
+    failures, report = [], {}
+    log, cache = os.path.join(folder, 'calls.jsonl'), os.path.join(folder, 'cache', 'encoder_capabilities.json')
+    write_fake(folder, log)
+    os.environ['PATH'] = folder + os.pathsep + os.environ.get('PATH', '')
+
+    encoders = probe_capabilities(cache_path=cache)
+    calls = read_calls(log)
+    tested = sorted(c[c.index('-c:v') + 1] for c in calls if '-c:v' in c)
+    report['first probe'] = {'encoders': encoders, 'test encodes': tested}
+    if encoders != ['h264_nvenc', 'hevc_vaapi', 'libsvtav1', 'libx264', 'libx265']:
+        failures.append(f"probe: {encoders}")
+    if tested != ['h264_nvenc', 'h264_qsv', 'hevc_vaapi']:
+        failures.append(f"test encodes: {tested}")
+    if not any('-vaapi_device' in c and 'hevc_vaapi' in c for c in calls):
+        failures.append("vaapi was tested without its device")
+
+    again = probe_capabilities(cache_path=cache)
+    if again != encoders or read_calls(log):
+        failures.append(f"second probe ran ffmpeg or changed: {again}")
+
+    write_fake(folder, log, version=2)
+    probe_capabilities(cache_path=cache)
+    if not read_calls(log):
+        failures.append("a changed ffmpeg binary was not probed again")
+    with open(cache, 'r', encoding='utf-8') as f:
+        report['cache entries'] = len(json.load(f))
+    if report['cache entries'] != 2:
+        failures.append(f"cache holds {report['cache entries']} binaries, expected 2")
+
+    missing = probe_capabilities(os.path.join(folder, 'no-such-ffmpeg'), cache_path=cache)
+    if missing != []:
+        failures.append(f"missing binary gave {missing}")
+    return failures, report
+
+SELECTIONS = [
+    # profile, capabilities, expected encoder
+    ('balanced', {'h264_nvenc', 'h264_qsv', 'libx264'}, 'h264_nvenc'),
+    ('balanced', {'h264_vaapi', 'libx264'}, 'h264_vaapi'),
+    ('balanced', set(), 'libx264'),
+    ('fast-preview', {'h264_videotoolbox', 'h264_vaapi'}, 'h264_videotoolbox'),
+    ('archive', {'hevc_nvenc', 'libx265', 'libsvtav1'}, 'libx265'),
+    ('archive', {'av1_nvenc', 'libsvtav1', 'libx264'}, 'libsvtav1'),
+    ('archive', {'hevc_nvenc'}, 'libx264'),
+]
+
+def check_selection():
+    failures, report = [], {}
+    for profile, capabilities, expected in SELECTIONS:
+        choice = select_encoder(profile, capabilities)
+        report[f"{profile} {sorted(capabilities)}"] = choice['encoder']
+        if choice['encoder'] != expected:
+            failures.append(f"{profile} with {sorted(capabilities)}: {choice['encoder']}, expected {expected}")
+        if choice['hardware'] != (expected not in ('libx264', 'libx265', 'libsvtav1')):
+            failures.append(f"{profile}: hardware flag {choice['hardware']} for {choice['encoder']}")
+    vaapi = select_encoder('balanced', {'h264_vaapi'})
+    if not vaapi['input_args'] or 'hwupload' not in vaapi['vf_suffix']:
+        failures.append(f"vaapi choice without device or hwupload: {vaapi}")
+    preview = select_encoder('fast-preview', {'libx264'})
+    if preview['scale'] != 0.5 or preview['params'][preview['params'].index('-preset') + 1] != 'ultrafast':
+        failures.append(f"fast-preview: {preview}")
+    try:
+        select_encoder('no-such-profile', set())
+        failures.append("unknown profile was accepted")
+    except ValueError:
+        pass
+    return failures, report
+
+def main():
+    folder = tempfile.mkdtemp(prefix='videolingo_encoder_probe_')
+    path = os.environ.get('PATH', '')
+    try:
+        failures, probe_report = check_probe(folder)
+    finally:
+        os.environ['PATH'] = path
+        shutil.rmtree(folder, ignore_errors=True)
+    selection_failures, selection_report = check_selection()
+    failures += selection_failures
+    print(json.dumps({'probe': probe_report, 'selection': selection_report, 'failures': failures}, indent=2))
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Check the UVR5 music detector and the per-window skip/light/full routing on synthetic audio.
+
+    python benchmarks/check_music_detector.py
+
+1. analyze() on generated signals: a tone mix is music ("full"), syllable-gated noise and the
+   harmonic speech surrogate are speech ("skip"), speech over hiss is "light", silence is "skip".
+2. SeparationPipeline with stand-in separators (no UVR5 weights needed): each decision runs
+   the right stages, and a full run() over a speech file and a music file writes the speech
+   through untouched and sends the music through both nets.
+Prints one JSON report; the exit code is 1 if a check failed.
+"""
+import os, sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+import json
+import shutil
+import tempfile
+import numpy as np
+import soundfile as sf
+from benchmarks.synthetic import tone_speech
+from third_party.uvr5.music_detector import analyze
+from third_party.uvr5.lib.lib_v5.model_param_init import ModelParameters
+from third_party.uvr5 import uvr5_for_videolingo
+from third_party.uvr5.uvr5_for_videolingo import SeparationPipeline
+
+SR = 44100
+SECONDS = 20
+MODEL_PARAMS = os.path.join(ROOT, 'third_party', 'uvr5', 'lib', 'lib_v5', 'modelparams', '4band_v2.json')
+
+def signals(seconds=SECONDS, sr=SR):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    gate = (np.sin(2 * np.pi * 4 * t) > 0.2) * (np.sin(2 * np.pi * 0.3 * t) > -0.7)
+    tones = 0.08 * sum(np.sin(2 * np.pi * f * t) for f in (220, 277.2, 329.6, 440))
+    noise_speech = 0.2 * gate * rng.standard_normal(len(t)) + 0.0005 * rng.standard_normal(len(t))
+    speech = tone_speech(seconds, sr)
+    hiss = 0.05 * rng.standard_normal(len(t))
+    return {
+        'tone mix': (tones * 3, 'full'),
+        'modulated noise': (noise_speech, 'skip'),
+        'speech': (speech, 'skip'),
+        'speech + tone mix': (speech + tones, 'full'),
+        'speech + hiss': (speech + hiss, 'light'),
+        'silence': (1e-5 * rng.standard_normal(len(t)), 'skip'),
+    }
+
+def stereo(signal):
+    return np.stack([signal, signal]).astype(np.float32)
+
+class StandIn:
+    """Separator with the interface of AudioPre/AudioPreDeEcho that splits a wave in half"""
+
+    def __init__(self):
+        self.mp = ModelParameters(MODEL_PARAMS)
+        self.calls = 0
+
+    def separate(self, wave):
+        self.calls += 1
+        return wave * 0.5, wave * 0.5
+
+def stand_in_pipeline():
+    pipeline = SeparationPipeline.__new__(SeparationPipeline)
+    pipeline.device, pipeline.detect_music = None, True
+    pipeline.decisions, pipeline.windows = [], []
+    pipeline.processed = {"separate": 0.0, "deecho": 0.0}
+    pipeline.ap, pipeline.ap_deecho = StandIn(), StandIn()
+    pipeline.timings = {"load": 0.0}
+    return pipeline
+
+def check_stages(cases):
+    """Each decision runs the stages it promises"""
+    failures = []
+    expected_calls = {'skip': (0, 0), 'light': (1, 0), 'full': (1, 1)}
+    for name, (signal, _) in cases.items():
+        pipeline = stand_in_pipeline()
+        wave = stereo(signal)
+        info, _ = detected = pipeline.detect(wave)
+        vocal, background = pipeline.deecho(pipeline.separate_vocals(detected))
+        calls = (pipeline.ap.calls, pipeline.ap_deecho.calls)
+        if calls != expected_calls[info['decision']]:
+            failures.append(f"{name}: {info['decision']} ran (separate, deecho) {calls} times")
+        if info['decision'] == 'skip' and (not np.array_equal(vocal, wave) or np.any(background)):
+            failures.append(f"{name}: skipped window was not passed through as vocal")
+        if not np.allclose(vocal + background, wave, atol=1e-6):
+            failures.append(f"{name}: vocal + background does not add up to the input")
+    return failures
+
+def check_run(cases, workspace):
+    """A whole run() per file, through the streaming engine"""
+    failures, report = [], {}
+    for name, expected in (('speech', 'skip'), ('tone mix', 'full')):
+        source = os.path.join(workspace, 'source.wav')
+        vocal_file, background_file = os.path.join(workspace, 'vocal.wav'), os.path.join(workspace, 'background.wav')
+        sf.write(source, stereo(cases[name][0]).T, SR)
+        pipeline = stand_in_pipeline()
+        pipeline.run(source, vocal_file, background_file)
+        decisions = [w['decision'] for w in pipeline.windows]
+        vocal, background = sf.read(vocal_file)[0], sf.read(background_file)[0]
+        report[name] = {'windows': decisions, 'summary': pipeline.summary()}
+        if set(decisions) != {expected}:
+            failures.append(f"run on {name}: windows {decisions}, expected {expected}")
+        if expected == 'skip' and (pipeline.ap.calls or np.abs(background).max() > 1e-3):
+            failures.append(f"run on {name}: separation ran or background is not silent")
+        if expected == 'full' and (pipeline.ap_deecho.calls == 0 or np.abs(vocal).max() < 1e-3):
+            failures.append(f"run on {name}: de-echo did not run")
+    return failures, report
+
+def main():
+    cases = signals()
+    decisions = {name: analyze(stereo(signal), SR) for name, (signal, _) in cases.items()}
+    failures = [f"{name}: {decisions[name]['decision']}, expected {expected}"
+                for name, (_, expected) in cases.items() if decisions[name]['decision'] != expected]
+    failures += check_stages(cases)
+    workspace = tempfile.mkdtemp(prefix='videolingo_music_detector_')
+    try:
+        uvr5_for_videolingo.console.quiet = True
+        run_failures, runs = check_run(cases, workspace)
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+    failures += run_failures
+    print(json.dumps({'analyze': decisions, 'runs': runs, 'failures': failures}, indent=2))
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
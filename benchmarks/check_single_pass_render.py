@@ -0,0 +1,113 @@
+"""Check the single-pass subtitle + dubbed audio render (step 11) on a synthetic libx264 clip.
+
+    python benchmarks/check_single_pass_render.py
+
+The ffmpeg command is built by build_single_pass_cmd and checked as a graph first: four inputs,
+both subtitle burn-ins, the three-way amix, one video encode, and the tee outputs with and
+without keep_intermediate and with a silent source. If ffmpeg is installed, the command is then
+run on a short synthetic clip (with and without an audio track) and the outputs are probed for
+their streams, resolution and duration. Prints one JSON report; the exit code is 1 if a check failed.
+"""
+import os, sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+import json
+import shutil
+import tempfile
+import subprocess
+from benchmarks.synthetic import make_test_video, write_tone_speech
+from core.encoder_probe import select_encoder
+from core.step11_merge_audio_to_vid import build_single_pass_cmd
+
+SECONDS = 4
+RESOLUTION = '320x180'
+SRT = "1\n00:00:00,500 --> 00:00:02,000\nHello there\n\n2\n00:00:02,500 --> 00:00:03,500\nSecond line\n"
+
+def build(choice, intermediate_video=None, source_audio=True):
+    return build_single_pass_cmd(
+        'source.mp4', 'src.srt', 'trans.srt', 'background.wav', 'vocal.wav', 'dub.wav', 'out.mp4',
+        RESOLUTION, 0.1, 1.5, choice, intermediate_video, source_audio)
+
+def check_graph(choice):
+    """Structure of the command, without running it"""
+    failures = []
+    cmd = build(choice)
+    graph = cmd[cmd.index('-filter_complex') + 1].decode('utf-8')
+    inputs = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == '-i']
+    maps = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == '-map']
+    if inputs != ['source.mp4', 'background.wav', 'vocal.wav', 'dub.wav']:
+        failures.append(f"inputs: {inputs}")
+    if graph.count('subtitles=') != 2 or 'amix=inputs=3' not in graph or not graph.startswith('[0:v]'):
+        failures.append(f"filter graph: {graph}")
+    if maps != ['[v]', '[a]'] or cmd.count('-c:v') != 1 or cmd[-1] != 'out.mp4':
+        failures.append(f"outputs: {cmd}")
+
+    tee = build(choice, 'subs.mp4')
+    tee_maps = [tee[i + 1] for i, arg in enumerate(tee) if arg == '-map']
+    if tee_maps != ['[v]', '[a]', '0:a:0'] or "v:0,a:1" not in tee[-1] or tee[-2] != 'tee':
+        failures.append(f"keep_intermediate: {tee}")
+
+    silent = build(choice, 'subs.mp4', source_audio=False)
+    if '0:a:0' in silent or "a:1" in silent[-1]:
+        failures.append(f"keep_intermediate without source audio: {silent}")
+    return failures
+
+def probe(path):
+    result = subprocess.run(['ffprobe', '-v', 'error', '-show_format', '-show_streams', '-of', 'json', path],
+                            capture_output=True, text=True, check=True)
+    info = json.loads(result.stdout)
+    return {
+        'duration': float(info['format']['duration']),
+        'codecs': [s['codec_type'] + ':' + s['codec_name'] for s in info['streams']],
+        'size': next((f"{s['width']}x{s['height']}" for s in info['streams'] if s['codec_type'] == 'video'), None),
+    }
+
+def check_render(choice, source_audio):
+    """Run the command on a synthetic clip and probe the results"""
+    failures = []
+    make_test_video('source.mp4', SECONDS, size=RESOLUTION)
+    if not source_audio:
+        subprocess.run(['ffmpeg', '-v', 'error', '-y', '-i', 'source.mp4', '-an', '-c', 'copy', 'silent.mp4'], check=True)
+        os.replace('silent.mp4', 'source.mp4')
+    for name, seed in (('background.wav', 1), ('vocal.wav', 2), ('dub.wav', 3)):
+        write_tone_speech(name, SECONDS, seed=seed)
+    for name in ('src.srt', 'trans.srt'):
+        with open(name, 'w', encoding='utf-8') as f:
+            f.write(SRT)
+    result = subprocess.run(build(choice, 'subs.mp4', source_audio), capture_output=True, text=True)
+    if result.returncode != 0:
+        return [f"ffmpeg failed (source_audio={source_audio}): {result.stderr.strip()[-500:]}"], {}
+    out, subs = probe('out.mp4'), probe('subs.mp4')
+    expected_subs = ['video:h264', 'audio:aac'] if source_audio else ['video:h264']
+    if out['codecs'] != ['video:h264', 'audio:aac'] or out['size'] != RESOLUTION:
+        failures.append(f"out.mp4: {out}")
+    if subs['codecs'] != expected_subs:
+        failures.append(f"subs.mp4: {subs}")
+    if abs(out['duration'] - SECONDS) > 0.5:
+        failures.append(f"out.mp4 lasts {out['duration']:.2f}s, expected {SECONDS}s")
+    return failures, {'out': out, 'subs': subs}
+
+def main():
+    choice = select_encoder('balanced', capabilities={'libx264'})
+    report = {'encoder': choice['encoder'], 'graph': check_graph(choice), 'render': {}}
+    failures = list(report['graph'])
+    if shutil.which('ffmpeg') and shutil.which('ffprobe'):
+        cwd = os.getcwd()
+        for source_audio in (True, False):
+            workspace = tempfile.mkdtemp(prefix='videolingo_single_pass_')
+            os.chdir(workspace)
+            try:
+                render_failures, probes = check_render(choice, source_audio)
+            finally:
+                os.chdir(cwd)
+                shutil.rmtree(workspace, ignore_errors=True)
+            report['render'][f"source_audio={source_audio}"] = probes
+            failures += render_failures
+    else:
+        report['render'] = 'skipped: ffmpeg not installed'
+    report['failures'] = failures
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Check that the threaded UVR5 spectrogram functions match the serial ones.
+
+    python benchmarks/check_uvr5_spec_parity.py
+    python benchmarks/check_uvr5_spec_parity.py --seconds 20 --tolerance 1e-5
+
+On random stereo input, for the band layouts of the shipped VR models, compares:
+- wave_to_spectrogram_mt with wave_to_spectrogram,
+- wave_to_spectrogram_bands with the serial resample + STFT chain it replaced,
+- spectrogram_to_wave_mt with spectrogram_to_wave,
+- cmb_spectrogram_to_wave_mt with cmb_spectrogram_to_wave,
+and runs the threaded ones from several threads at once, since they share one pool. Errors are
+the max abs difference relative to the max abs value of the serial output. Prints one JSON
+report; the exit code is 1 if any error exceeds --tolerance.
+"""
+import os, sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'third_party', 'uvr5'))
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import librosa
+from lib.lib_v5 import spec_utils
+from lib.lib_v5.model_param_init import ModelParameters
+
+MODEL_PARAMS = ['4band_v2.json', '4band_v3.json', '1band_sr44100_hl512.json']
+
+def serial_bands(wave, mp):
+    """The per-band loop of the VR separators before wave_to_spectrogram_bands"""
+    waves, specs = {}, {}
+    bands_n = len(mp.param["band"])
+    for d in range(bands_n, 0, -1):
+        bp = mp.param["band"][d]
+        if d == bands_n:
+            waves[d] = wave
+        else:
+            waves[d] = librosa.core.resample(
+                waves[d + 1], orig_sr=mp.param["band"][d + 1]["sr"], target_sr=bp["sr"], res_type=bp["res_type"])
+        specs[d] = spec_utils.wave_to_spectrogram(
+            waves[d], bp["hl"], bp["n_fft"], mp.param["mid_side"], mp.param["mid_side_b2"], mp.param["reverse"])
+    return specs
+
+def relative_error(actual, expected):
+    if actual.shape != expected.shape:
+        return float('inf')
+    return float(np.max(np.abs(actual - expected)) / max(np.max(np.abs(expected)), 1e-12))
+
+def check(mp, wave):
+    """{function: relative error} for one band layout"""
+    bp = mp.param["band"][len(mp.param["band"])]
+    flags = (mp.param["mid_side"], mp.param["mid_side_b2"], mp.param["reverse"])
+    errors = {}
+
+    spec = spec_utils.wave_to_spectrogram(wave, bp["hl"], bp["n_fft"], *flags)
+    errors['wave_to_spectrogram_mt'] = relative_error(spec_utils.wave_to_spectrogram_mt(wave, bp["hl"], bp["n_fft"], *flags), spec)
+
+    serial = serial_bands(wave, mp)
+    threaded = spec_utils.wave_to_spectrogram_bands(wave, mp)
+    errors['wave_to_spectrogram_bands'] = max(relative_error(threaded[d], serial[d]) for d in serial)
+
+    mid_side, mid_side_b2, reverse = flags
+    expected = spec_utils.spectrogram_to_wave(spec, bp["hl"], mid_side, mid_side_b2, reverse)
+    # The _mt variant takes (mid_side, reverse, mid_side_b2), as upstream
+    errors['spectrogram_to_wave_mt'] = relative_error(
+        spec_utils.spectrogram_to_wave_mt(spec, bp["hl"], mid_side, reverse, mid_side_b2), expected)
+
+    spec_m = spec_utils.combine_spectrograms(serial, mp)
+    expected = spec_utils.cmb_spectrogram_to_wave(spec_m, mp)
+    errors['cmb_spectrogram_to_wave_mt'] = relative_error(spec_utils.cmb_spectrogram_to_wave_mt(spec_m, mp), expected)
+
+    # The same calls from several threads at once must still give the serial results
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: spec_utils.cmb_spectrogram_to_wave_mt(spec_m, mp), range(4)))
+    errors['cmb_spectrogram_to_wave_mt concurrent'] = max(relative_error(r, expected) for r in results)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: spec_utils.wave_to_spectrogram_bands(wave, mp), range(4)))
+    errors['wave_to_spectrogram_bands concurrent'] = max(relative_error(r[d], serial[d]) for r in results for d in serial)
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Threaded vs serial UVR5 STFT/iSTFT parity")
+    parser.add_argument('--seconds', type=float, default=5.0, help="length of the random stereo input")
+    parser.add_argument('--tolerance', type=float, default=1e-5, help="allowed relative max abs difference")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    report, failures = {}, []
+    for name in MODEL_PARAMS:
+        mp = ModelParameters(os.path.join(ROOT, 'third_party', 'uvr5', 'lib', 'lib_v5', 'modelparams', name))
+        n = int(args.seconds * mp.param["sr"])
+        wave = np.asfortranarray(rng.uniform(-0.5, 0.5, (2, n)).astype(np.float32))
+        errors = check(mp, wave)
+        report[name] = {fn: float(f"{error:.3g}") for fn, error in errors.items()}
+        failures += [f"{name} {fn}: {error:.3g}" for fn, error in errors.items() if not error <= args.tolerance]
+    print(json.dumps({'tolerance': args.tolerance, 'errors': report, 'failures': failures}, indent=2))
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import io
+import re
+import json
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import soundfile as sf
+from benchmarks.synthetic import tone_speech
+
+# ------------
+# Fake LLM: answers the pipeline's prompts deterministically, speaking the ollama /api/chat protocol
+# ------------
+
+def fake_translation(text):
+    """One CJK character per source word, picked by hash, so the output is stable and has a realistic length"""
+    out = []
+    for word in text.split():
+        digest = hashlib.md5(word.strip('.,!?').lower().encode('utf-8')).digest()
+        out.append(chr(0x4e00 + int.from_bytes(digest[:2], 'big') % 0x5000))
+        if word[-1] in ',.!?':
+            out.append({',': '，', '.': '。', '!': '！', '?': '？'}[word[-1]])
+    return ''.join(out)
+
+def split_evenly(items, num_parts):
+    size, rest = divmod(len(items), num_parts)
+    parts, start = [], 0
+    for i in range(num_parts):
+        end = start + size + (1 if i < rest else 0)
+        parts.append(items[start:end])
+        start = end
+    return parts
+
+def _last_json(prompt):
+    """The JSON template that ends the translation prompts"""
+    return json.loads(prompt[prompt.rindex('\n{\n') + 1:])
+
+def answer(prompt):
+    if '<video_text_to_summarize>' in prompt:
+        text = prompt.split('<video_text_to_summarize>')[1].split('</video_text_to_summarize>')[0]
+        names = sorted(set(re.findall(r'(?<!^)(?<![.] )\b[A-Z][a-z]+', text)))[:5]
+        return {"theme": "A synthetic benchmark video.",
+                "terms": [{"original": n, "translation": fake_translation(n), "explanation": "name"} for n in names]}
+    if '<split_this_sentence>' in prompt:
+        sentence = prompt.split('<split_this_sentence>')[1].split('</split_this_sentence>')[0].strip()
+        words = sentence.split()
+        mid = max(1, len(words) // 2)
+        split = ' '.join(words[:mid]) + '[br]' + ' '.join(words[mid:])
+        return {"analysis": "", "split_1": split, "split_2": split, "eval": "", "best": "1", "verification": ""}
+    if '"reflection"' in prompt:
+        return {k: {**v, "reflection": "ok", "free": v['direct']} for k, v in _last_json(prompt).items()}
+    if '"direct"' in prompt and '<subtitles>' in prompt:
+        return {k: {"origin": v['origin'], "direct": fake_translation(v['origin'])} for k, v in _last_json(prompt).items()}
+    if '"align_1"' in prompt:
+        tr_sub = re.search(r'Original: "(.*)"\nPre-processed', prompt, re.S).group(1).rsplit('Original: "', 1)[-1]
+        src_part = re.search(r'\(\[br\] indicates split points\): (.*)\n</subtitles>', prompt).group(1)
+        src_parts = [p.strip() for p in src_part.split('[br]')]
+        tr_parts = [''.join(p) for p in split_evenly(list(tr_sub), len(src_parts))]
+        align = [{f"src_part_{i + 1}": s, f"target_part_{i + 1}": t or tr_sub[-1:]} for i, (s, t) in enumerate(zip(src_parts, tr_parts))]
+        return {"analysis": "", "align_1": align, "align_2": align, "comparison": "", "best": "1"}
+    if '"trans_text_processed"' in prompt:
+        text = re.search(r'Subtitle: "(.*)"\nDuration', prompt, re.S).group(1)
+        return {"analysis": "", "trans_text_processed": text[:max(1, int(len(text) * 0.8))]}
+    return {"status": 200}
+
+class FakeLLM:
+    """Local ollama-compatible server (/api/chat, /api/generate, /api/show, /api/ps). `latency`
+    seconds (plus `per_token` per output token) are slept per call, at most `parallel` calls at
+    a time like OLLAMA_NUM_PARALLEL; calls and tokens are counted for the benchmark report.
+
+    Prefix reuse is counted like a server with `slots` KV caches would see it: each prompt is
+    matched against the last `slots` prompts and the longest common prefix counts as reused.
+    The num_ctx and keep_alive values clients send are recorded as well."""
+
+    def __init__(self, latency=0.0, per_token=0.0, port=0, slots=4, parallel=8, context_length=32768):
+        self.latency, self.per_token, self.slots = latency, per_token, slots
+        self.context_length = context_length
+        self.calls = self.tokens_in = self.tokens_out = self.probe_calls = 0
+        self.prompt_chars = self.prefix_chars_reused = 0
+        self.recent = []
+        self.num_ctx, self.keep_alive = set(), set()
+        self.lock = threading.Lock()
+        self.running = threading.Semaphore(parallel)
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == '/api/ps':
+                    self._send({"models": [{"name": "fake", "model": "fake", "size": 1 << 30, "size_vram": 0,
+                                            "context_length": max(fake.num_ctx, default=4096)}]})
+                else:
+                    self._send({"version": "0.0.0-fake"})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with fake.lock:
+                    if (body.get('options') or {}).get('num_ctx'):
+                        fake.num_ctx.add(body['options']['num_ctx'])
+                    if 'keep_alive' in body:
+                        fake.keep_alive.add(body['keep_alive'])
+                if self.path == '/api/show':
+                    return self._send({"model_info": {"fake.context_length": fake.context_length}, "details": {}})
+                if self.path == '/api/generate':
+                    # Model preload (empty prompt) or the parallel-slot probe
+                    if body.get('prompt'):
+                        with fake.running:
+                            time.sleep(fake.latency)
+                        with fake.lock:
+                            fake.probe_calls += 1
+                    return self._send({"model": body.get('model', 'fake'), "created_at": "1970-01-01T00:00:00Z",
+                                       "response": "OK" if body.get('prompt') else "", "done": True})
+                prompt = body['messages'][-1]['content']
+                content = json.dumps(answer(prompt), ensure_ascii=False)
+                tokens_in, tokens_out = len(prompt) // 4, len(content) // 4
+                with fake.lock:
+                    reused = max((len(os.path.commonprefix([prompt, p])) for p in fake.recent), default=0)
+                    fake.recent = ([prompt] + [p for p in fake.recent if p != prompt])[:fake.slots]
+                    fake.prompt_chars += len(prompt)
+                    fake.prefix_chars_reused += reused
+                    fake.calls += 1
+                    fake.tokens_in += tokens_in
+                    fake.tokens_out += tokens_out
+                eval_s = fake.latency + fake.per_token * tokens_out
+                with fake.running:
+                    time.sleep(eval_s)
+                self._send({
+                    "model": body.get('model', 'fake'), "created_at": "1970-01-01T00:00:00Z",
+                    "message": {"role": "assistant", "content": content}, "done": True,
+                    "prompt_eval_count": tokens_in, "eval_count": tokens_out, "eval_duration": int(eval_s * 1e9),
+                })
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+    def counters(self):
+        with self.lock:
+            return {'llm_calls': self.calls, 'llm_tokens_in': self.tokens_in, 'llm_tokens_out': self.tokens_out,
+                    'prompt_chars': self.prompt_chars, 'prefix_chars_reused': self.prefix_chars_reused}
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# ------------
+# Fake TTS: GPT-SoVITS api_v2 compatible (/ping, POST /tts) returning tone speech
+# ------------
+
+class FakeTTS:
+    """Answers /tts with a surrogate wav whose length follows the text (0.25s per CJK char or word)"""
+
+    def __init__(self, port=9880, latency=0.0, sr=32000):
+        self.latency, self.sr, self.calls = latency, sr, 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, data, content_type):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._send(b'ok', 'text/plain')
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                text = body.get('text', '')
+                units = len(text.split()) if ' ' in text.strip() else len(text)
+                buffer = io.BytesIO()
+                sf.write(buffer, tone_speech(max(0.5, 0.25 * units), fake.sr, seed=len(text)), fake.sr, format='WAV', subtype='PCM_16')
+                fake.calls += 1
+                time.sleep(fake.latency)
+                self._send(buffer.getvalue(), 'audio/wav')
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,129 @@
+"""Cold-start import time of the entry points, measured in fresh interpreters with -X importtime.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 5 --output imports.json
+    python benchmarks/import_time.py --budget ui=1.5 --budget batch=0.8
+
+Each target is imported --repeat times, each time in a new `python -X importtime` process; the
+median wall time is reported with the packages that took longest (self time summed per
+top-level package). Targets with a budget fail the run (exit code 1) when the median exceeds it.
+A target whose dependencies are not installed is reported as skipped.
+"""
+import os, sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+import re
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+
+# name -> (module, budget in seconds or None to only report)
+TARGETS = {
+    'ui': ('st_components.imports_and_utils', 1.5),  # everything st.py imports before the first paint, streamlit included
+    'batch': ('batch.utils.batch_processor', 0.8),
+    'batch_check': ('batch.utils.settings_check', 0.6),
+    'cli': ('core.cli', 0.1),
+    'step1': ('core.step1_ytdlp', None),
+    'step2': ('core.step2_whisper', None),
+    'step3_1': ('core.step3_1_spacy_split', None),
+    'step3_2': ('core.step3_2_splitbymeaning', None),
+    'step4_1': ('core.step4_1_summarize', None),
+    'step4_2': ('core.step4_2_translate_all', None),
+    'step5': ('core.step5_splitforsub', None),
+    'step6': ('core.step6_generate_final_timeline', None),
+    'step7': ('core.step7_merge_sub_to_vid', None),
+    'step8': ('core.step8_gen_audio_task', None),
+    'step9': ('core.step9_uvr_audio', None),
+    'step10': ('core.step10_gen_audio', None),
+    'step11': ('core.step11_merge_audio_to_vid', None),
+}
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+TIMER = "import time as _t; _s = _t.perf_counter(); import {module}; print('ELAPSED', _t.perf_counter() - _s)"
+
+def measure_once(module):
+    """(seconds, {top-level package: self seconds}) for one import of `module` in a new interpreter"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', TIMER.format(module=module)],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f'exit code {result.returncode}'
+        raise ImportError(error)
+    elapsed = float(re.search(r'ELAPSED (\S+)', result.stdout).group(1))
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        m = IMPORTTIME_LINE.match(line)
+        if m:
+            packages[m.group(4).split('.')[0]] += int(m.group(1)) / 1e6
+    return elapsed, packages
+
+def measure(name, module, budget, repeat, top):
+    try:
+        runs = [measure_once(module) for _ in range(repeat)]
+    except ImportError as e:
+        return {'target': name, 'module': module, 'status': 'skipped', 'reason': f'missing dependency: {e}'[:300]}
+    times = [elapsed for elapsed, _ in runs]
+    median_run = sorted(runs, key=lambda r: r[0])[len(runs) // 2]
+    heaviest = sorted(median_run[1].items(), key=lambda x: -x[1])[:top]
+    seconds = statistics.median(times)
+    result = {
+        'target': name, 'module': module, 'status': 'ok',
+        'seconds': round(seconds, 3), 'min_s': round(min(times), 3), 'max_s': round(max(times), 3),
+        'budget_s': budget, 'over_budget': budget is not None and seconds > budget,
+        'heaviest': {package: round(s, 3) for package, s in heaviest},
+    }
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="VideoLingo entry point import times")
+    parser.add_argument('targets', nargs='*', help=f"targets to measure (default: all): {', '.join(TARGETS)}")
+    parser.add_argument('--repeat', type=int, default=3, help="fresh interpreters per target, the median is reported")
+    parser.add_argument('--top', type=int, default=5, help="heaviest packages listed per target")
+    parser.add_argument('--budget', action='append', default=[], metavar='TARGET=SECONDS', help="override a target's budget")
+    parser.add_argument('--output', help="write the JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    budgets = {name: budget for name, (_, budget) in TARGETS.items()}
+    for item in args.budget:
+        name, _, seconds = item.partition('=')
+        if name not in TARGETS:
+            parser.error(f"unknown target '{name}'")
+        budgets[name] = float(seconds)
+
+    results = []
+    for name in args.targets or TARGETS:
+        if name not in TARGETS:
+            parser.error(f"unknown target '{name}'")
+        result = measure(name, TARGETS[name][0], budgets[name], args.repeat, args.top)
+        results.append(result)
+        print(json.dumps(result, ensure_ascii=False), file=sys.stderr)
+
+    report = {
+        'meta': {
+            'commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+            'repeat': args.repeat, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    over = [r for r in results if r.get('over_budget')]
+    for r in over:
+        print(f"OVER BUDGET {r['target']}: {r['seconds']:.2f}s > {r['budget_s']:.2f}s", file=sys.stderr)
+    sys.exit(1 if over else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""End-to-end check of the job server against the fake LLM, offline and on CPU.
+
+    python benchmarks/job_server_smoke.py
+    python benchmarks/job_server_smoke.py --jobs 4 --workers 2 --words 500
+
+Starts a job server on a free port with a temporary jobs_dir, submits --jobs jobs seeded with a
+synthetic transcript (steps 4.1-6, so no whisper or spaCy is needed), follows one of them over
+the event stream, cancels an extra one, and checks that every other job finished with
+trans_subtitles.srt among its artifacts. One more job measures the ollama slots
+(llm.parallel: 'auto'), which caches them in model_dir: the cache has to land in the model_dir
+of the server's config.yaml, not in the job folder. Prints one JSON report with the wall time and the
+highest number of jobs seen running at once; the exit code is 1 if a check failed.
+"""
+import os, sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import requests
+from benchmarks.synthetic import make_transcript, write_transcript
+from benchmarks.fake_services import FakeLLM
+from benchmarks.run_benchmarks import CONFIG_OVERRIDES, CANNED
+
+STEPS = ['step4_1', 'step4_2', 'step5', 'step6']
+
+def make_seed(folder, n_words):
+    """An output/ folder as it looks after step 3.2: transcript chunks and split sentences"""
+    cwd = os.getcwd()
+    os.makedirs(folder)
+    os.chdir(folder)
+    try:
+        df, sentences = make_transcript(n_words)
+        write_transcript(df, sentences)
+        shutil.copy(CANNED['step3_1'][0], CANNED['step3_2'][1])
+    finally:
+        os.chdir(cwd)
+    return os.path.join(folder, 'output')
+
+def make_project(folder):
+    """A config.yaml with the default relative model_dir, so the jobs' model_dir can be checked"""
+    os.makedirs(folder)
+    shutil.copy(os.path.join(ROOT, 'config.yaml'), os.path.join(folder, 'config.yaml'))
+    return os.path.join(folder, 'config.yaml')
+
+def check_model_dir(job, config_file):
+    """The job's config points at the server's model_dir, and the 'auto' slot count was cached there"""
+    from ruamel.yaml import YAML
+    yaml = YAML()
+    with open(config_file, 'r', encoding='utf-8') as f:
+        expected = os.path.normpath(os.path.join(os.path.dirname(config_file), yaml.load(f)['model_dir']))
+    with open(os.path.join(job['workspace'], 'config.yaml'), 'r', encoding='utf-8') as f:
+        model_dir = yaml.load(f)['model_dir']
+    failures = []
+    if model_dir != expected:
+        failures.append(f"job model_dir is {model_dir}, expected {expected}")
+    if not os.path.exists(os.path.join(expected, 'ollama_parallel.json')):
+        failures.append(f"llm.parallel 'auto' left no ollama_parallel.json in {expected}")
+    if os.path.exists(os.path.join(job['workspace'], '_model_cache')):
+        failures.append("the job created a model cache inside its own folder")
+    return failures
+
+def follow_events(url, job_id, seen):
+    """Read the job's server-sent events until the stream ends"""
+    with requests.get(f"{url}/jobs/{job_id}/events", params={'stream': 1}, stream=True, timeout=600) as response:
+        for line in response.iter_lines(decode_unicode=True):
+            if line and line.startswith('event: '):
+                seen.append(line[len('event: '):])
+
+def main():
+    parser = argparse.ArgumentParser(description="Job server end-to-end check")
+    parser.add_argument('--jobs', type=int, default=3, help="jobs that should finish")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--words', type=int, default=300, help="transcript size of each job")
+    parser.add_argument('--keep', action='store_true', help="keep the jobs_dir for inspection")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)  # the server reads config.yaml from its working directory and copies it into each job
+    llm = FakeLLM().start()
+    os.environ['OLLAMA_HOST'] = llm.url  # inherited by the job processes
+    from core.job_server import run_in_thread
+    tmp = tempfile.mkdtemp(prefix='videolingo_jobs_')
+    config_file = make_project(os.path.join(tmp, 'project'))
+    server, stop = run_in_thread(os.path.join(tmp, 'jobs'), args.workers, local_root=tmp, config_file=config_file)
+    url = f"http://127.0.0.1:{server.port}"
+    failures, max_running, streamed = [], 0, []
+    try:
+        seed = make_seed(os.path.join(tmp, 'seed'), args.words)
+        spec = {'seed': seed, 'steps': STEPS, 'config': CONFIG_OVERRIDES}
+        start = time.perf_counter()
+        jobs = [requests.post(f"{url}/jobs", json=spec).json()['id'] for _ in range(args.jobs)]
+        extra = requests.post(f"{url}/jobs", json=spec).json()['id']
+        probing = requests.post(f"{url}/jobs", json={**spec, 'config': {**CONFIG_OVERRIDES, 'llm.parallel': 'auto'}}).json()['id']
+        stream = threading.Thread(target=follow_events, args=(url, jobs[0], streamed), daemon=True)
+        stream.start()
+        cancelled = requests.post(f"{url}/jobs/{extra}/cancel").json()['status']
+        if cancelled != 'cancelled':
+            failures.append(f"cancel of a queued job gave status {cancelled}")
+
+        while True:
+            states = {job['id']: job for job in requests.get(f"{url}/jobs").json()['jobs']}
+            max_running = max(max_running, sum(job['status'] == 'running' for job in states.values()))
+            if all(states[job_id]['status'] in ('done', 'failed', 'cancelled') for job_id in jobs + [probing]):
+                break
+            time.sleep(0.2)
+        wall = time.perf_counter() - start
+        stream.join(timeout=30)
+
+        for job_id in jobs + [probing]:
+            job = states[job_id]
+            artifacts = [a['path'] for a in requests.get(f"{url}/jobs/{job_id}/artifacts").json()['artifacts']]
+            if job['status'] != 'done':
+                tail = requests.get(f"{url}/jobs/{job_id}/log", params={'tail': 20}).json()['lines']
+                failures.append(f"{job_id} {job['status']}: {job['error']}\n" + '\n'.join(tail))
+            elif 'trans_subtitles.srt' not in artifacts:
+                failures.append(f"{job_id} finished without trans_subtitles.srt")
+        if states[probing]['status'] == 'done':
+            failures += check_model_dir(states[probing], config_file)
+        srt = requests.get(f"{url}/jobs/{jobs[0]}/artifacts/trans_subtitles.srt")
+        if srt.status_code != 200 or not srt.content:
+            failures.append(f"download of trans_subtitles.srt gave {srt.status_code}")
+        if streamed.count('step_finished') != len(STEPS) or streamed[-1:] != ['finished']:
+            failures.append(f"event stream of {jobs[0]}: {streamed}")
+        if min(args.workers, args.jobs) > 1 and max_running < 2:
+            failures.append("jobs never ran in parallel")
+    finally:
+        stop()
+        llm.stop()
+        if not args.keep:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {
+        'jobs': args.jobs, 'workers': args.workers, 'words': args.words, 'wall_s': round(wall, 3),
+        'max_running': max_running, 'llm_calls': llm.counters(), 'events_streamed': len(streamed), 'failures': failures,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""End-to-end stage benchmarks on synthetic media, offline and on CPU.
+
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 --output bench.json
+    python benchmarks/run_benchmarks.py --baseline bench.json --tolerance 0.2
+
+Every size runs in a fresh workspace (a temp dir with a copy of config.yaml) against a
+deterministic fake LLM (ollama protocol) and a fake GPT-SoVITS server. Results are one JSON
+document with wall/CPU seconds, peak RSS, words per second and LLM calls per stage. With
+--baseline, stages slower than the stored run by more than --tolerance are listed and the
+exit code is 1. The stages' console output goes to stderr, so stdout only carries the report:
+
+    python benchmarks/run_benchmarks.py --sizes 1000 | python -m json.tool
+"""
+import os, sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+import contextlib
+from benchmarks.synthetic import make_transcript, write_transcript, write_tone_speech, make_test_video
+from benchmarks.fake_services import FakeLLM, FakeTTS
+
+CONFIG_OVERRIDES = {
+    'whisper.language': 'en',
+    'target_language': 'Chinese',
+    'tts_method': 'gpt_sovits',
+    'gpt_sovits.refer_mode': 3,
+    'pause_before_translate': False,
+    'resolution': '640x360',
+    'llm.parallel': 8,  # FakeLLM serves 8 calls at once
+}
+MEDIA_STAGES = ('step7', 'step9', 'step10', 'step11')
+
+class PeakMemory:
+    """Peak RSS while a stage runs, sampled from /proc (ru_maxrss only grows, so it can't be reset per stage)"""
+
+    def __init__(self, interval=0.02):
+        self.interval, self.peak, self._stop = interval, 0, threading.Event()
+
+    @staticmethod
+    def rss_mb():
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1 << 20)
+        except (OSError, ValueError, AttributeError):
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.rss_mb())
+
+STAGES = [
+    ('step3_1', 'core.step3_1_spacy_split', 'split_by_spacy'),
+    ('step3_2', 'core.step3_2_splitbymeaning', 'split_sentences_by_meaning'),
+    ('step4_1', 'core.step4_1_summarize', 'get_summary'),
+    ('step4_2', 'core.step4_2_translate_all', 'translate_all'),
+    ('step5', 'core.step5_splitforsub', 'split_for_sub_main'),
+    ('step6', 'core.step6_generate_final_timeline', 'align_timestamp_main'),
+    ('step7', 'core.step7_merge_sub_to_vid', 'merge_subtitles_to_video'),
+    ('step8', 'core.step8_gen_audio_task', 'gen_audio_task_main'),
+    ('step9', 'core.step9_uvr_audio', 'uvr_audio_main'),
+    ('step10', 'core.step10_gen_audio', 'process_sovits_tasks'),
+    ('step11', 'core.step11_merge_audio_to_vid', 'merge_main'),
+]
+
+# spaCy stages replaced by canned output when spaCy or its model is missing: stage -> (source, destination)
+CANNED = {
+    'step3_1': ('output/log/canned_sentence_splitbynlp.txt', 'output/log/sentence_splitbynlp.txt'),
+    'step3_2': ('output/log/sentence_splitbynlp.txt', 'output/log/sentence_splitbymeaning.txt'),
+}
+
+def spacy_ready():
+    """True if spaCy and the model for the benchmark language can be loaded without a download"""
+    try:
+        import spacy
+        from core.config_utils import load_key
+    except ImportError:
+        return False
+    model = load_key("spacy_model_map").get(CONFIG_OVERRIDES['whisper.language'], "en_core_web_md")
+    return spacy.util.is_package(model)
+
+def load_stage(name, module, attr):
+    """Import a step only once the workspace and fake servers exist: several steps read config at
+    import. Raises ImportError for a missing dependency, except for the spaCy steps, which are
+    replaced by canned sentences so the later stages still run."""
+    import importlib
+    if name in CANNED and not spacy_ready():
+        source, destination = CANNED[name]
+        def canned():
+            shutil.copy(source, destination)
+            return 'canned'
+        return canned
+    return getattr(importlib.import_module(module), attr)
+
+@contextlib.contextmanager
+def stdout_to_stderr():
+    """Send stdout to stderr at the file descriptor level, so ffmpeg and other child processes follow"""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+    finally:
+        sys.stderr.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+
+def prepare_workspace(workspace, n_words, with_media):
+    from core.config_utils import update_key
+    os.makedirs(workspace, exist_ok=True)
+    shutil.copy(os.path.join(ROOT, 'config.yaml'), os.path.join(workspace, 'config.yaml'))
+    os.chdir(workspace)
+    for key, value in CONFIG_OVERRIDES.items():
+        update_key(key, value)
+    df, sentences = make_transcript(n_words)
+    write_transcript(df, sentences)
+    seconds = float(df['end'].iloc[-1]) + 1
+    if with_media:
+        make_test_video('output/bench.mp4', seconds)
+        # Pre-separated tracks, so step9 benchmarks the reference-clip extraction and not UVR5 itself
+        write_tone_speech('output/audio/original_vocal.wav', seconds, channels=2)
+        write_tone_speech('output/audio/background.wav', seconds, channels=2, seed=1)
+    return seconds
+
+def run_size(n_words, llm, with_media, keep=False):
+    workspace = tempfile.mkdtemp(prefix=f'videolingo_bench_{n_words}_')
+    cwd = os.getcwd()
+    results = []
+    try:
+        t = time.perf_counter()
+        audio_seconds = prepare_workspace(workspace, n_words, with_media)
+        results.append({'size': n_words, 'stage': 'generate_inputs', 'status': 'ok', 'wall_s': round(time.perf_counter() - t, 3)})
+        for name, module, attr in STAGES:
+            if name in MEDIA_STAGES and not with_media:
+                results.append({'size': n_words, 'stage': name, 'status': 'skipped', 'reason': 'no media for this size'})
+                continue
+            try:
+                fn = load_stage(name, module, attr)
+            except ImportError as e:
+                results.append({'size': n_words, 'stage': name, 'status': 'skipped', 'reason': f'missing dependency: {e}'})
+                continue
+            before = llm.counters()
+            status, reason = 'ok', None
+            with PeakMemory() as mem:
+                wall, cpu = time.perf_counter(), time.process_time()
+                try:
+                    note = fn()
+                    if note == 'canned':
+                        status, reason = 'canned', 'spaCy unavailable, used canned sentences'
+                except Exception as e:
+                    status, reason = 'error', f'{type(e).__name__}: {e}'
+                wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            after = llm.counters()
+            measured = status == 'ok' and wall > 0
+            result = {
+                'size': n_words, 'stage': name, 'status': status,
+                'wall_s': round(wall, 3), 'cpu_s': round(cpu, 3), 'peak_rss_mb': round(mem.peak, 1),
+                'words_per_s': round(n_words / wall, 1) if measured else None,
+                'audio_x_realtime': round(audio_seconds / wall, 1) if measured else None,
+                **{k: after[k] - before[k] for k in after},
+            }
+            if reason:
+                result['reason'] = reason[:500]
+            results.append(result)
+            print(json.dumps(result, ensure_ascii=False), file=sys.stderr)
+    finally:
+        os.chdir(cwd)
+        if not keep:
+            shutil.rmtree(workspace, ignore_errors=True)
+    return results
+
+def compare(results, baseline, tolerance):
+    """Stages whose wall time grew by more than `tolerance` (0.2 = 20%) against the baseline run"""
+    base = {(r['size'], r['stage']): r for r in baseline['results'] if r.get('status') in ('ok', 'canned')}
+    regressions = []
+    for r in results:
+        b = base.get((r['size'], r['stage']))
+        if b is None or r.get('status') not in ('ok', 'canned') or not b.get('wall_s'):
+            continue
+        ratio = r['wall_s'] / b['wall_s']
+        r['baseline_wall_s'] = b['wall_s']
+        r['vs_baseline'] = round(ratio, 3)
+        if ratio > 1 + tolerance and r['wall_s'] - b['wall_s'] > 0.05:
+            regressions.append(r)
+    return regressions
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="VideoLingo stage benchmarks on synthetic inputs")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help="transcript sizes in words")
+    parser.add_argument('--media-sizes', type=int, nargs='*', default=[1000], help="sizes that also get video/audio and run steps 7, 9-11")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="seconds slept per fake LLM call")
+    parser.add_argument('--output', help="write the JSON results here (default: stdout)")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed wall-time growth against the baseline")
+    parser.add_argument('--keep', action='store_true', help="keep the workspaces for inspection")
+    args = parser.parse_args()
+
+    llm = FakeLLM(latency=args.llm_latency).start()
+    tts = FakeTTS().start()
+    # ollama reads the host when it is imported, which happens with the first stage import
+    os.environ['OLLAMA_HOST'] = llm.url
+    try:
+        results = []
+        with stdout_to_stderr():
+            for size in args.sizes:
+                results.extend(run_size(size, llm, size in args.media_sizes, args.keep))
+    finally:
+        llm.stop()
+        tts.stop()
+
+    report = {
+        'meta': {
+            'commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'llm_latency': args.llm_latency,
+        },
+        'results': results,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report['regressions'] = [{'size': r['size'], 'stage': r['stage'], 'vs_baseline': r['vs_baseline']} for r in regressions]
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    for r in regressions:
+        print(f"REGRESSION {r['stage']} @ {r['size']} words: {r['vs_baseline']:.2f}x baseline", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
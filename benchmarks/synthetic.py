@@ -0,0 +1,94 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import subprocess
+import numpy as np
+import pandas as pd
+import soundfile as sf
+
+SECONDS_PER_WORD = 0.3
+SENTENCE_PAUSE = 0.6
+TERMS = ['Louvre', 'Mona Lisa', 'Leonardo', 'Paris', 'pyramid', 'Renaissance']
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ta', 'ri', 'so', 'du', 'ven', 'par', 'tor', 'el', 'an', 'is', 'um']
+
+def make_vocabulary(size=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES, rng.integers(1, 4))))
+    return sorted(words)
+
+def make_transcript(n_words, seed=0):
+    """Canned word-level transcript: (cleaned_chunks DataFrame, list of sentences).
+
+    Sentences of 6-30 words with commas, a few proper nouns for the summary step, and word
+    timings at SECONDS_PER_WORD with a pause after every sentence, like whisper output.
+    """
+    rng = np.random.default_rng(seed)
+    vocab = make_vocabulary(seed=seed)
+    words, starts, sentences = [], [], []
+    t = 0.0
+    while len(words) < n_words:
+        length = min(int(rng.integers(6, 31)), n_words - len(words))
+        sentence = [vocab[i] for i in rng.integers(0, len(vocab), length)]
+        if length > 3 and rng.random() < 0.3:
+            sentence[int(rng.integers(1, length - 1))] = TERMS[int(rng.integers(0, len(TERMS)))].split()[0]
+        sentence[0] = sentence[0].capitalize()
+        for i in range(length - 1):
+            if rng.random() < 0.08:
+                sentence[i] += ','
+        sentence[-1] += '.'
+        for word in sentence:
+            words.append(word)
+            starts.append(t)
+            t += SECONDS_PER_WORD
+        t += SENTENCE_PAUSE
+        sentences.append(' '.join(sentence))
+    starts = np.array(starts)
+    df = pd.DataFrame({'text': words, 'start': starts.round(3), 'end': (starts + SECONDS_PER_WORD * 0.9).round(3)})
+    return df, sentences
+
+def write_transcript(df, sentences, log_dir='output/log', language='en'):
+    """Write the transcript the way step2 does (quoted words) plus the detected language"""
+    import json
+    os.makedirs(log_dir, exist_ok=True)
+    df.assign(text='"' + df['text'] + '"').to_excel(os.path.join(log_dir, 'cleaned_chunks.xlsx'), index=False)
+    with open(os.path.join(log_dir, 'transcript_language.json'), 'w', encoding='utf-8') as f:
+        json.dump({"language": language}, f)
+    # Canned spaCy output, used when spaCy or its model is not installed
+    with open(os.path.join(log_dir, 'canned_sentence_splitbynlp.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(sentences))
+
+def tone_speech(seconds, sr=16000, seed=0):
+    """TTS-free speech surrogate: harmonic bursts with a gliding pitch, gated at a syllable rate"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    gate = (np.sin(2 * np.pi * 4 * t + rng.uniform(0, np.pi)) > 0.2) * (np.sin(2 * np.pi * 0.3 * t) > -0.7)
+    f0 = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    return (0.2 * gate * voice + 0.001 * rng.standard_normal(len(t))).astype(np.float32)
+
+def write_tone_speech(path, seconds, sr=16000, channels=1, block_seconds=600, seed=0):
+    """Stream a long surrogate track to disk block by block"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with sf.SoundFile(path, 'w', samplerate=sr, channels=channels, subtype='PCM_16') as f:
+        done, block = 0.0, 0
+        while done < seconds:
+            step = min(block_seconds, seconds - done)
+            data = tone_speech(step, sr, seed + block)
+            f.write(np.repeat(data[:, None], channels, axis=1))
+            done += step
+            block += 1
+    return path
+
+def make_test_video(path, seconds, size='320x180', rate=10):
+    """ffmpeg test-pattern video with a sine soundtrack; small and fast to encode"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    cmd = [
+        'ffmpeg', '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate={rate}:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=220:sample_rate=16000:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-shortest', path,
+    ]
+    subprocess.run(cmd, check=True)
+    return path
@@ -5,6 +5,7 @@ import os, sys
 import subprocess
 import socket
 import time
+import json
 import requests
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 from core.config_utils import load_key
@@ -56,18 +57,35 @@ def gpt_sovits_tts(text, text_lang, save_path, ref_audio_path, prompt_lang, prom
         rprint(f"[bold red]TTS请求失败，状态码:[/bold red] {response.status_code}")
         return False
 
+def load_best_reference(task_df, current_dir):
+    """Reference clip picked by step9 (see `refers/scores.json`) with its own transcript, or None
+    to fall back to the first segment"""
+    scores_path = current_dir / "output/audio/refers/scores.json"
+    if not scores_path.exists():
+        return None
+    with open(scores_path, 'r', encoding='utf-8') as f:
+        scores = json.load(f)
+    best = scores.get('best')
+    matches = task_df.loc[task_df['number'] == best, 'origin'].values
+    if best is None or len(matches) == 0:
+        return None
+    prompt_text = matches[0]
+    return current_dir / f"output/audio/refers/{best}.wav", prompt_text, scores['clips']
+
 def gpt_sovits_tts_for_videolingo(text, save_as, number, task_df):
     start_gpt_sovits_server()
     TARGET_LANGUAGE = load_key("target_language")
-    WHISPER_LANGUAGE = load_key("whisper.language")
     sovits_set = load_key("gpt_sovits")
     DUBBING_CHARACTER = sovits_set["character"]
     REFER_MODE = sovits_set["refer_mode"]
+    BEST_REFERENCE = sovits_set.get("best_reference", False)
 
-    from core.step2_whisper import get_whisper_language
+    from core.media_context import job_context
     current_dir = Path.cwd()
-    prompt_lang = get_whisper_language() if WHISPER_LANGUAGE == 'auto' else WHISPER_LANGUAGE
+    prompt_lang = job_context().language
     prompt_text = task_df.loc[task_df['number'] == number, 'origin'].values[0]
+    best = load_best_reference(task_df, current_dir) if BEST_REFERENCE and REFER_MODE in (2, 3) else None
+    fallback_path, fallback_text = (best[0], best[1]) if best else (current_dir / "output/audio/refers/1.wav", prompt_text)
 
     if REFER_MODE == 1:
         # Use the default reference audio from config
@@ -90,18 +108,20 @@ def gpt_sovits_tts_for_videolingo(text, save_as, number, task_df):
         prompt_text = content
     elif REFER_MODE == 2:
         # Use only the reference audio path
-        ref_audio_path = current_dir / "output/audio/refers/1.wav"
+        ref_audio_path, prompt_text = fallback_path, fallback_text
     elif REFER_MODE == 3:
         # Use the provided reference audio path
         ref_audio_path = current_dir / f"output/audio/refers/{number}.wav"
+        if best and not best[2].get(str(number), {}).get('usable', True):
+            # This segment's own clip is too short/long for GPT-SoVITS, use the cleanest one instead
+            ref_audio_path, prompt_text = fallback_path, fallback_text
     else:
         raise ValueError("Invalid REFER_MODE. Choose 1, 2, or 3.")
 
     success = gpt_sovits_tts(text, TARGET_LANGUAGE, save_as, ref_audio_path, prompt_lang, prompt_text)
     if not success and REFER_MODE == 3:
         rprint(f"[bold red]TTS请求失败，切换回模式2重试[/bold red]")
-        ref_audio_path = current_dir / "output/audio/refers/1.wav"
-        gpt_sovits_tts(text, TARGET_LANGUAGE, save_as, ref_audio_path, prompt_lang, prompt_text)
+        gpt_sovits_tts(text, TARGET_LANGUAGE, save_as, fallback_path, prompt_lang, fallback_text)
 
 
 def find_and_check_config_path(dubbing_character):
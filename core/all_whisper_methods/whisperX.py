@@ -7,15 +7,17 @@ from rich import print as rprint
 from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from core.config_utils import load_key
+from core.telemetry import traced
 
 MODEL_DIR = load_key("model_dir")
 
 from core.all_whisper_methods.whisperXapi import (
-    process_transcription, convert_video_to_audio, split_audio,
+    assemble_words, convert_video_to_audio, split_audio,
     save_results, save_language
 )
 from third_party.uvr5.uvr5_for_videolingo import uvr5_for_videolingo
     
+@traced("whisperx segment")
 def transcribe_audio(audio_file: str, start: float, end: float) -> Dict:
     WHISPER_LANGUAGE = load_key("whisper.language")
     device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -90,15 +92,8 @@ def transcribe_audio(audio_file: str, start: float, end: float) -> Dict:
         del model_a
         torch.cuda.empty_cache()
 
-        # Adjust timestamps
-        for segment in result['segments']:
-            segment['start'] += start
-            segment['end'] += start
-            for word in segment['words']:
-                if 'start' in word:
-                    word['start'] += start
-                if 'end' in word:
-                    word['end'] += start
+        # Timestamps are shifted by `start` when all segments are assembled
+        result['time_offset'] = start
         return result
     except Exception as e:
         rprint(f"[red]WhisperX processing error:[/red] {e}")
@@ -135,11 +130,7 @@ def transcribe(video_file: str):
             all_results.append(result)
         
         # step4 Combine results
-        combined_result = {'segments': []}
-        for result in all_results:
-            combined_result['segments'].extend(result['segments'])
-        
-        df = process_transcription(combined_result)
+        df = assemble_words(all_results)
         save_results(df)
     else:
         rprint("[yellow]Transcription results already exist, skipping transcription step.[/yellow]")
@@ -1,14 +1,15 @@
 import os
 import sys
 import replicate
+import numpy as np
 import pandas as pd
-import json
 from typing import Dict, List, Tuple
 import subprocess
 import base64
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from core.config_utils import load_key
-from moviepy.editor import AudioFileClip
+from core.telemetry import traced
+from core.media_context import probe_media, save_language
 import time
 
 def convert_video_to_audio(input_file: str) -> str:
@@ -37,9 +38,7 @@ def convert_video_to_audio(input_file: str) -> str:
 def split_audio(audio_file: str, target_duration: int = 20*60, window: int = 60) -> List[Tuple[float, float]]:
     print("🔪 Splitting audio into segments...")
     
-    # Use moviepy to get audio duration
-    with AudioFileClip(audio_file) as audio:
-        duration = audio.duration
+    duration = probe_media(audio_file).duration
     
     segments = []
     start = 0
@@ -74,6 +73,7 @@ def split_audio(audio_file: str, target_duration: int = 20*60, window: int = 60)
     print(f"🔪 Split audio into {len(segments)} segments")
     return segments
 
+@traced("whisperx api segment")
 def transcribe_segment(audio_file: str, start: float, end: float) -> Dict:
     print(f"🎙️ Transcribing segment from {start:.2f}s to {end:.2f}s")
     
@@ -146,72 +146,72 @@ def transcribe_audio(audio_base64: str) -> Dict:
     except Exception as e:
         raise Exception(f"Error accessing whisperX API: {e} Please check your Replicate API key and internet connection.\n")
 
+GUILLEMETS = str.maketrans('', '', '»«')  # ! For French, we need to convert guillemets to empty strings
+
+def assemble_words(results: List[Dict]) -> pd.DataFrame:
+    """Flatten the words of several transcription results into text/start/end columns.
+
+    Each result's word times are shifted by its optional 'time_offset' in bulk. Missing times are
+    filled like before: a word without start and end takes the previous word's end (the very first
+    word takes the next timed word of its segment), and a word without start begins at the
+    previous word's end.
+    """
+    words = [(word, i) for i, result in enumerate(results) for segment in result['segments'] for word in segment['words']]
+    n = len(words)
+    if n == 0:
+        return pd.DataFrame({'text': [], 'start': [], 'end': []})
+    # Strip guillemets from all words at once; words never contain NUL
+    text = '\0'.join(word['word'] for word, _ in words).translate(GUILLEMETS).split('\0')
+    start = np.fromiter((word.get('start', np.nan) for word, _ in words), dtype=np.float64, count=n)
+    end = np.fromiter((word.get('end', np.nan) for word, _ in words), dtype=np.float64, count=n)
+    offsets = np.array([result.get('time_offset', 0) for result in results], dtype=np.float64)
+    source = np.fromiter((i for _, i in words), dtype=np.int64, count=n)
+    start += offsets[source]
+    end += offsets[source]
+
+    if np.isnan(start[0]) and np.isnan(end[0]):
+        # If it's the first word, look next for a timestamp then assign it to the current word
+        first_segment = next(segment['words'] for result in results for segment in result['segments'] if segment['words'])
+        next_word = next((k for k in range(len(first_segment)) if not (np.isnan(start[k]) or np.isnan(end[k]))), None)
+        if next_word is None:
+            raise Exception(f"No next word with timestamp found for the current word : {words[0][0]}")
+        start[0], end[0] = start[next_word], end[next_word]
+    end = np.where(np.isnan(end) & ~np.isnan(start), start, end)
+
+    # Forward fill of the end times: the end of the last word that had one
+    has_end = ~np.isnan(end)
+    prev_end = end[np.maximum.accumulate(np.where(has_end, np.arange(n), 0))]
+    both_missing = np.isnan(start) & ~has_end
+    end = np.where(has_end, end, prev_end)
+    start = np.where(both_missing, prev_end, start)
+    # Word with an end but no start begins where the previous word ended (0 for the first word)
+    missing_start = np.isnan(start)
+    start[missing_start] = np.concatenate(([0.0], end[:-1]))[missing_start]
+    return pd.DataFrame({'text': text, 'start': start, 'end': end})
+
 def process_transcription(result: Dict) -> pd.DataFrame:
-    all_words = []
-    for segment in result['segments']:
-        for word in segment['words']:
-            # ! For French, we need to convert guillemets to empty strings
-            word["word"] = word["word"].replace('»', '').replace('«', '')
-            
-            if 'start' not in word and 'end' not in word:
-                if all_words:
-                    # Assign the end time of the previous word as the start and end time of the current word
-                    word_dict = {
-                        'text': word["word"],
-                        'start': all_words[-1]['end'],
-                        'end': all_words[-1]['end'],
-                    }
-                    all_words.append(word_dict)
-                else:
-                    # If it's the first word, look next for a timestamp then assign it to the current word
-                    next_word = next((w for w in segment['words'] if 'start' in w and 'end' in w), None)
-                    if next_word:
-                        word_dict = {
-                            'text': word["word"],
-                            'start': next_word["start"],
-                            'end': next_word["end"],
-                        }
-                        all_words.append(word_dict)
-                    else:
-                        raise Exception(f"No next word with timestamp found for the current word : {word}")
-            else:
-                # Normal case, with start and end times
-                word_dict = {
-                    'text': f'{word["word"]}',
-                    'start': word.get('start', all_words[-1]['end'] if all_words else 0),
-                    'end': word['end'],
-                }
-                
-                all_words.append(word_dict)
-    
-    return pd.DataFrame(all_words)
+    return assemble_words([result])
 
 def save_results(df: pd.DataFrame):
     os.makedirs('output/log', exist_ok=True)
     excel_path = os.path.join('output/log', "cleaned_chunks.xlsx")
     
+    lengths = df['text'].str.len()
+    empty = lengths == 0
     # Remove rows where 'text' is empty
-    initial_rows = len(df)
-    df = df[df['text'].str.len() > 0]
-    removed_rows = initial_rows - len(df)
-    if removed_rows > 0:
-        print(f"ℹ️ Removed {removed_rows} row(s) with empty text.")
+    if empty.any():
+        print(f"ℹ️ Removed {int(empty.sum())} row(s) with empty text.")
     
     # Check for and remove words longer than 20 characters
-    long_words = df[df['text'].str.len() > 20]
-    if not long_words.empty:
-        print(f"⚠️ Warning: Detected {len(long_words)} word(s) longer than 20 characters. These will be removed.")
-        df = df[df['text'].str.len() <= 20]
+    long_words = lengths > 20
+    if long_words.any():
+        print(f"⚠️ Warning: Detected {int(long_words.sum())} word(s) longer than 20 characters. These will be removed.")
     
-    df['text'] = df['text'].apply(lambda x: f'"{x}"')
+    df = df[~empty & ~long_words]
+    df = df.assign(text='"' + df['text'] + '"')
     df.to_excel(excel_path, index=False)
     print(f"📊 Excel file saved to {excel_path}")
 
-def save_language(language: str):
-    os.makedirs('output/log', exist_ok=True)
-    with open('output/log/transcript_language.json', 'w', encoding='utf-8') as f:
-        json.dump({"language": language}, f, ensure_ascii=False, indent=4)
-    
 def transcribe(video_file: str):
     if not os.path.exists("output/log/cleaned_chunks.xlsx"):
         audio_file = convert_video_to_audio(video_file)
@@ -226,27 +226,11 @@ def transcribe(video_file: str):
             result['time_offset'] = start  # Add time offset to the result
             all_results.append(result)
         
-        # step4 Combine results
-        combined_result = {
-            'segments': [],
-            'detected_language': all_results[0]['detected_language']
-        }
-        for result in all_results:
-            for segment in result['segments']:
-                segment['start'] += result['time_offset']
-                segment['end'] += result['time_offset']
-                for word in segment['words']:
-                    if 'start' in word:
-                        word['start'] += result['time_offset']
-                    if 'end' in word:
-                        word['end'] += result['time_offset']
-            combined_result['segments'].extend(result['segments'])
-        
         # step5 Save language
-        save_language(combined_result['detected_language'])
+        save_language(all_results[0]['detected_language'])
         
-        # step6 Process transcription
-        df = process_transcription(combined_result)
+        # step6 Combine and process transcription, shifting each segment by its time offset
+        df = assemble_words(all_results)
         save_results(df)
     else:
         print("📊 Transcription results already exist, skipping transcription step.")
@@ -3,9 +3,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from threading import Lock
 import json_repair
 import json 
-import ollama
 import time
 from core.config_utils import load_key
+from core import telemetry
+from core.llm_backend import get_backend, ReplayMiss, PREFIX_STATS, STEP_RATES
 
 LOG_FOLDER = 'output/gpt_log'
 LOCK = Lock()
@@ -42,59 +43,61 @@ def check_ask_gpt_history(prompt, model, log_title):
                     return item["response"]
     return False
 
-def ask_gpt(prompt, response_json=True, valid_def=None, log_title='default'):
+@telemetry.traced("ask_gpt")
+def ask_gpt(prompt, response_json=True, valid_def=None, log_title='default', model=None, max_retries=10):
+    """`model` overrides api.model (the tiered router asks smaller models first)"""
     api_set = load_key("api")
     llm_support_json = load_key("llm_support_json")
+    model = model or api_set["model"]
     
     with LOCK:
-        history_response = check_ask_gpt_history(prompt, api_set["model"], log_title)
+        history_response = check_ask_gpt_history(prompt, model, log_title)
         if history_response:
+            telemetry.add('cache_hits')
             return history_response
     
-    max_retries = 10
+    backend = get_backend()
+    params = {'json': response_json}
+    # Prompts from prompts_storage carry their stable prefix
+    prefix = getattr(prompt, 'prefix', '')
+    if PREFIX_STATS.record(prompt, prefix):
+        telemetry.add('prefix_hits')
     for attempt in range(max_retries):
         try:
-            response = ollama.chat(
-                model=api_set["model"],
-                messages=[{
-                    'role': 'user',
-                    'content': prompt
-                }],
-                 options={
-                    'num_gpu': 15,         # RTX 4060 Ti has 8GB of VRAM, moderate usage is recommended
-                    'num_ctx': 4096,       # Gemma 2B supports a maximum context of 8K
-                    'temperature': 0.7,    # Can remain unchanged
-                    'top_p': 0.9,          # Can remain unchanged
-                    'mirostat': 0,         # Can remain unchanged
-                    'num_thread': 6       # Considering your i7-13700 has many cores, you can increase the number of threads
-                },
-                format='json' if response_json else None,
-                stream=False
-            )
+            started = time.perf_counter()
+            response = backend.chat(model, prompt, params, prefix)
+            eval_s = response.get('eval_s') or 0.0
+            STEP_RATES.record(log_title, response['tokens_in'], response['tokens_out'], eval_s, time.perf_counter() - started)
+            telemetry.add('llm_calls')
+            telemetry.add('llm_tokens_in', response['tokens_in'])
+            telemetry.add('llm_tokens_out', response['tokens_out'])
+            telemetry.add('llm_eval_ms', int(eval_s * 1000))
             
             if response_json:
                 try:
-                    content = response['message']['content']
+                    content = response['content']
                     
                     json_content = json_repair.loads(content)
                     
                     if valid_def:
                         valid_response = valid_def(json_content)
                         if valid_response['status'] != 'success':
-                            save_log(api_set["model"], prompt, json_content, log_title="error", message=valid_response['message'])
+                            save_log(model, prompt, json_content, log_title="error", message=valid_response['message'])
                             raise ValueError(f"❎ API response error: {valid_response['message']}")
                     
                     response_data = json_content
                     break
                 except Exception as e:
                     print(f"❎ json_repair parsing failed. Retrying: '''{content}'''")
-                    save_log(api_set["model"], prompt, content, log_title="error", message=f"json_repair parsing failed.")
+                    save_log(model, prompt, content, log_title="error", message=f"json_repair parsing failed.")
                     if attempt == max_retries - 1:
                         raise Exception(f"JSON parsing still failed after {max_retries} attempts: {e}")
             else:
-                response_data = response['message']['content']
+                response_data = response['content']
                 break
                 
+        except ReplayMiss:
+            raise
         except Exception as e:
             if attempt < max_retries - 1:
                 print(f"Error occurred: {e}\nRetrying...")
@@ -104,7 +107,7 @@ def ask_gpt(prompt, response_json=True, valid_def=None, log_title='default'):
 
     with LOCK:
         if log_title != 'None':
-            save_log(api_set["model"], prompt, response_data, log_title=log_title)
+            save_log(model, prompt, response_data, log_title=log_title)
 
     return response_data
 
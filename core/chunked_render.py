@@ -0,0 +1,160 @@
+import os, sys, re, shutil, subprocess, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.telemetry import traced
+from core.media_context import probe_media
+import concurrent.futures
+from rich import print as rprint
+
+CHUNK_DIR = 'output/render_chunks'
+
+def probe_duration(video_file):
+    return probe_media(video_file).duration
+
+def probe_keyframes(video_file):
+    """Keyframe timestamps from packet flags, without decoding any frame"""
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_file]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts, _, flags = line.partition(',')
+        if 'K' in flags and pts not in ('', 'N/A'):
+            keyframes.append(float(pts))
+    return sorted(keyframes)
+
+def plan_chunks(duration, keyframes, num_chunks):
+    """Split [0, duration) into up to `num_chunks` ranges whose boundaries are snapped to keyframes"""
+    bounds = [0.0]
+    for i in range(1, num_chunks):
+        target = duration * i / num_chunks
+        nearest = min(keyframes, key=lambda k: abs(k - target)) if keyframes else target
+        if bounds[-1] < nearest < duration:
+            bounds.append(nearest)
+    bounds.append(duration)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def srt_time_to_seconds(time_str):
+    h, m, s = time_str.strip().split(':')
+    s, ms = s.split(',')
+    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+
+def seconds_to_srt_time(seconds):
+    ms = int(round(seconds * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+def shift_srt(srt_content, start, end):
+    """Keep the cues overlapping [start, end) and move them so the chunk starts at 0"""
+    blocks = []
+    for block in re.split(r'\n\s*\n', srt_content.strip()):
+        lines = block.split('\n')
+        if len(lines) < 2 or ' --> ' not in lines[1]:
+            continue
+        cue_start, cue_end = (srt_time_to_seconds(t) for t in lines[1].split(' --> '))
+        if cue_end <= start or cue_start >= end:
+            continue
+        cue_start, cue_end = max(cue_start, start) - start, min(cue_end, end) - start
+        blocks.append(f"{len(blocks) + 1}\n{seconds_to_srt_time(cue_start)} --> {seconds_to_srt_time(cue_end)}\n" + '\n'.join(lines[2:]))
+    return '\n\n'.join(blocks)
+
+def encode_chunk(video_file, start, end, vf, encoding_params, output_file, threads):
+    cmd = [
+        'ffmpeg', '-v', 'error', '-y', '-ss', f'{start:.6f}', '-i', video_file, '-t', f'{end - start:.6f}',
+        '-vf', vf.encode('utf-8'), '-r', '30', '-an', '-threads', str(threads),
+    ] + encoding_params + [output_file]
+    subprocess.run(cmd, check=True)
+    return output_file
+
+@traced("ffmpeg chunked render")
+def render_chunked(video_file, srt_files, output_video, build_vf, encoding_params, workers=4, keep_chunks=False):
+    """Burn subtitles into keyframe-aligned ranges in parallel ffmpeg processes, then join them without re-encoding.
+
+    `build_vf(srt_paths)` returns the video filter for a chunk given its shifted subtitle files.
+    The source audio is added back in the final concat step.
+    """
+    duration = probe_duration(video_file)
+    chunks = plan_chunks(duration, probe_keyframes(video_file), workers)
+    threads = max(1, (os.cpu_count() or 1) // len(chunks))
+    os.makedirs(CHUNK_DIR, exist_ok=True)
+
+    srt_contents = []
+    for srt in srt_files:
+        with open(srt, 'r', encoding='utf-8') as f:
+            srt_contents.append(f.read())
+
+    rprint(f"[cyan]🎬 Rendering {len(chunks)} chunks with {workers} workers ({threads} threads each)...[/cyan]")
+    start_time = time.time()
+    chunk_files = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for i, (start, end) in enumerate(chunks):
+            shifted = []
+            for j, content in enumerate(srt_contents):
+                path = f"{CHUNK_DIR}/sub{j}_{i}.srt"
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(shift_srt(content, start, end))
+                shifted.append(path)
+            chunk_file = f"{CHUNK_DIR}/chunk_{i}.mp4"
+            chunk_files.append(chunk_file)
+            futures.append(executor.submit(encode_chunk, video_file, start, end, build_vf(shifted), encoding_params, chunk_file, threads))
+        for future in futures:
+            future.result()
+
+    list_file = f"{CHUNK_DIR}/concat.txt"
+    with open(list_file, 'w', encoding='utf-8') as f:
+        f.write(''.join(f"file '{os.path.abspath(c)}'\n" for c in chunk_files))
+    concat_cmd = [
+        'ffmpeg', '-v', 'error', '-y', '-f', 'concat', '-safe', '0', '-i', list_file, '-i', video_file,
+        '-map', '0:v', '-map', '1:a?', '-c:v', 'copy', '-c:a', 'aac', output_video
+    ]
+    subprocess.run(concat_cmd, check=True)
+    rprint(f"[green]Chunked render completed in {time.time() - start_time:.2f} seconds.[/green]")
+
+    if not keep_chunks:
+        shutil.rmtree(CHUNK_DIR, ignore_errors=True)
+    return output_video
+
+def count_frames(video_file):
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-count_packets', '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0', video_file]
+    return int(subprocess.run(cmd, capture_output=True, text=True, check=True).stdout.strip().split(',')[0])
+
+if __name__ == "__main__":
+    # Benchmark: single-process encode vs chunked encode of a synthetic clip. Exits 1 if the chunked
+    # output does not have the frames and duration of the single-process one
+    import argparse
+    from core.step7_merge_sub_to_vid import build_subtitle_filter
+    from core.encoder_probe import select_encoder
+    parser = argparse.ArgumentParser(description="Single-process vs chunked subtitle render")
+    parser.add_argument('--seconds', type=int, default=600, help="length of the synthetic clip")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--frame-tolerance', type=int, default=0, help="allowed frame count difference")
+    args = parser.parse_args()
+    bench_dir = 'output/bench_chunked'
+    os.makedirs(bench_dir, exist_ok=True)
+    source = f'{bench_dir}/source.mp4'
+    subprocess.run(['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={args.seconds}',
+                    '-f', 'lavfi', '-i', f'sine=frequency=440:duration={args.seconds}', '-c:v', 'libx264', '-preset', 'ultrafast',
+                    '-g', '150', '-c:a', 'aac', '-shortest', source], check=True)
+    srt = f'{bench_dir}/subs.srt'
+    with open(srt, 'w', encoding='utf-8') as f:
+        f.write('\n\n'.join(f"{i + 1}\n{seconds_to_srt_time(i * 3)} --> {seconds_to_srt_time(i * 3 + 2.5)}\nLine {i + 1}" for i in range(args.seconds // 3)))
+    params = select_encoder('balanced', ['libx264'])['params']
+
+    start = time.time()
+    subprocess.run(['ffmpeg', '-v', 'error', '-y', '-i', source, '-vf', build_subtitle_filter(1280, 720, srt, srt).encode('utf-8'),
+                    '-r', '30'] + params + [f'{bench_dir}/single.mp4'], check=True)
+    single_time = time.time() - start
+
+    start = time.time()
+    render_chunked(source, [srt, srt], f'{bench_dir}/chunked.mp4', lambda s: build_subtitle_filter(1280, 720, s[0], s[1]), params, workers=args.workers)
+    chunked_time = time.time() - start
+
+    results = {}
+    for name, elapsed in [('single', single_time), ('chunked', chunked_time)]:
+        path = f'{bench_dir}/{name}.mp4'
+        results[name] = (count_frames(path), probe_duration(path))
+        print(f"{name:>8}: {elapsed:7.2f}s | frames {results[name][0]} | duration {results[name][1]:.3f}s")
+    frame_diff = abs(results['chunked'][0] - results['single'][0])
+    duration_diff = abs(results['chunked'][1] - results['single'][1])
+    # One frame at 30 fps, plus container rounding
+    ok = frame_diff <= args.frame_tolerance and duration_diff <= (args.frame_tolerance + 1) / 30
+    print(f"frame difference {frame_diff}, duration difference {duration_diff:.3f}s: parity {'ok' if ok else 'failed'}")
+    sys.exit(0 if ok else 1)
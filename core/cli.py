@@ -0,0 +1,136 @@
+"""Run pipeline steps headless, without Streamlit.
+
+    python -m core.cli --list
+    python -m core.cli step1 --url https://www.youtube.com/watch?v=...
+    python -m core.cli text                 # steps 2-6, like "Start Processing Subtitles"
+    python -m core.cli step7 dubbing        # burn in subtitles, then steps 8-11
+    python -m core.cli step5 --workdir /path/to/job --set target_language=French
+
+Only the modules of the selected steps are imported. config.yaml and output/ are read from the
+working directory, so run it from the project root or point --workdir at a job folder.
+"""
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import time
+import argparse
+import importlib
+import traceback
+
+# name -> (module, function, description)
+STEPS = {
+    'step1': ('core.step1_ytdlp', 'download_video_ytdlp', "Download the video (needs --url)"),
+    'step2': ('core.step2_whisper', 'transcribe', "WhisperX word-level transcription"),
+    'step3_1': ('core.step3_1_spacy_split', 'split_by_spacy', "Split sentences with spaCy"),
+    'step3_2': ('core.step3_2_splitbymeaning', 'split_sentences_by_meaning', "Split long sentences by meaning"),
+    'step4_1': ('core.step4_1_summarize', 'get_summary', "Summarize and extract terminology"),
+    'step4_2': ('core.step4_2_translate_all', 'translate_all', "Translate all lines"),
+    'step5': ('core.step5_splitforsub', 'split_for_sub_main', "Split and align long subtitles"),
+    'step6': ('core.step6_generate_final_timeline', 'align_timestamp_main', "Generate the timeline and subtitle files"),
+    'step7': ('core.step7_merge_sub_to_vid', 'merge_subtitles_to_video', "Burn subtitles into the video"),
+    'step8': ('core.step8_gen_audio_task', 'gen_audio_task_main', "Generate audio tasks"),
+    'step9': ('core.step9_uvr_audio', 'uvr_audio_main', "Separate vocals and background with UVR5"),
+    'step10': ('core.step10_gen_audio', 'process_sovits_tasks', "Generate the dubbed audio"),
+    'step11': ('core.step11_merge_audio_to_vid', 'merge_main', "Merge the dubbed audio into the video"),
+}
+GROUPS = {
+    'text': ['step2', 'step3_1', 'step3_2', 'step4_1', 'step4_2', 'step5', 'step6'],
+    'dubbing': ['step8', 'step9', 'step10', 'step11'],
+}
+# With --events, progress goes to stdout as lines of this prefix followed by JSON, for the job server
+EVENT_PREFIX = '@@event '
+
+def expand(names):
+    steps = []
+    for name in names:
+        if name in GROUPS:
+            steps.extend(GROUPS[name])
+        elif name in STEPS:
+            steps.append(name)
+        else:
+            raise ValueError(f"Unknown step '{name}', expected one of {list(STEPS) + list(GROUPS)}")
+    return steps
+
+def emit(event, **data):
+    print(EVENT_PREFIX + json.dumps({'type': event, **data}, ensure_ascii=False), flush=True)
+
+def parse_setting(item):
+    """KEY=VALUE with VALUE read as JSON when it parses (numbers, booleans, lists), as a string otherwise"""
+    key, sep, value = item.partition('=')
+    if not sep:
+        raise ValueError(f"Expected KEY=VALUE, got '{item}'")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+def load_step(name):
+    module, attr, _ = STEPS[name]
+    return getattr(importlib.import_module(module), attr)
+
+def run_steps(steps, url=None, events=False):
+    """Run `steps` in order inside one telemetry trace. Returns the failed step, or None"""
+    from core import telemetry
+    from core.config_utils import load_key
+    telemetry.start_trace()
+    failed = None
+    for index, name in enumerate(steps):
+        print(f"▶ {name}: {STEPS[name][2]}")
+        if events:
+            emit('step_started', step=name, index=index, total=len(steps))
+        start = time.perf_counter()
+        try:
+            fn = load_step(name)
+            with telemetry.span(name):
+                if name == 'step1':
+                    fn(url, resolution=load_key("ytb_resolution"))
+                else:
+                    fn()
+        except Exception as e:
+            traceback.print_exc()
+            if events:
+                emit('step_failed', step=name, index=index, total=len(steps), error=f"{type(e).__name__}: {e}"[:500])
+            failed = name
+            break
+        if events:
+            emit('step_finished', step=name, index=index, total=len(steps), seconds=round(time.perf_counter() - start, 3))
+    telemetry.finish_trace()
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run VideoLingo pipeline steps without the UI")
+    parser.add_argument('steps', nargs='*', help=f"steps or groups to run in order: {', '.join(list(STEPS) + list(GROUPS))}")
+    parser.add_argument('--list', action='store_true', help="list the steps and groups")
+    parser.add_argument('--url', help="video URL for step1")
+    parser.add_argument('--workdir', help="job folder with config.yaml and output/ (default: current directory)")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', help="update a config.yaml key of the workdir before running")
+    parser.add_argument('--events', action='store_true', help=f"print progress events as '{EVENT_PREFIX}<json>' lines")
+    args = parser.parse_args(argv)
+
+    if args.list or not args.steps:
+        for name, (_, _, description) in STEPS.items():
+            print(f"{name:<8} {description}")
+        for name, steps in GROUPS.items():
+            print(f"{name:<8} {' '.join(steps)}")
+        return 0
+    try:
+        steps = expand(args.steps)
+        settings = [parse_setting(item) for item in args.set]
+    except ValueError as e:
+        parser.error(str(e))
+    if 'step1' in steps and not args.url:
+        parser.error("step1 needs --url")
+    if args.workdir:
+        os.chdir(args.workdir)
+    if settings:
+        from core.config_utils import update_key
+        for key, value in settings:
+            update_key(key, value)
+    failed = run_steps(steps, args.url, args.events)
+    if failed:
+        print(f"❌ {failed} failed", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
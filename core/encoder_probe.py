@@ -0,0 +1,191 @@
+import os, sys, json, shutil, hashlib, subprocess, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from functools import lru_cache
+from threading import Lock
+from core.config_utils import load_key
+
+RENDER_LOG = 'output/log/render_times.json'
+LOCK = Lock()
+
+# Encoders we know how to drive, in order of preference per codec. Hardware encoders first.
+KNOWN_ENCODERS = {
+    'h264': ['h264_nvenc', 'h264_qsv', 'h264_videotoolbox', 'h264_vaapi', 'libx264'],
+    'hevc': ['hevc_nvenc', 'hevc_qsv', 'hevc_videotoolbox', 'hevc_vaapi', 'libx265'],
+    'av1': ['av1_nvenc', 'av1_qsv', 'av1_vaapi', 'libsvtav1'],
+}
+SOFTWARE_ENCODERS = {'libx264', 'libx265', 'libsvtav1'}
+
+# speed: fast / medium / slow, quality: CRF-like value (lower is better), scale: fraction of the configured resolution
+ENCODING_PROFILES = {
+    'fast-preview': {'codecs': ['h264'], 'speed': 'fast', 'quality': 30, 'scale': 0.5, 'hardware': True},
+    'balanced': {'codecs': ['h264'], 'speed': 'medium', 'quality': 23, 'scale': 1.0, 'hardware': True},
+    'archive': {'codecs': ['hevc', 'av1', 'h264'], 'speed': 'slow', 'quality': 20, 'scale': 1.0, 'hardware': False},
+}
+
+SPEED_PRESETS = {
+    'x26x': {'fast': 'ultrafast', 'medium': 'medium', 'slow': 'slow'},
+    'svtav1': {'fast': '12', 'medium': '8', 'slow': '4'},
+    'nvenc': {'fast': 'p1', 'medium': 'p4', 'slow': 'p7'},
+    'qsv': {'fast': 'veryfast', 'medium': 'medium', 'slow': 'veryslow'},
+}
+# x264 preset names (as chunked_render.preset takes them) by the speed they stand for
+X264_PRESET_SPEEDS = {
+    'ultrafast': 'fast', 'superfast': 'fast', 'veryfast': 'fast', 'faster': 'medium', 'fast': 'medium',
+    'medium': 'medium', 'slow': 'slow', 'slower': 'slow', 'veryslow': 'slow', 'placebo': 'slow',
+}
+VAAPI_DEVICE = '/dev/dri/renderD128'
+
+def encoder_family(encoder):
+    if encoder in ('libx264', 'libx265'):
+        return 'x26x'
+    if encoder == 'libsvtav1':
+        return 'svtav1'
+    return encoder.split('_')[-1]
+
+def preset_for(encoder, x264_preset):
+    """An x264 preset name as the encoder's own -preset value: as is for x264/x265, else the preset of the same speed"""
+    family = encoder_family(encoder)
+    if family == 'x26x':
+        return x264_preset
+    if x264_preset not in X264_PRESET_SPEEDS:
+        raise ValueError(f"Unknown x264 preset: {x264_preset}, choose from {list(X264_PRESET_SPEEDS)}")
+    return SPEED_PRESETS.get(family, {}).get(X264_PRESET_SPEEDS[x264_preset])
+
+def get_ffmpeg_binary():
+    return shutil.which('ffmpeg') or 'ffmpeg'
+
+def file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def get_cache_path():
+    return os.path.join(load_key("model_dir"), 'encoder_capabilities.json')
+
+def list_encoders(ffmpeg_bin):
+    """Names from `ffmpeg -encoders`, only the ones we know how to use"""
+    result = subprocess.run([ffmpeg_bin, '-hide_banner', '-encoders'], capture_output=True, text=True)
+    known = {e for encoders in KNOWN_ENCODERS.values() for e in encoders}
+    listed = set()
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].startswith('V') and parts[1] in known:
+            listed.add(parts[1])
+    return listed
+
+def encoder_works(ffmpeg_bin, encoder):
+    """Being listed does not mean the device exists, so encode one tiny frame to find out"""
+    cmd = [ffmpeg_bin, '-hide_banner', '-v', 'error']
+    vf = []
+    if encoder.endswith('_vaapi'):
+        cmd += ['-vaapi_device', VAAPI_DEVICE]
+        vf = ['-vf', 'format=nv12,hwupload']
+    cmd += ['-f', 'lavfi', '-i', 'color=black:size=256x256:duration=0.1', '-frames:v', '1'] + vf + ['-c:v', encoder, '-f', 'null', '-']
+    try:
+        return subprocess.run(cmd, capture_output=True, timeout=30).returncode == 0
+    except Exception:
+        return False
+
+def probe_capabilities(ffmpeg_bin=None, cache_path=None):
+    """Usable encoders for this ffmpeg binary. Probed once, then cached on disk by the binary's sha256"""
+    ffmpeg_bin = ffmpeg_bin or get_ffmpeg_binary()
+    cache_path = cache_path or get_cache_path()
+    try:
+        key = file_hash(shutil.which(ffmpeg_bin) or ffmpeg_bin)
+    except OSError:
+        return []
+
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if key in cache:
+            return cache[key]['encoders']
+
+    try:
+        listed = list_encoders(ffmpeg_bin)
+    except OSError:
+        return []
+    usable = sorted(e for e in listed if e in SOFTWARE_ENCODERS or encoder_works(ffmpeg_bin, e))
+    cache[key] = {'ffmpeg': ffmpeg_bin, 'encoders': usable, 'probed_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=4)
+    return usable
+
+@lru_cache(maxsize=None)
+def get_capabilities():
+    return tuple(probe_capabilities())
+
+def build_encoder_params(encoder, speed, quality):
+    family = encoder_family(encoder)
+    preset = SPEED_PRESETS.get(family, {}).get(speed)
+    if family in ('x26x', 'svtav1'):
+        return ['-c:v', encoder, '-preset', preset, '-crf', str(quality)]
+    if family == 'nvenc':
+        return ['-c:v', encoder, '-preset', preset, '-rc:v', 'vbr', '-cq:v', str(quality), '-b:v', '0', '-maxrate:v', '130M', '-bufsize:v', '130M']
+    if family == 'qsv':
+        return ['-c:v', encoder, '-preset', preset, '-global_quality', str(quality)]
+    if family == 'vaapi':
+        return ['-c:v', encoder, '-qp', str(quality)]
+    if family == 'videotoolbox':
+        # videotoolbox quality is 1-100, higher is better
+        return ['-c:v', encoder, '-q:v', str(max(1, 100 - quality * 2))] + (['-realtime', '1'] if speed == 'fast' else [])
+    raise ValueError(f"Unsupported encoder: {encoder}")
+
+def select_encoder(profile_name, capabilities=None):
+    """Resolve a profile to the best available encoder.
+    Returns a dict with the encoder name, output params, extra input args and a filter suffix for hwupload."""
+    if profile_name not in ENCODING_PROFILES:
+        raise ValueError(f"Unknown encoding profile: {profile_name}, choose from {list(ENCODING_PROFILES)}")
+    profile = ENCODING_PROFILES[profile_name]
+    capabilities = set(get_capabilities() if capabilities is None else capabilities)
+
+    candidates = [e for codec in profile['codecs'] for e in KNOWN_ENCODERS[codec]]
+    if not profile['hardware']:
+        candidates = [e for e in candidates if e in SOFTWARE_ENCODERS]
+    # libx264 is always the last resort, even if probing failed
+    encoder = next((e for e in candidates if e in capabilities), 'libx264')
+
+    vaapi = encoder.endswith('_vaapi')
+    return {
+        'profile': profile_name,
+        'encoder': encoder,
+        'hardware': encoder not in SOFTWARE_ENCODERS,
+        'params': build_encoder_params(encoder, profile['speed'], profile['quality']),
+        'input_args': ['-vaapi_device', VAAPI_DEVICE] if vaapi else [],
+        'vf_suffix': ',format=nv12,hwupload' if vaapi else '',
+        'scale': profile['scale'],
+    }
+
+def scale_resolution(width, height, scale):
+    """Scale a resolution, keeping both sides even for yuv420p"""
+    return int(int(width) * scale) // 2 * 2, int(int(height) * scale) // 2 * 2
+
+def record_render_time(choice, media_duration, elapsed, desc=''):
+    """Append render time for a profile/encoder pair to the log, with the realtime factor"""
+    os.makedirs(os.path.dirname(RENDER_LOG), exist_ok=True)
+    with LOCK:
+        logs = []
+        if os.path.exists(RENDER_LOG):
+            with open(RENDER_LOG, 'r', encoding='utf-8') as f:
+                logs = json.load(f)
+        logs.append({
+            'desc': desc,
+            'profile': choice['profile'],
+            'encoder': choice['encoder'],
+            'media_duration': round(media_duration, 3),
+            'elapsed': round(elapsed, 3),
+            'realtime_factor': round(media_duration / elapsed, 3) if elapsed > 0 else None,
+        })
+        with open(RENDER_LOG, 'w', encoding='utf-8') as f:
+            json.dump(logs, f, ensure_ascii=False, indent=4)
+
+if __name__ == "__main__":
+    caps = probe_capabilities()
+    print(f"Usable encoders: {caps}")
+    for name in ENCODING_PROFILES:
+        choice = select_encoder(name, caps)
+        print(f"{name:>12} -> {choice['encoder']}: {' '.join(choice['params'])}")
@@ -0,0 +1,541 @@
+"""Headless job server: a queue of pipeline jobs behind a small HTTP API.
+
+    python -m core.job_server                      # host, port, workers and jobs_dir from config.yaml
+    python -m core.job_server --port 8765 --workers 3
+
+Each job runs `python -m core.cli <steps> --events` in its own workspace (jobs_dir/<id>, with a
+copy of config.yaml and its own output/), so jobs never share the global output/ folder and up
+to `workers` of them run at once. Queue state and progress events live in jobs_dir/jobs.db and
+outlive the server and the UI; jobs left running by a stopped server are queued again on start
+and resume, since every step skips the outputs it already wrote.
+
+    POST /uploads?filename=NAME       raw video bytes -> {"upload": id}
+    POST /jobs                        {"url" | "upload" | "video_path" | "seed", "steps", "dubbing", "config"}
+    GET  /jobs                        latest jobs
+    GET  /jobs/<id>                   status and progress
+    POST /jobs/<id>/cancel
+    GET  /jobs/<id>/events?after=N    progress events; with &stream=1 as server-sent events until the job ends
+    GET  /jobs/<id>/log?tail=N        last lines of the job's console output
+    GET  /jobs/<id>/artifacts         files in the job's output/
+    GET  /jobs/<id>/artifacts/<path>  one of them
+
+`seed` copies a prepared output/ folder into the workspace, which lets a job start after
+transcription (the benchmarks use it with synthetic transcripts). `video_path` and `seed` are
+paths on the server, so they are refused unless job_server.local_paths_root is set, and then
+only accepted inside it. `config` sets config.yaml keys of the job only, e.g.
+{"target_language": "French"}.
+"""
+import os, sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+import re
+import json
+import time
+import uuid
+import shutil
+import signal
+import asyncio
+import argparse
+import mimetypes
+import threading
+from urllib.parse import urlsplit, parse_qs, unquote
+from ruamel.yaml import YAML
+from core.config_utils import load_key
+from core.cli import expand, EVENT_PREFIX
+from core.job_store import JobStore, QUEUED, DONE, FAILED, CANCELLED, FINISHED
+
+MAX_JSON_BODY = 1 << 20
+CHUNK = 1 << 20
+CANCEL_GRACE_S = 10
+KEEPALIVE_S = 15
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+           405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status, self.message = status, message
+
+class Request:
+    def __init__(self, method, path, query, headers, reader, writer):
+        self.method, self.path, self.query, self.headers = method, path, query, headers
+        self.reader, self.writer = reader, writer
+
+    def arg(self, name, default=None):
+        return self.query.get(name, [default])[0]
+
+    @property
+    def length(self):
+        return int(self.headers.get('content-length') or 0)
+
+    async def json(self):
+        if self.length > MAX_JSON_BODY:
+            raise HTTPError(413, f"JSON body over {MAX_JSON_BODY} bytes")
+        try:
+            body = json.loads(await self.reader.readexactly(self.length) or b'{}')
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return body
+
+async def read_request(reader, writer):
+    request_line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+    try:
+        method, target, _ = request_line.split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, f"Malformed request line: {request_line[:100]!r}")
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1')
+        if line in ('\r\n', '\n', ''):
+            break
+        key, _, value = line.partition(':')
+        headers[key.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    return Request(method.upper(), unquote(url.path).rstrip('/') or '/', parse_qs(url.query), headers, reader, writer)
+
+def response_head(status, content_type, length=None, extra=()):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}", "Connection: close", *extra]
+    if length is not None:
+        lines.append(f"Content-Length: {length}")
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+async def send_json(writer, status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    writer.write(response_head(status, 'application/json; charset=utf-8', len(body)) + body)
+    await writer.drain()
+
+def safe_filename(name):
+    """As the upload section does: spaces to underscores, then only word characters, '-', '_' and '.'"""
+    return re.sub(r'[^\w\-_\.]', '', os.path.basename(name).replace(' ', '_'))
+
+def default_steps(dubbing):
+    # As the batch runner: with single pass render, step11 burns in the subtitles together with the audio mix
+    steps = ['text']
+    if not (dubbing and load_key("single_pass_render.enabled")):
+        steps.append('step7')
+    if dubbing:
+        steps.append('dubbing')
+    return steps
+
+ROUTES = [
+    ('GET', r'/health', 'health'),
+    ('POST', r'/uploads', 'upload'),
+    ('POST', r'/jobs', 'submit_job'),
+    ('GET', r'/jobs', 'list_jobs'),
+    ('GET', r'/jobs/(?P<job_id>\w+)', 'get_job'),
+    ('POST', r'/jobs/(?P<job_id>\w+)/cancel', 'cancel_job'),
+    ('GET', r'/jobs/(?P<job_id>\w+)/events', 'job_events'),
+    ('GET', r'/jobs/(?P<job_id>\w+)/log', 'job_log'),
+    ('GET', r'/jobs/(?P<job_id>\w+)/artifacts', 'list_artifacts'),
+    ('GET', r'/jobs/(?P<job_id>\w+)/artifacts/(?P<path>.+)', 'get_artifact'),
+]
+
+class JobServer:
+    """The queue, the worker pool and the HTTP API, all on one asyncio loop"""
+
+    def __init__(self, jobs_dir='jobs', workers=2, config_file='config.yaml', local_root=None):
+        self.jobs_dir = os.path.abspath(jobs_dir)
+        # video_path and seed get copied into the workspace and served as artifacts: only from here
+        self.local_root = os.path.realpath(local_root) if local_root else None
+        self.uploads_dir = os.path.join(self.jobs_dir, 'uploads')
+        self.config_file = os.path.abspath(config_file)
+        self.workers = max(1, int(workers))
+        self.store = JobStore(os.path.join(self.jobs_dir, 'jobs.db'))
+        self.tasks, self.processes, self.cancelling, self.timers = {}, {}, set(), set()
+        self.port = None
+
+    # ------------
+    # Queue and workers
+    # ------------
+
+    async def event(self, job_id, event_type, **data):
+        self.store.add_event(job_id, event_type, **data)
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def schedule(self):
+        while True:
+            self.wake.clear()
+            while len(self.tasks) < self.workers:
+                job = self.store.claim_next()
+                if job is None:
+                    break
+                self.tasks[job['id']] = asyncio.create_task(self.run_job(job))
+            await self.wake.wait()
+
+    def prepare_workspace(self, job):
+        """Config snapshot and input video of the job, once: a requeued job resumes in what it has"""
+        workspace, spec = job['workspace'], job['spec']
+        output = os.path.join(workspace, 'output')
+        os.makedirs(output, exist_ok=True)
+        if os.path.exists(os.path.join(workspace, 'config.yaml')):
+            return
+        if spec.get('seed'):
+            shutil.copytree(spec['seed'], output, symlinks=True, dirs_exist_ok=True)
+        source = self.upload_path(spec['upload']) if spec.get('upload') else spec.get('video_path')
+        if source:
+            target = os.path.join(output, safe_filename(source))
+            shutil.copy2(source, target)
+        # Written last: a workspace with its config is complete
+        self.write_config_snapshot(os.path.join(workspace, 'config.yaml'))
+
+    def write_config_snapshot(self, path):
+        """config.yaml for a job. The job runs with its workspace as working directory, so a relative
+        model_dir is made absolute: the models and the probe caches stay shared by all jobs"""
+        # A YAML of its own: workspaces are prepared on executor threads and ruamel instances aren't thread-safe
+        yaml = YAML()
+        yaml.preserve_quotes = True
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            data = yaml.load(f)
+        model_dir = data.get('model_dir')
+        if model_dir and not os.path.isabs(model_dir):
+            data['model_dir'] = os.path.normpath(os.path.join(os.path.dirname(self.config_file), model_dir))
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            yaml.dump(data, f)
+        os.replace(path + '.tmp', path)
+
+    def job_command(self, job):
+        cmd = [sys.executable, '-m', 'core.cli', *job['steps'], '--workdir', job['workspace'], '--events']
+        for key, value in (job['spec'].get('config') or {}).items():
+            cmd += ['--set', f"{key}={json.dumps(value, ensure_ascii=False)}"]
+        if job['spec'].get('url'):
+            cmd += ['--url', job['spec']['url']]
+        return cmd
+
+    async def run_job(self, job):
+        job_id, status, error = job['id'], FAILED, None
+        try:
+            await self.event(job_id, 'started', steps=job['steps'])
+            await asyncio.get_running_loop().run_in_executor(None, self.prepare_workspace, job)
+            if job_id not in self.cancelling:
+                env = {**os.environ, 'PYTHONUNBUFFERED': '1', 'PYTHONIOENCODING': 'utf-8'}
+                # A session of its own, so cancelling also stops the ffmpeg/TTS processes a step started
+                session = {'start_new_session': True} if os.name != 'nt' else {}
+                process = await asyncio.create_subprocess_exec(
+                    *self.job_command(job), cwd=ROOT, env=env, limit=CHUNK,
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, **session)
+                self.processes[job_id] = process
+                error = await self.follow(job_id, job['workspace'], process)
+                code = await process.wait()
+                status = DONE if code == 0 else FAILED
+                error = None if code == 0 else error or f"exit code {code}"
+        except asyncio.CancelledError:
+            # The server is stopping: the job stays 'running' in the store and is queued again on the next start
+            self.processes.pop(job_id, None)
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if job_id in self.cancelling:
+            status, error = CANCELLED, None
+        self.store.update(job_id, status=status, finished=time.time(), error=error)
+        await self.event(job_id, 'finished', status=status, error=error)
+        self.cancelling.discard(job_id)
+        self.processes.pop(job_id, None)
+        self.tasks.pop(job_id, None)
+        self.wake.set()
+
+    async def follow(self, job_id, workspace, process):
+        """Copy the job's console output to job.log and turn its event lines into job events.
+        Returns the error of the failed step, if one failed."""
+        prefix, error = EVENT_PREFIX.encode(), None
+        with open(os.path.join(workspace, 'job.log'), 'ab') as log:
+            while True:
+                try:
+                    line = await process.stdout.readline()
+                except ValueError:  # a line longer than the stream limit, already dropped
+                    continue
+                if not line:
+                    break
+                log.write(line)
+                if not line.startswith(prefix):
+                    continue
+                data = json.loads(line[len(prefix):])
+                event_type = data.pop('type')
+                if event_type == 'step_started':
+                    self.store.update(job_id, step=data['step'], step_index=data['index'])
+                elif event_type == 'step_failed':
+                    error = f"{data['step']}: {data.get('error')}"
+                await self.event(job_id, event_type, **data)
+        return error
+
+    def terminate(self, job_id, force=False):
+        process = self.processes.get(job_id)
+        if process is None or process.returncode is not None:
+            return
+        try:
+            if os.name != 'nt':
+                os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+            elif force:
+                process.kill()
+            else:
+                process.terminate()
+        except ProcessLookupError:
+            pass
+
+    async def kill_after_grace(self, job_id):
+        await asyncio.sleep(CANCEL_GRACE_S)
+        self.terminate(job_id, force=True)
+
+    # ------------
+    # Jobs
+    # ------------
+
+    def upload_path(self, upload_id):
+        folder = os.path.join(self.uploads_dir, upload_id)
+        if not re.fullmatch(r'\w+', upload_id) or not os.path.isdir(folder) or not os.listdir(folder):
+            raise HTTPError(400, f"Unknown upload '{upload_id}'")
+        return os.path.join(folder, os.listdir(folder)[0])
+
+    def check_local_path(self, key, path):
+        if not self.local_root:
+            raise HTTPError(403, f"{key} is disabled, set job_server.local_paths_root to allow server paths")
+        if not isinstance(path, str):
+            raise HTTPError(400, f"{key} must be a path")
+        full = os.path.realpath(path)
+        if os.path.commonpath([full, self.local_root]) != self.local_root:
+            raise HTTPError(403, f"{key} must be inside {self.local_root}")
+        if not os.path.exists(full):
+            raise HTTPError(400, f"{key} not found: {path}")
+
+    async def submit(self, spec):
+        if not any(spec.get(key) for key in ('url', 'upload', 'video_path', 'seed')):
+            raise HTTPError(400, "A job needs one of: url, upload, video_path, seed")
+        try:
+            steps = expand(spec.get('steps') or default_steps(bool(spec.get('dubbing'))))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        if spec.get('url') and 'step1' not in steps:
+            steps = ['step1'] + steps
+        if 'step1' in steps and not spec.get('url'):
+            raise HTTPError(400, "step1 needs a url")
+        if not isinstance(spec.get('config') or {}, dict):
+            raise HTTPError(400, "config must be an object of config.yaml keys")
+        if spec.get('upload'):
+            self.upload_path(spec['upload'])
+        for key in ('video_path', 'seed'):
+            if spec.get(key):
+                self.check_local_path(key, spec[key])
+        job_id = uuid.uuid4().hex[:12]
+        job = self.store.create(job_id, spec, steps, os.path.join(self.jobs_dir, job_id))
+        await self.event(job_id, 'queued', steps=steps)
+        self.wake.set()
+        return job
+
+    async def cancel(self, job_id):
+        job = self.job_or_404(job_id)
+        if job['status'] in FINISHED:
+            raise HTTPError(409, f"Job {job_id} is already {job['status']}")
+        if job['status'] == QUEUED:
+            self.store.update(job_id, status=CANCELLED, finished=time.time())
+            await self.event(job_id, 'finished', status=CANCELLED, error=None)
+        else:
+            self.cancelling.add(job_id)
+            self.terminate(job_id)
+            timer = asyncio.create_task(self.kill_after_grace(job_id))
+            self.timers.add(timer)
+            timer.add_done_callback(self.timers.discard)
+            await self.event(job_id, 'cancelling')
+        return self.store.get(job_id)
+
+    def job_or_404(self, job_id):
+        job = self.store.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"No job {job_id}")
+        return job
+
+    def view(self, job):
+        """The job as the API returns it: the stored row plus its progress"""
+        done = job['step_index'] if job['status'] != DONE else len(job['steps'])
+        return {**job, 'progress': {'step': job['step'], 'done': done or 0, 'total': len(job['steps'])}}
+
+    # ------------
+    # HTTP
+    # ------------
+
+    async def handle(self, reader, writer):
+        try:
+            request = await read_request(reader, writer)
+            for method, pattern, name in ROUTES:
+                m = re.fullmatch(pattern, request.path)
+                if m and method == request.method:
+                    result = await getattr(self, name)(request, **m.groupdict())
+                    if result is not None:
+                        await send_json(writer, *result)
+                    break
+            else:
+                known = any(re.fullmatch(pattern, request.path) for _, pattern, _ in ROUTES)
+                raise HTTPError(405 if known else 404, f"{request.method} {request.path} is not supported")
+        except HTTPError as e:
+            await send_json(writer, e.status, {'error': e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            await send_json(writer, 500, {'error': f"{type(e).__name__}: {e}"})
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def health(self, request):
+        return 200, {'status': 'ok', 'workers': self.workers, 'running': len(self.tasks)}
+
+    async def upload(self, request):
+        filename = safe_filename(request.arg('filename') or '')
+        extension = os.path.splitext(filename)[1][1:].lower()
+        if extension not in load_key("allowed_video_formats"):
+            raise HTTPError(400, f"filename must end in one of {list(load_key('allowed_video_formats'))}")
+        upload_id = uuid.uuid4().hex[:12]
+        folder = os.path.join(self.uploads_dir, upload_id)
+        os.makedirs(folder)
+        remaining = request.length
+        with open(os.path.join(folder, filename), 'wb') as f:
+            while remaining:
+                chunk = await request.reader.readexactly(min(CHUNK, remaining))
+                f.write(chunk)
+                remaining -= len(chunk)
+        return 201, {'upload': upload_id, 'filename': filename, 'size': request.length}
+
+    async def submit_job(self, request):
+        return 201, self.view(await self.submit(await request.json()))
+
+    async def list_jobs(self, request):
+        return 200, {'jobs': [self.view(job) for job in self.store.list(int(request.arg('limit', 50)))]}
+
+    async def get_job(self, request, job_id):
+        return 200, self.view(self.job_or_404(job_id))
+
+    async def cancel_job(self, request, job_id):
+        return 200, self.view(await self.cancel(job_id))
+
+    async def job_events(self, request, job_id):
+        self.job_or_404(job_id)
+        after = int(request.arg('after', 0))
+        if request.arg('stream') not in ('1', 'true'):
+            return 200, {'events': self.store.events(job_id, after)}
+        writer = request.writer
+        writer.write(response_head(200, 'text/event-stream; charset=utf-8', extra=('Cache-Control: no-cache',)))
+        while True:
+            async with self.changed:
+                # Read under the condition, so an event added before the wait still wakes it
+                events = self.store.events(job_id, after)
+                finished = self.store.get(job_id)['status'] in FINISHED
+                if not events and not finished:
+                    try:
+                        await asyncio.wait_for(self.changed.wait(), KEEPALIVE_S)
+                    except asyncio.TimeoutError:
+                        writer.write(b': keepalive\n\n')
+            for e in events:
+                writer.write(f"id: {e['id']}\nevent: {e['type']}\ndata: {json.dumps(e, ensure_ascii=False)}\n\n".encode('utf-8'))
+                after = e['id']
+            await writer.drain()
+            if finished and not events:
+                return None
+
+    async def job_log(self, request, job_id):
+        path = os.path.join(self.job_or_404(job_id)['workspace'], 'job.log')
+        if not os.path.exists(path):
+            return 200, {'lines': []}
+        with open(path, 'rb') as f:
+            f.seek(max(0, os.path.getsize(path) - 256 * 1024))
+            lines = f.read().decode('utf-8', 'replace').splitlines()
+        return 200, {'lines': lines[-int(request.arg('tail', 200)):]}
+
+    async def list_artifacts(self, request, job_id):
+        output = os.path.join(self.job_or_404(job_id)['workspace'], 'output')
+        files = []
+        for folder, _, names in os.walk(output):
+            for name in sorted(names):
+                path = os.path.join(folder, name)
+                files.append({'path': os.path.relpath(path, output).replace(os.sep, '/'), 'size': os.path.getsize(path)})
+        return 200, {'artifacts': files}
+
+    async def get_artifact(self, request, job_id, path):
+        output = os.path.join(self.job_or_404(job_id)['workspace'], 'output')
+        output = os.path.realpath(output)
+        full = os.path.realpath(os.path.join(output, path))
+        if os.path.commonpath([full, output]) != output or not os.path.isfile(full):
+            raise HTTPError(404, f"No artifact {path}")
+        content_type = mimetypes.guess_type(full)[0] or 'application/octet-stream'
+        disposition = f'Content-Disposition: attachment; filename="{os.path.basename(full)}"'
+        request.writer.write(response_head(200, content_type, os.path.getsize(full), extra=(disposition,)))
+        with open(full, 'rb') as f:
+            while chunk := f.read(CHUNK):
+                request.writer.write(chunk)
+                await request.writer.drain()
+        return None
+
+    # ------------
+    # Lifecycle
+    # ------------
+
+    async def start(self, host, port):
+        self.wake, self.changed = asyncio.Event(), asyncio.Condition()
+        for job_id in self.store.requeue_running():
+            await self.event(job_id, 'requeued')
+        self.server = await asyncio.start_server(self.handle, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.scheduler = asyncio.create_task(self.schedule())
+        return self.port
+
+    async def stop(self):
+        """Stop serving. Running jobs are terminated and stay 'running' in the store, so the next start queues them again"""
+        self.server.close()
+        self.scheduler.cancel()
+        processes = list(self.processes.items())
+        for job_id, _ in processes:
+            self.terminate(job_id)
+        for task in [*self.tasks.values(), *self.timers]:
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        try:
+            await asyncio.wait_for(asyncio.gather(*(process.wait() for _, process in processes)), CANCEL_GRACE_S)
+        except asyncio.TimeoutError:
+            for _, process in processes:
+                if process.returncode is None:
+                    process.kill()
+
+    async def run(self, host, port, ready=None):
+        await self.start(host, port)
+        print(f"🗂️ Job server on http://{host}:{self.port}, {self.workers} worker(s), jobs in {self.jobs_dir}", flush=True)
+        if ready is not None:
+            ready.set()
+        try:
+            await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await self.stop()
+
+def run_in_thread(jobs_dir, workers=2, host='127.0.0.1', port=0, local_root=None, config_file='config.yaml'):
+    """Start a server on a background thread (for tests and benchmarks). Returns (server, stop)"""
+    server = JobServer(jobs_dir, workers, config_file, local_root=local_root)
+    loop, ready = asyncio.new_event_loop(), threading.Event()
+    thread = threading.Thread(target=loop.run_until_complete, args=(server.run(host, port, ready),), daemon=True)
+    thread.start()
+    ready.wait()
+    def stop():
+        loop.call_soon_threadsafe(server.server.close)
+        thread.join(timeout=30)
+    return server, stop
+
+def main():
+    job_set = load_key("job_server")
+    parser = argparse.ArgumentParser(description="VideoLingo job server")
+    parser.add_argument('--host', default=job_set["host"])
+    parser.add_argument('--port', type=int, default=job_set["port"])
+    parser.add_argument('--workers', type=int, default=job_set["workers"], help="jobs run at the same time")
+    parser.add_argument('--jobs-dir', default=job_set["jobs_dir"], help="job workspaces and the queue database")
+    parser.add_argument('--local-paths-root', default=job_set["local_paths_root"], help="folder video_path and seed may point into (empty = refuse them)")
+    args = parser.parse_args()
+    server = JobServer(args.jobs_dir, args.workers, local_root=args.local_paths_root)
+    try:
+        asyncio.run(server.run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
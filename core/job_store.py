@@ -0,0 +1,104 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import time
+import sqlite3
+import threading
+
+# ------------
+# Queue state of the job server in one SQLite file: the jobs and the progress events of each.
+# It outlives the server and the UI, so jobs survive reloads and restarts.
+# ------------
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    steps TEXT NOT NULL,
+    workspace TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    step TEXT,
+    step_index INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_job ON events (job_id, id);
+"""
+
+class JobStore:
+    """Jobs and their events. Safe to share between threads; every call is one short transaction"""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['spec'], job['steps'] = json.loads(job['spec']), json.loads(job['steps'])
+        return job
+
+    def create(self, job_id, spec, steps, workspace):
+        with self.lock:
+            self.db.execute("INSERT INTO jobs (id, status, spec, steps, workspace, created) VALUES (?, ?, ?, ?, ?, ?)",
+                            (job_id, QUEUED, json.dumps(spec, ensure_ascii=False), json.dumps(steps), workspace, time.time()))
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self.lock:
+            return self._row(self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list(self, limit=50):
+        with self.lock:
+            rows = self.db.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def update(self, job_id, **fields):
+        columns = ', '.join(f"{key} = ?" for key in fields)
+        with self.lock:
+            self.db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def claim_next(self):
+        """Mark the oldest queued job running and return it, or None if the queue is empty"""
+        with self.lock:
+            row = self.db.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE jobs SET status = ?, started = ? WHERE id = ?", (RUNNING, time.time(), row['id']))
+        return self.get(row['id'])
+
+    def requeue_running(self):
+        """Jobs left running by a server that stopped; steps skip the outputs they already wrote"""
+        with self.lock:
+            ids = [row['id'] for row in self.db.execute("SELECT id FROM jobs WHERE status = ?", (RUNNING,)).fetchall()]
+            self.db.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING))
+        return ids
+
+    def add_event(self, job_id, event_type, **data):
+        with self.lock:
+            cursor = self.db.execute("INSERT INTO events (job_id, ts, type, data) VALUES (?, ?, ?, ?)",
+                                     (job_id, time.time(), event_type, json.dumps(data, ensure_ascii=False)))
+        return cursor.lastrowid
+
+    def events(self, job_id, after=0):
+        with self.lock:
+            rows = self.db.execute("SELECT * FROM events WHERE job_id = ? AND id > ? ORDER BY id", (job_id, after)).fetchall()
+        return [{'id': row['id'], 'ts': row['ts'], 'type': row['type'], **json.loads(row['data'])} for row in rows]
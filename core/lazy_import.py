@@ -0,0 +1,20 @@
+import sys
+import importlib.util
+
+def lazy_module(name):
+    """Module `name`, executed on its first attribute access instead of now.
+
+    Entry points bind every step module up front (`step2_whisper.transcribe()`), but a
+    Streamlit rerun or a batch settings check only touches a few of them, and the steps pull in
+    spaCy, pandas, torch and the TTS SDKs. An already imported module is returned as is."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
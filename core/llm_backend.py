@@ -0,0 +1,375 @@
+import os, sys, json, gzip, time, random, hashlib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from threading import Lock, Condition
+from contextlib import contextmanager
+from core.config_utils import load_key
+
+# ------------
+# Pluggable chat backends for ask_gpt. Each one turns (model, prompt, params) into
+# {'content': str, 'tokens_in': int, 'tokens_out': int, 'eval_s': float}
+# ------------
+
+class InjectedError(ConnectionError):
+    """Failure raised on purpose by the replay backend (error_rate)"""
+
+class ReplayMiss(KeyError):
+    """The replay archive has no answer for a prompt; retrying will not help"""
+
+class LLMBackend:
+    name = 'base'
+    parallel = None  # requests the server runs at once, None if unknown
+
+    def chat(self, model, prompt, params, prefix=''):
+        """`params` is a plain JSON-able dict: {'json': bool}. `prefix` is the
+        part of the prompt shared with other calls of the same kind (see prompts_storage.PromptText)"""
+        raise NotImplementedError
+
+class OllamaBackend(LLMBackend):
+    """ollama keeps one KV cache per parallel slot and serves a request from the slot sharing the
+    longest prefix with it. Requests are routed so no more distinct prefixes run at once than
+    there are slots, and keep_alive holds the model (and its caches) in memory between steps.
+    Options, slots and num_ctx come from the probed OllamaProfile."""
+    name = 'ollama'
+
+    def __init__(self):
+        from core.ollama_profile import OllamaProfile
+        llm_set = load_key("llm")
+        self.profile = OllamaProfile(load_key("api.model"), llm_set["ollama_profile"], llm_set["keep_alive"], llm_set["parallel"])
+        self.parallel = self.profile.parallel
+        # With an unknown slot count, prefixes are only limited by the thread count
+        self.router = PrefixRouter(self.parallel or load_key("max_workers"))
+
+    def chat(self, model, prompt, params, prefix=''):
+        import ollama  # reads OLLAMA_HOST on import
+        with self.router.route(prefix):
+            response = ollama.chat(
+                model=model,
+                messages=[{'role': 'user', 'content': prompt}],
+                options=self.profile.options(prompt),
+                format='json' if params.get('json') else None,
+                stream=False,
+                keep_alive=self.profile.keep_alive
+            )
+        self.profile.observe(prompt, response.get('prompt_eval_count'))
+        return {
+            'content': response['message']['content'],
+            'tokens_in': response.get('prompt_eval_count') or 0,
+            'tokens_out': response.get('eval_count') or 0,
+            'eval_s': (response.get('eval_duration') or 0) / 1e9,
+        }
+
+class OpenAIBackend(LLMBackend):
+    """Any OpenAI-compatible endpoint from the `api` settings"""
+    name = 'openai'
+
+    def __init__(self):
+        from openai import OpenAI
+        api_set = load_key("api")
+        if not api_set["key"]:
+            raise ValueError(f"⚠️API_KEY is missing")
+        base_url = api_set["base_url"].strip('/') + '/v1' if 'v1' not in api_set["base_url"] else api_set["base_url"]
+        self.client = OpenAI(api_key=api_set["key"], base_url=base_url)
+        self.json_models = load_key("llm_support_json")
+
+    def chat(self, model, prompt, params, prefix=''):
+        # OpenAI-style providers cache repeated prefixes on their own, no routing needed
+        response_format = {"type": "json_object"} if params.get('json') and model in self.json_models else None
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format=response_format,
+            timeout=150
+        )
+        usage = response.usage
+        return {
+            'content': response.choices[0].message.content,
+            'tokens_in': getattr(usage, 'prompt_tokens', 0) or 0,
+            'tokens_out': getattr(usage, 'completion_tokens', 0) or 0,
+        }
+
+# ------------
+# Prompt prefixes: routing to warm caches and hit statistics
+# ------------
+
+def prefix_key(prefix):
+    return hashlib.sha1(prefix.encode('utf-8')).hexdigest()
+
+class PrefixRouter:
+    """Admits a request at once if its prefix is already running (it will land on that warm slot),
+    otherwise waits until fewer than `slots` distinct prefixes are in flight. Prompts without a
+    prefix are not routed."""
+
+    def __init__(self, slots):
+        self.slots = max(1, slots)
+        self.running = {}
+        self.cond = Condition()
+
+    @contextmanager
+    def route(self, prefix):
+        if not prefix:
+            yield
+            return
+        key = prefix_key(prefix)
+        with self.cond:
+            self.cond.wait_for(lambda: key in self.running or len(self.running) < self.slots)
+            self.running[key] = self.running.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.running[key] -= 1
+                if not self.running[key]:
+                    del self.running[key]
+                self.cond.notify_all()
+
+class PrefixStats:
+    """Counts how often a prompt prefix repeats. Every repeat is a call whose prefix a warm cache
+    can skip; `chars_reusable` is how much prompt text that covers."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.seen = {}
+        self.calls = self.hits = self.chars = self.chars_reusable = 0
+
+    def record(self, prompt, prefix):
+        """True if the prefix was sent before"""
+        key = prefix_key(prefix) if prefix else None
+        with self.lock:
+            self.calls += 1
+            self.chars += len(prompt)
+            if key is None:
+                return False
+            hit = key in self.seen
+            self.seen[key] = self.seen.get(key, 0) + 1
+            if hit:
+                self.hits += 1
+                self.chars_reusable += len(prefix)
+            return hit
+
+    def summary(self):
+        with self.lock:
+            return {
+                'calls': self.calls, 'distinct_prefixes': len(self.seen), 'prefix_hits': self.hits,
+                'hit_rate': round(self.hits / self.calls, 3) if self.calls else 0.0,
+                'reusable_share': round(self.chars_reusable / self.chars, 3) if self.chars else 0.0,
+            }
+
+PREFIX_STATS = PrefixStats()
+
+class StepRates:
+    """Tokens and generation time per log title (one per pipeline step). Speed is eval tokens over
+    the server's eval time when the backend reports it, else over the wall time of the calls."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.steps = {}
+
+    def record(self, step, tokens_in, tokens_out, eval_s, wall_s):
+        with self.lock:
+            row = self.steps.setdefault(step, {'calls': 0, 'tokens_in': 0, 'tokens_out': 0, 'eval_s': 0.0, 'wall_s': 0.0})
+            row['calls'] += 1
+            row['tokens_in'] += tokens_in
+            row['tokens_out'] += tokens_out
+            row['eval_s'] += eval_s
+            row['wall_s'] += wall_s
+
+    def summary(self):
+        with self.lock:
+            rows = {step: dict(row) for step, row in self.steps.items()}
+        for row in rows.values():
+            seconds = row['eval_s'] or row['wall_s']
+            row['tokens_per_s'] = round(row['tokens_out'] / seconds, 1) if seconds else None
+        return rows
+
+STEP_RATES = StepRates()
+
+def print_llm_stats():
+    """Prompt prefix reuse and tokens/sec per step so far in this process"""
+    from rich.console import Console
+    from rich.table import Table
+    rows = STEP_RATES.summary()
+    if not rows:
+        return
+    table = Table(title="LLM usage")
+    for column in ("Step", "Calls", "Tokens in", "Tokens out", "Tokens/s"):
+        table.add_column(column, justify="left" if column == "Step" else "right")
+    for step, row in rows.items():
+        rate = row['tokens_per_s']
+        table.add_row(step, str(row['calls']), str(row['tokens_in']), str(row['tokens_out']), '-' if rate is None else f"{rate:.1f}")
+    console = Console()
+    console.print(table)
+    stats = PREFIX_STATS.summary()
+    console.print(f"[cyan]🧩 Prompt prefix reuse: {stats['prefix_hits']}/{stats['calls']} calls hit one of "
+                  f"{stats['distinct_prefixes']} prefixes, {stats['reusable_share']:.0%} of prompt text cacheable[/cyan]")
+
+# ------------
+# Archive: one JSON record per line, gzip if the path ends in .gz, so it can be copied between machines
+# ------------
+
+def request_key(model, prompt, params):
+    blob = json.dumps([model, prompt, params], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+def prompt_key(prompt):
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+class LLMArchive:
+    """(model, prompt, params) -> response records. Lookups try the exact request first and then
+    the prompt alone, so an archive recorded with one model or option set still replays under another."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = Lock()
+        self.by_request, self.by_prompt = {}, {}
+        if os.path.exists(path):
+            with self._open('rt') as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def _open(self, mode):
+        if self.path.endswith('.gz'):
+            return gzip.open(self.path, mode, encoding='utf-8')
+        return open(self.path, mode, encoding='utf-8')
+
+    def _index(self, record):
+        self.by_request[record['key']] = record
+        self.by_prompt.setdefault(prompt_key(record['prompt']), record)
+
+    def __len__(self):
+        return len(self.by_request)
+
+    def lookup(self, model, prompt, params):
+        return self.by_request.get(request_key(model, prompt, params)) or self.by_prompt.get(prompt_key(prompt))
+
+    def add(self, model, prompt, params, result, latency_s=None):
+        record = {
+            'key': request_key(model, prompt, params), 'model': model, 'prompt': prompt, 'params': params,
+            'content': result['content'], 'tokens_in': result.get('tokens_in', 0), 'tokens_out': result.get('tokens_out', 0),
+            'latency_s': None if latency_s is None else round(latency_s, 3),
+        }
+        with self.lock:
+            if record['key'] in self.by_request:
+                return
+            self._index(record)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Appending to a gzip file adds a new member; gzip readers concatenate them
+            with self._open('at') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+class RecordingBackend(LLMBackend):
+    """Passes calls through to `inner` and appends every answer to the archive"""
+
+    def __init__(self, inner, archive):
+        self.inner, self.archive = inner, archive
+        self.name = f'{inner.name}+record'
+        self.parallel = inner.parallel
+
+    def chat(self, model, prompt, params, prefix=''):
+        t = time.perf_counter()
+        result = self.inner.chat(model, prompt, params, prefix)
+        self.archive.add(model, prompt, params, result, time.perf_counter() - t)
+        return result
+
+class ReplayBackend(LLMBackend):
+    """Serves recorded answers without a server. `latency` (+ uniform `jitter`) seconds are slept
+    per call, or the recorded latency when `latency` is None; a fraction `error_rate` of calls
+    raises InjectedError, which ask_gpt retries like a network failure."""
+    name = 'replay'
+
+    def __init__(self, archive, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.archive = archive
+        self.latency, self.jitter, self.error_rate = latency, jitter, error_rate
+        self.random = random.Random(seed)
+        self.lock = Lock()
+        self.served = self.missed = self.injected = 0
+
+    def chat(self, model, prompt, params, prefix=''):
+        with self.lock:
+            fail = self.random.random() < self.error_rate
+            jitter = self.random.uniform(0, self.jitter) if self.jitter else 0.0
+        record = self.archive.lookup(model, prompt, params)
+        delay = ((record or {}).get('latency_s') or 0.0) if self.latency is None else self.latency
+        time.sleep(delay + jitter)
+        with self.lock:
+            if fail:
+                self.injected += 1
+            elif record is None:
+                self.missed += 1
+            else:
+                self.served += 1
+        if fail:
+            raise InjectedError("injected replay failure")
+        if record is None:
+            raise ReplayMiss(f"No recorded answer for this prompt in {self.archive.path}: {prompt[:80]!r}")
+        return {'content': record['content'], 'tokens_in': record['tokens_in'], 'tokens_out': record['tokens_out']}
+
+# ------------
+# Backend selection from config
+# ------------
+
+BACKENDS = {'ollama': OllamaBackend, 'openai': OpenAIBackend}
+_cache = {}
+_cache_lock = Lock()
+
+def get_backend():
+    """Backend for the current `llm` settings and model, built once per distinct setting"""
+    llm_set = load_key("llm")
+    signature = json.dumps([llm_set, load_key("api.model")], sort_keys=True)
+    with _cache_lock:
+        if signature not in _cache:
+            _cache[signature] = build_backend(llm_set)
+        return _cache[signature]
+
+def llm_workers():
+    """Threads for concurrent LLM calls: max_workers, but no more than the server runs at once"""
+    parallel = get_backend().parallel
+    return min(load_key("max_workers"), parallel) if parallel else load_key("max_workers")
+
+def build_backend(llm_set):
+    name = llm_set["backend"]
+    if name == 'replay':
+        replay_set = llm_set["replay"]
+        backend = ReplayBackend(LLMArchive(replay_set["archive"]), latency=replay_set["latency"],
+                                jitter=replay_set["jitter"], error_rate=replay_set["error_rate"], seed=replay_set["seed"])
+    elif name in BACKENDS:
+        backend = BACKENDS[name]()
+    else:
+        raise ValueError(f"Unknown llm.backend '{name}', expected one of {sorted(BACKENDS) + ['replay']}")
+    if llm_set["record"]:
+        backend = RecordingBackend(backend, LLMArchive(llm_set["record"]))
+    return backend
+
+def import_gpt_log(log_folder, archive_path):
+    """Seed an archive from an existing output/gpt_log. The logs keep parsed answers, which are
+    stored re-serialized as JSON"""
+    archive = LLMArchive(archive_path)
+    before = len(archive)
+    for name in sorted(os.listdir(log_folder)):
+        if not name.endswith('.json') or name == 'error.json':
+            continue
+        with open(os.path.join(log_folder, name), 'r', encoding='utf-8') as f:
+            for item in json.load(f):
+                response = item["response"]
+                is_json = not isinstance(response, str)
+                content = json.dumps(response, ensure_ascii=False) if is_json else response
+                archive.add(item["model"], item["prompt"], {'json': is_json}, {'content': content})
+    return len(archive) - before
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="LLM answer archives for offline replay")
+    sub = parser.add_subparsers(dest='command', required=True)
+    imp = sub.add_parser('import', help="build an archive from an output/gpt_log folder")
+    imp.add_argument('log_folder')
+    imp.add_argument('archive')
+    info = sub.add_parser('info', help="record count and token totals of an archive")
+    info.add_argument('archive')
+    args = parser.parse_args()
+    if args.command == 'import':
+        print(f"Added {import_gpt_log(args.log_folder, args.archive)} records to {args.archive}")
+    else:
+        archive = LLMArchive(args.archive)
+        records = archive.by_request.values()
+        print(f"{len(archive)} records, {len(archive.by_prompt)} distinct prompts, "
+              f"{sum(r['tokens_in'] for r in records)} tokens in, {sum(r['tokens_out'] for r in records)} tokens out")
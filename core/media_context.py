@@ -0,0 +1,146 @@
+import os, sys, json, glob, subprocess
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fractions import Fraction
+from threading import Lock
+from core.config_utils import load_key, get_joiner
+from core.telemetry import span
+
+# ------------
+# Per-job metadata (the source video, its ffprobe result, the transcription language) derived
+# once and shared by every step. Each value is cached against the stat of the file it comes
+# from, so a re-download, a trimmed video or a new transcription is picked up, and a job in
+# another working directory never sees this one's values.
+# ------------
+
+VIDEO_DIR = 'output'
+LANGUAGE_FILE = 'output/log/transcript_language.json'
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+class _StatCache:
+    """Values keyed by absolute path, recomputed when the path's stat changes"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.entries = {}
+
+    def get(self, path, compute):
+        path = os.path.abspath(path)
+        key = _stat_key(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == key and key is not None:
+                return entry[1]
+        value = compute()
+        with self.lock:
+            self.entries[path] = (key, value)
+        return value
+
+_videos = _StatCache()
+_probes = _StatCache()
+_languages = _StatCache()
+
+class MediaInfo:
+    """One ffprobe of a media file: duration, streams, and the format of its first audio and video stream"""
+
+    def __init__(self, path, probe):
+        self.path = path
+        self.streams = probe.get('streams', [])
+        self.duration = float(probe.get('format', {}).get('duration') or 0)
+        audio = next((s for s in self.streams if s.get('codec_type') == 'audio'), {})
+        video = next((s for s in self.streams if s.get('codec_type') == 'video'), {})
+        self.has_audio, self.has_video = bool(audio), bool(video)
+        self.sample_rate = int(audio['sample_rate']) if audio.get('sample_rate') else None
+        self.channels = audio.get('channels')
+        self.width, self.height = video.get('width'), video.get('height')
+        rate = video.get('avg_frame_rate') or video.get('r_frame_rate') or '0/1'
+        self.fps = float(Fraction(rate)) if rate not in ('0/0', '') else None
+
+def probe_media(path):
+    """ffprobe `path` once; later calls return the cached result until the file changes"""
+    def run():
+        with span("ffprobe", file=os.path.basename(path)):
+            cmd = ['ffprobe', '-v', 'error', '-show_format', '-show_streams', '-of', 'json', path]
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return MediaInfo(path, json.loads(result.stdout))
+    return _probes.get(path, run)
+
+def find_video_file(save_path=VIDEO_DIR):
+    """The one source video in `save_path`. The listing is cached until an entry of the directory
+    is added, removed or renamed, which updates its mtime."""
+    def scan():
+        allowed = load_key("allowed_video_formats")
+        video_files = [file for file in glob.glob(save_path + "/*") if os.path.splitext(file)[1][1:].lower() in allowed]
+        # change \\ to /, this happen on windows
+        if sys.platform.startswith('win'):
+            video_files = [file.replace("\\", "/") for file in video_files]
+        return [file for file in video_files if not file.startswith("output/output")]
+    video_files = _videos.get(save_path, scan)
+    # if num != 1, raise ValueError
+    if len(video_files) != 1:
+        raise ValueError(f"Number of videos found is not unique. Please check. Number of videos found: {len(video_files)}")
+    return video_files[0]
+
+def save_language(language):
+    os.makedirs(os.path.dirname(LANGUAGE_FILE), exist_ok=True)
+    with open(LANGUAGE_FILE, 'w', encoding='utf-8') as f:
+        json.dump({"language": language}, f, ensure_ascii=False, indent=4)
+
+def _read_language():
+    try:
+        with open(LANGUAGE_FILE, "r", encoding='utf-8') as f:
+            return json.load(f)["language"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+class JobContext:
+    """Metadata of the job in the current working directory, each part derived on first use.
+    Steps read it through `job_context()` instead of probing files themselves."""
+
+    @property
+    def video_file(self):
+        return find_video_file()
+
+    @property
+    def media(self):
+        return probe_media(self.video_file)
+
+    @property
+    def duration(self):
+        return self.media.duration
+
+    @property
+    def sample_rate(self):
+        return self.media.sample_rate
+
+    @property
+    def streams(self):
+        return self.media.streams
+
+    @property
+    def detected_language(self):
+        """The language whisper detected, None before transcription"""
+        language = _languages.get(LANGUAGE_FILE, _read_language)
+        if language is None:
+            print("Unable to read language information")
+        return language
+
+    @property
+    def language(self):
+        """The source language: whisper.language when it is forced, the detected one for 'auto'"""
+        whisper_language = load_key("whisper.language")
+        return self.detected_language if whisper_language == 'auto' else whisper_language
+
+    @property
+    def joiner(self):
+        return get_joiner(self.language)
+
+_CONTEXT = JobContext()
+
+def job_context():
+    return _CONTEXT
@@ -0,0 +1,88 @@
+import os, sys, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from threading import Lock
+from core.config_utils import load_key
+
+# ------------
+# Tiered routing: cheap tiers (the rule split, small models) answer first, and a task only
+# reaches api.model when every cheaper tier failed or was not confident
+# ------------
+
+HEURISTIC = 'heuristic'
+
+class TierStats:
+    """Per task and tier: attempts, accepted answers and seconds spent"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.rows = {}
+
+    def record(self, task, tier, outcome, seconds):
+        with self.lock:
+            row = self.rows.setdefault((task, tier), {'tried': 0, 'accepted': 0, 'escalated': 0, 'errors': 0, 'seconds': 0.0})
+            row['tried'] += 1
+            row[outcome] += 1
+            row['seconds'] += seconds
+
+    def reset(self):
+        with self.lock:
+            self.rows = {}
+
+    def summary(self):
+        with self.lock:
+            rows = {key: dict(row) for key, row in self.rows.items()}
+        for row in rows.values():
+            row['hit_rate'] = round(row['accepted'] / row['tried'], 3)
+            row['avg_s'] = round(row['seconds'] / row['tried'], 3)
+        return rows
+
+# One step's numbers: each routed step resets them when it starts and prints them when it ends
+ROUTER_STATS = TierStats()
+
+def reset_router_stats():
+    ROUTER_STATS.reset()
+
+def router_settings():
+    return load_key("llm.router")
+
+def router_tiers(task_has_heuristic=True):
+    """Tiers tried before api.model, in order. Empty when routing is off"""
+    router_set = router_settings()
+    if not router_set["enabled"]:
+        return []
+    return [tier for tier in router_set["tiers"] if tier != HEURISTIC or task_has_heuristic]
+
+def route(task, attempts):
+    """Run `attempts` ([(tier, fn)]) in order and return the first answer that is not None.
+    An exception or None from a lower tier escalates to the next one; the last tier (api.model)
+    answers as it always did, errors included."""
+    for n, (tier, fn) in enumerate(attempts):
+        last = n == len(attempts) - 1
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception:
+            ROUTER_STATS.record(task, tier, 'errors', time.perf_counter() - start)
+            if last:
+                raise
+            continue
+        ROUTER_STATS.record(task, tier, 'accepted' if result is not None or last else 'escalated', time.perf_counter() - start)
+        if result is not None or last:
+            return result
+
+def print_router_stats(reset=True):
+    """Print the per-tier table of the current step, then clear it so the next step starts from zero"""
+    rows = ROUTER_STATS.summary()
+    if reset:
+        ROUTER_STATS.reset()
+    if not rows:
+        return
+    from rich.console import Console
+    from rich.table import Table
+    table = Table(title="Model tiers")
+    for column in ("Task", "Tier", "Tried", "Accepted", "Escalated", "Errors", "Hit rate", "Avg s"):
+        table.add_column(column, justify="left" if column in ("Task", "Tier") else "right")
+    for (task, tier), row in rows.items():
+        table.add_row(task, tier, str(row['tried']), str(row['accepted']), str(row['escalated']), str(row['errors']),
+                      f"{row['hit_rate']:.0%}", f"{row['avg_s']:.2f}")
+    Console().print(table)
@@ -0,0 +1,131 @@
+import os, sys, math, time, json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from rich import print as rprint
+from core.config_utils import load_key
+
+# Sampling options every profile sends
+SAMPLING = {'temperature': 0.7, 'top_p': 0.9, 'mirostat': 0}
+
+# Hardware options per profile. Options left out are decided by ollama from the machine it runs on
+PROFILES = {
+    'auto': {},
+    'gpu': {'num_gpu': 999},  # every layer on the GPU
+    'cpu': {'num_gpu': 0, 'num_thread': os.cpu_count()},
+    'desktop-8gb': {'num_gpu': 15, 'num_thread': 6},  # the previous fixed options: RTX 4060 Ti 8GB partial offload, i7-13700
+}
+
+MIN_CTX = 4096
+CTX_STEP = 2048
+DEFAULT_MODEL_CTX = 8192
+PARALLEL_CANDIDATES = (2, 4, 8)
+
+def estimate_tokens(text):
+    """Rough token count before calibration: one token per CJK/kana/hangul char, one per 4 other chars"""
+    wide = sum(1 for c in text if ord(c) >= 0x2E80)
+    return wide + (len(text) - wide) / 4
+
+def model_context_length(show_response):
+    info = getattr(show_response, 'modelinfo', None) or {}
+    for key, value in info.items():
+        if key.endswith('.context_length'):
+            return int(value)
+    return DEFAULT_MODEL_CTX
+
+def measure_parallel(model, keep_alive, options, tolerance=1.6):
+    """Slots the server runs at once: n short generations in parallel finish in about the time of
+    one when there are at least n slots, and take about n times as long when there is one."""
+    import ollama
+    def one(_):
+        ollama.generate(model=model, prompt='Reply with OK.', keep_alive=keep_alive,
+                        options={**options, 'num_predict': 8, 'temperature': 0})
+    t = time.perf_counter()
+    one(0)
+    single = max(time.perf_counter() - t, 0.05)  # below that it is timing noise
+    slots = 1
+    for n in PARALLEL_CANDIDATES:
+        t = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n) as executor:
+            list(executor.map(one, range(n)))
+        if time.perf_counter() - t > single * tolerance:
+            break
+        slots = n
+    return slots
+
+def get_cache_path():
+    return os.path.join(load_key("model_dir"), 'ollama_parallel.json')
+
+def cached_parallel(model, keep_alive, options, cache_path=None):
+    """measure_parallel once per server and model, then cached on disk: every job process would
+    otherwise spend 15 generations finding the same answer"""
+    cache_path = cache_path or get_cache_path()
+    key = f"{os.getenv('OLLAMA_HOST', '127.0.0.1:11434')} {model}"
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if key in cache:
+            return cache[key]['parallel']
+    slots = measure_parallel(model, keep_alive, options)
+    cache[key] = {'parallel': slots, 'measured_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=4)
+    return slots
+
+class OllamaProfile:
+    """Server capabilities probed once per model, and the request options derived from them.
+
+    num_ctx follows the prompt size, rounded up to CTX_STEP and capped at the model's context
+    length. It never shrinks within a session: ollama reloads the model whenever num_ctx changes.
+    The token estimate is calibrated with the prompt_eval_count of answered requests."""
+
+    def __init__(self, model, profile='auto', keep_alive='30m', parallel=0):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown llm.ollama_profile '{profile}', expected one of {list(PROFILES)}")
+        self.model, self.profile, self.keep_alive = model, profile, keep_alive
+        self.hardware = PROFILES[profile]
+        self.lock = Lock()
+        self.num_ctx = MIN_CTX
+        self.calibration = 1.0
+        self.max_ctx, self.on_gpu = DEFAULT_MODEL_CTX, None
+        # None = unknown: OLLAMA_NUM_PARALLEL is a server setting the client can't see, so nothing is capped
+        self.parallel = parallel if isinstance(parallel, int) and parallel > 0 else None
+        self.probe(parallel)
+
+    def probe(self, parallel):
+        import ollama
+        try:
+            self.max_ctx = model_context_length(ollama.show(self.model))
+            # An empty prompt only loads the model, with keep_alive holding it for the whole video
+            ollama.generate(model=self.model, prompt='', keep_alive=self.keep_alive, options=self.options(''))
+            loaded = [m for m in ollama.ps().models if m.model == self.model or m.name == self.model]
+            self.on_gpu = bool(loaded and loaded[0].size_vram)
+            if parallel == 'auto':
+                self.parallel = cached_parallel(self.model, self.keep_alive, self.options(''))
+        except Exception as e:
+            rprint(f"[yellow]⚠️ Could not probe the ollama server ({e}), using {self.parallel or 'unknown'} slot(s) and num_ctx {self.num_ctx}[/yellow]")
+            return
+        where = 'GPU' if self.on_gpu else 'CPU'
+        rprint(f"[blue]🦙 ollama {self.model}: {where}, context {self.max_ctx}, {self.parallel or 'unknown'} parallel slot(s), profile '{self.profile}', keep_alive {self.keep_alive}[/blue]")
+
+    def context_for(self, prompt):
+        need = estimate_tokens(prompt) * self.calibration
+        # room for the answer: the JSON answers echo the lines they translate
+        need += max(1024, need / 2)
+        ctx = min(self.max_ctx, max(MIN_CTX, math.ceil(need / CTX_STEP) * CTX_STEP))
+        with self.lock:
+            self.num_ctx = max(self.num_ctx, ctx)
+            return self.num_ctx
+
+    def options(self, prompt):
+        return {**SAMPLING, **self.hardware, 'num_ctx': self.context_for(prompt)}
+
+    def observe(self, prompt, prompt_eval_count):
+        """Calibrate the estimate with a measured prompt size. Cached prefixes are not counted in
+        prompt_eval_count, so only the largest ratio seen is kept."""
+        estimate = estimate_tokens(prompt)
+        if prompt_eval_count and estimate > 0:
+            with self.lock:
+                self.calibration = min(3.0, max(self.calibration, prompt_eval_count / estimate))
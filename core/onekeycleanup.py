@@ -1,12 +1,12 @@
 import os, sys
 import glob
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core.step1_ytdlp import find_video_files
+from core.media_context import find_video_file
 import shutil
 
 def cleanup(history_dir="history"):
     # Get video file name
-    video_file = find_video_files()
+    video_file = find_video_file()
     video_name = video_file.split("/")[1]
     video_name = os.path.splitext(video_name)[0]
     video_name = sanitize_filename(video_name)
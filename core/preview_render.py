@@ -0,0 +1,87 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rich import print as rprint
+from core.media_context import job_context
+from core.chunked_render import shift_srt
+from core.encoder_probe import select_encoder
+from core.step7_merge_sub_to_vid import build_subtitle_filter, run_ffmpeg
+
+SRC_SRT = "output/src_subtitles.srt"
+TRANS_SRT = "output/trans_subtitles.srt"
+PREVIEW_DIR = "output/preview"
+PREVIEW_RESOLUTION = (640, 360)
+
+def get_soft_preview_path(container='mp4'):
+    # `output/output*` is excluded by find_video_file, so the preview is never mistaken for the source
+    return f"output/output_video_preview.{container}"
+
+def mux_soft_subtitles(container='mp4'):
+    """Stream-copy the source and add both SRT files as subtitle tracks, no video encode involved.
+    mp4 gets mov_text tracks, mkv keeps them as srt."""
+    if not os.path.exists(SRC_SRT) or not os.path.exists(TRANS_SRT):
+        raise FileNotFoundError("Subtitle files not found in the 'output' directory.")
+    video_file = job_context().video_file
+    output_file = get_soft_preview_path(container)
+    sub_codec = 'mov_text' if container == 'mp4' else 'srt'
+    cmd = [
+        'ffmpeg', '-y', '-i', video_file, '-i', SRC_SRT, '-i', TRANS_SRT,
+        '-map', '0:v', '-map', '0:a?', '-map', '1:s', '-map', '2:s',
+        '-c', 'copy', '-c:s', sub_codec,
+        '-metadata:s:s:0', 'title=Source', '-metadata:s:s:1', 'title=Translation',
+        '-disposition:s:0', 'default', output_file
+    ]
+    if not run_ffmpeg(cmd, "Soft subtitle preview"):
+        raise RuntimeError("Failed to mux the subtitle preview. Please check the logs above.")
+    rprint(f"[bold green]Subtitle preview saved to {output_file}[/bold green]")
+    return output_file
+
+def parse_time_ranges(text):
+    """'00:01:00-00:01:30, 125-140' -> [(60.0, 90.0), (125.0, 140.0)]"""
+    def to_seconds(t):
+        seconds = 0.0
+        for part in t.strip().split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    ranges = []
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        start, end = item.split('-')
+        start, end = to_seconds(start), to_seconds(end)
+        if end <= start:
+            raise ValueError(f"Invalid time range: {item.strip()}")
+        ranges.append((start, end))
+    return ranges
+
+def render_burned_clips(ranges):
+    """Low-res burned-in clips of the selected time ranges, encoded with the fast-preview profile.
+    Returns (clips, failed): the rendered files and the (start, end) ranges whose ffmpeg run failed"""
+    video_file = job_context().video_file
+    choice = select_encoder('fast-preview')
+    os.makedirs(PREVIEW_DIR, exist_ok=True)
+    with open(SRC_SRT, 'r', encoding='utf-8') as f:
+        src_content = f.read()
+    with open(TRANS_SRT, 'r', encoding='utf-8') as f:
+        trans_content = f.read()
+
+    clips, failed = [], []
+    for i, (start, end) in enumerate(ranges):
+        src_srt, trans_srt = f"{PREVIEW_DIR}/src_{i}.srt", f"{PREVIEW_DIR}/trans_{i}.srt"
+        with open(src_srt, 'w', encoding='utf-8') as f:
+            f.write(shift_srt(src_content, start, end))
+        with open(trans_srt, 'w', encoding='utf-8') as f:
+            f.write(shift_srt(trans_content, start, end))
+        clip = f"{PREVIEW_DIR}/clip_{i}_{int(start)}_{int(end)}.mp4"
+        vf = build_subtitle_filter(*PREVIEW_RESOLUTION, src_srt, trans_srt) + choice['vf_suffix']
+        cmd = ['ffmpeg', '-y'] + choice['input_args'] + [
+            '-ss', f'{start:.3f}', '-i', video_file, '-t', f'{end - start:.3f}',
+            '-vf', vf.encode('utf-8'),
+        ] + choice['params'] + ['-c:a', 'aac', clip]
+        if run_ffmpeg(cmd, f"Preview clip {start:.1f}s-{end:.1f}s"):
+            clips.append(clip)
+        else:
+            failed.append((start, end))
+    return clips, failed
+
+if __name__ == "__main__":
+    mux_soft_subtitles()
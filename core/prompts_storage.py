@@ -1,10 +1,27 @@
 import re
 import os,sys,json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core.step2_whisper import get_whisper_language
+from core.media_context import job_context
 from core.config_utils import load_key
 from typing import Dict, Any, Optional
 
+class PromptText(str):
+    """A prompt whose first `len(prefix)` characters are the same for every call of its kind:
+    rules, instructions and per-video context first, the lines to process last. Providers and
+    ollama reuse the KV cache for a repeated prefix, and ask_gpt routes on it."""
+
+    def __new__(cls, prefix, suffix):
+        prompt = super().__new__(cls, prefix + suffix)
+        prompt.prefix = prefix
+        return prompt
+
+    def __add__(self, other):
+        # Appending (the retry padding in split_sentence) keeps the prefix
+        return PromptText(self.prefix, str(self)[len(self.prefix):] + other)
+
+def compose(prefix, suffix):
+    return PromptText(prefix.strip() + '\n\n', suffix.strip())
+
 COMMON_RULES = """
 ### Critical Requirements
 1. DO NOT generate empty lines or lines with only spaces
@@ -21,7 +38,7 @@ def get_split_prompt(sentence, num_parts = 2, word_limit = 20):
 
     sentence = preprocess_text(sentence)
 
-    language = get_whisper_language()
+    language = job_context().detected_language
     split_prompt = f"""
 ### Role and Task
 You are a professional Netflix subtitle splitter in {language}. Split the given subtitle text into {num_parts} parts, each less than {word_limit} words.
@@ -62,22 +79,22 @@ Ensure:
 2. Split parts are complete fragments.
 3. No [br] at sentence start/end (critical error if violated).
 
+""".strip()
+
+    given_text = f"""
 ### Given Text
 <split_this_sentence>
 {sentence}
 </split_this_sentence>
+"""
 
-""".strip()
-
-    prompt = f"{COMMON_RULES}\n\n{split_prompt}"
-
-    return prompt
+    return compose(f"{COMMON_RULES}\n\n{split_prompt}", given_text)
 
 
 ## ================================================================
 # @ step4_1_summarize.py
 def get_summary_prompt(source_content):
-    src_language = get_whisper_language()
+    src_language = job_context().detected_language
     TARGET_LANGUAGE = load_key("target_language")
     summary_prompt = f"""
 ### Role
@@ -143,17 +160,28 @@ Please output your analysis results in the following JSON format, where <> repre
     ]
 }}
 
+""".strip()
+
+    video_text = f"""
 ### Video text data to be processed
 <video_text_to_summarize>
 {source_content}
 </video_text_to_summarize>
-""".strip()
+"""
 
-    return summary_prompt
+    return compose(summary_prompt, video_text)
 
 ## ================================================================
 # @ step5_translate.py & translate_lines.py
-def generate_shared_prompt(previous_content_prompt, after_content_prompt, summary_prompt, things_to_note_prompt):
+def generate_video_context(summary_prompt, things_to_note_prompt):
+    # Same for every chunk of a video, so it goes into the prompt prefix
+    return f'''### Content Summary
+{summary_prompt}
+
+### Points to Note
+{things_to_note_prompt}'''
+
+def generate_neighbor_context(previous_content_prompt, after_content_prompt):
     return f'''### Context Information
 <previous_content>
 {previous_content_prompt}
@@ -161,15 +189,9 @@ def generate_shared_prompt(previous_content_prompt, after_content_prompt, summar
 
 <subsequent_content>
 {after_content_prompt}
-</subsequent_content>
-
-### Content Summary
-{summary_prompt}
+</subsequent_content>'''
 
-### Points to Note
-{things_to_note_prompt}'''
-
-def get_prompt_faithfulness(lines, shared_prompt):
+def get_prompt_faithfulness(lines, video_context, neighbor_context):
     TARGET_LANGUAGE = load_key("target_language")
     # Split lines by \n
     line_splits = lines.split('\n')
@@ -215,8 +237,10 @@ Example of INCORRECT format (DO NOT USE):
 }
 """
 
-    src_language = get_whisper_language()
+    src_language = job_context().detected_language
     prompt_faithfulness = f'''
+{video_context}
+
 ### Role Definition
 You are a professional Netflix subtitle translator, fluent in both {src_language} and {TARGET_LANGUAGE}, as well as their respective cultures. Your expertise lies in accurately understanding the semantics and structure of the original {src_language} text and faithfully translating it into {TARGET_LANGUAGE} while preserving the original meaning.
 
@@ -229,30 +253,31 @@ Based on the provided original {src_language} subtitles, you need to:
 2. Ensure the translation is faithful to the original, accurately conveying the original meaning
 3. Consider the context and professional terminology
 
-{shared_prompt}
-
 ### Translation Principles
 1. Faithful to the original: Accurately convey the content and meaning of the original text, without arbitrarily changing, adding, or omitting content.
 2. Accurate terminology: Use professional terms correctly and maintain consistency in terminology.
 3. Understand the context: Fully comprehend and reflect the background and contextual relationships of the text.
 
+{format_validation}
+'''
+
+    subtitle_data = f'''
+{neighbor_context}
+
 ### Subtitle Data
 <subtitles>
 {lines}
 </subtitles>
 
-{format_validation}
-
 ### Output Format
 Please complete the following JSON data, maintaining a flat structure where each subtitle line is a top-level entry:
 {json.dumps(json_format, ensure_ascii=False, indent=4)}
 '''
     
-    prompt = f"{COMMON_RULES}\n\n{prompt_faithfulness}"
-    return prompt.strip()
+    return compose(f"{COMMON_RULES}\n\n{prompt_faithfulness}", subtitle_data)
 
 
-def get_prompt_expressiveness(faithfulness_result, lines, shared_prompt):
+def get_prompt_expressiveness(faithfulness_result, lines, video_context, neighbor_context):
     TARGET_LANGUAGE = load_key("target_language")
     json_format = {}
     for key, value in faithfulness_result.items():
@@ -263,8 +288,10 @@ def get_prompt_expressiveness(faithfulness_result, lines, shared_prompt):
             "free": f"<<retranslated result, aiming for fluency and naturalness, conforming to {TARGET_LANGUAGE} expression habits, DO NOT leave empty line here!>>"
         }
 
-    src_language = get_whisper_language()
+    src_language = job_context().detected_language
     prompt_expressiveness = f'''
+{video_context}
+
 ### Role Definition
 You are a professional Netflix subtitle translator and language consultant. Your expertise lies not only in accurately understanding the original {src_language} but also in optimizing the {TARGET_LANGUAGE} translation to better suit the target language's expression habits and cultural background.
 
@@ -277,8 +304,6 @@ Based on the provided original {src_language} text and {TARGET_LANGUAGE} direct
 2. Provide detailed modification suggestions
 3. Perform free translation based on your analysis
 
-{shared_prompt}
-
 ### Translation Analysis Steps
 Please use a two-step thinking process to handle the text line by line:
 
@@ -292,6 +317,10 @@ Please use a two-step thinking process to handle the text line by line:
    - Aim for contextual smoothness and naturalness, conforming to {TARGET_LANGUAGE} expression habits
    - Ensure it's easy for {TARGET_LANGUAGE} audience to understand and accept
    - Keep the subtitles concise, with a plain and natural language style, and maintain consistency in structure between the free translation and the {src_language} original
+'''
+
+    subtitle_data = f'''
+{neighbor_context}
 
 ### Subtitle Data
 <subtitles>
@@ -303,15 +332,14 @@ Make sure to generate the correct Json format, don't output " in the value.
 Please complete the following JSON data, where << >> represents placeholders that should not appear in your answer, and return your translation results in JSON format:
 {json.dumps(json_format, ensure_ascii=False, indent=4)}
 '''
-    prompt = f"{COMMON_RULES}\n\n{prompt_expressiveness}"
-    return prompt.strip()
+    return compose(f"{COMMON_RULES}\n\n{prompt_expressiveness}", subtitle_data)
 
 
 ## ================================================================
 # @ step6_splitforsub.py
 def get_align_prompt(src_sub, tr_sub, src_part):
     TARGET_LANGUAGE = load_key("target_language")
-    src_language = get_whisper_language()
+    src_language = job_context().detected_language
     src_splits = src_part.split('\n')
     num_parts = len(src_splits)
     src_part = src_part.replace('\n', ' [br] ')
@@ -329,19 +357,21 @@ Based on the provided original {src_language} and {target_language} original sub
 3. Evaluate these schemes and select the best one
 4. Never leave empty lines. If it's difficult to split based on meaning, you may appropriately rewrite the sentences that need to be aligned
 
-### Subtitle Data
-<subtitles>
-{src_language} Original: "{src_sub}"
-{target_language} Original: "{tr_sub}"
-Pre-processed {src_language} Subtitles ([br] indicates split points): {src_part}
-</subtitles>
-
 ### Processing Steps
 Please follow these steps and provide the results for each step in the JSON output:
 1. Analysis and Comparison: Briefly analyze the word order, sentence structure, and semantic correspondence between {src_language} and {target_language} subtitles. Point out key word correspondences, similarities and differences in sentence patterns, and language features that may affect splitting.
 2. Start Alignment: Based on your analysis, provide 2 different alignment methods for {target_language} subtitles according to the format. The split positions in {src_language} must be consistent with the pre-processed {src_language} split version and cannot be changed arbitrarily.
 3. Evaluation and Selection: Examine and briefly evaluate the 2 schemes, considering factors such as sentence completeness, semantic coherence, and appropriateness of split points.
 4. Best Scheme: Select the best alignment scheme, output only a single number, 1 or 2.
+'''
+
+    subtitle_data = '''
+### Subtitle Data
+<subtitles>
+{src_language} Original: "{src_sub}"
+{target_language} Original: "{tr_sub}"
+Pre-processed {src_language} Subtitles ([br] indicates split points): {src_part}
+</subtitles>
 
 ### Output Format
 Please complete the following JSON data, where << >> represents placeholders, and return your results in JSON format:
@@ -366,15 +396,15 @@ Please complete the following JSON data, where << >> represents placeholders, an
         }}''' for i in range(num_parts)
     )
 
-    prompt = f"{COMMON_RULES}\n\n{align_prompt}"
-    return prompt.format(
+    prefix = f"{COMMON_RULES}\n\n{align_prompt}".format(src_language=src_language, target_language=TARGET_LANGUAGE)
+    return compose(prefix, subtitle_data.format(
         src_language=src_language,
         target_language=TARGET_LANGUAGE,
         src_sub=src_sub,
         tr_sub=tr_sub,
         src_part=src_part,
         align_parts_json=align_parts_json,
-    )
+    ))
 
 ## ================================================================
 # @ step8_gen_audio_task.py @ step10_gen_audio.py
@@ -390,12 +420,6 @@ def get_subtitle_trim_prompt(trans_text, duration):
 ### Role
 You are a professional subtitle editor, editing and optimizing lengthy subtitles that exceed voiceover time before handing them to voice actors. Your expertise lies in cleverly shortening subtitles slightly while ensuring the original meaning and structure remain unchanged.
 
-### Subtitle Data
-<subtitles>
-Subtitle: "{trans_text}"
-Duration: {duration} seconds
-</subtitles>
-
 ### Processing Rules
 {rule}
 
@@ -412,12 +436,16 @@ Please complete the following JSON data, where << >> represents content you need
 }}
 '''
 
-    prompt = f"{COMMON_RULES}\n\n{trim_prompt}"
-    return prompt.format(
-        trans_text=trans_text,
-        duration=duration,
-        rule=rule
-    )
+    subtitle_data = f'''
+### Subtitle Data
+<subtitles>
+Subtitle: "{trans_text}"
+Duration: {duration} seconds
+</subtitles>
+'''
+
+    prefix = f"{COMMON_RULES}\n\n{trim_prompt}".format(rule=rule)
+    return compose(prefix, subtitle_data)
 
 def preprocess_text(text: str) -> str:
 
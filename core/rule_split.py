@@ -0,0 +1,129 @@
+import os, sys, re
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ------------
+# Deterministic sentence splitting at punctuation and conjunction boundaries, used before
+# asking an LLM. Returns None whenever the split is not clearly good.
+# ------------
+
+# Split after these marks (and the spaces that follow); sentence-final marks inside a line are the safest
+BOUNDARY_MARKS = re.compile(r'[,;:，、；：.!?。！？…]+["”’)）」]*\s*')
+SENTENCE_END = set('.!?。！？…')
+# Split before these words when no spaCy model is at hand
+CONNECTORS = {
+    'en': {'and', 'but', 'because', 'which', 'where', 'when', 'while', 'so', 'although', 'or', 'that'},
+    'es': {'y', 'pero', 'porque', 'que', 'cuando', 'donde', 'aunque', 'o'},
+    'fr': {'et', 'mais', 'parce', 'que', 'qui', 'quand', 'où', 'ou'},
+    'de': {'und', 'aber', 'weil', 'dass', 'wenn', 'wo', 'oder'},
+    'ru': {'и', 'но', 'потому', 'что', 'когда', 'где', 'или'},
+}
+DISTANCE_PENALTY = 1.5
+# A cut at a plain space keeps words whole but may still split a phrase, so it ranks below any mark
+SPACE_STRENGTH = 0.7
+
+def count_units(text, joiner):
+    """Words for languages written with spaces, characters otherwise"""
+    return len(text.split()) if joiner == ' ' else len(re.sub(r'\s', '', text))
+
+def boundaries(sentence, language, nlp=None):
+    """Candidate split offsets (start of the right part) with a strength in (0, 1]"""
+    found = {}
+    for m in BOUNDARY_MARKS.finditer(sentence):
+        if 0 < m.end() < len(sentence):
+            found[m.end()] = 1.0 if m.group().strip()[0] in SENTENCE_END else 0.9
+    if nlp is not None:
+        for token in nlp(sentence):
+            if token.i > 0 and (token.pos_ in ('CCONJ', 'SCONJ') or token.dep_ in ('cc', 'mark')):
+                found.setdefault(token.idx, 0.8)
+    else:
+        words = CONNECTORS.get(language, ())
+        for m in re.finditer(r'(?<=\s)(\w+)', sentence):
+            if m.group(1).lower() in words:
+                found.setdefault(m.start(1), 0.7)
+    return sorted(found.items())
+
+def rule_split(sentence, num_parts, word_limit, language, joiner, nlp=None, min_confidence=0.6):
+    """Parts of `sentence` cut at the strongest boundaries near equal-length positions, as
+    (parts, confidence), or None if no cut is confident enough or a part comes out too short or
+    too long. Parts keep the sentence's own text, so they always match it exactly."""
+    sentence = sentence.strip()
+    total = count_units(sentence, joiner)
+    min_units = 3 if joiner == ' ' else 5
+    candidates = [(offset, strength, count_units(sentence[:offset], joiner)) for offset, strength in boundaries(sentence, language, nlp)]
+    cuts, confidence = [], 1.0
+    for k in range(1, num_parts):
+        target = total * k / num_parts
+        scored = [(strength - DISTANCE_PENALTY * abs(units - target) / total, offset)
+                  for offset, strength, units in candidates if not cuts or offset > cuts[-1]]
+        if not scored:
+            return None
+        score, offset = max(scored)
+        cuts.append(offset)
+        confidence = min(confidence, score)
+    if confidence < min_confidence:
+        return None
+    edges = [0] + cuts + [len(sentence)]
+    parts = [sentence[a:b].strip() for a, b in zip(edges, edges[1:])]
+    sizes = [count_units(part, joiner) for part in parts]
+    # word_limit counts tokens; CJK tokens average about two characters
+    limit = word_limit if joiner == ' ' else word_limit * 2
+    if min(sizes) < min_units or max(sizes) > limit:
+        return None
+    return parts, round(confidence, 3)
+
+def is_spaced(text):
+    """Whether `text` separates words with spaces. Decided from the text itself, since
+    target_language is a free-form name rather than a language code"""
+    return len(re.findall(r'\s', text)) >= 0.08 * len(text)
+
+def split_at_ratios(text, ratios, min_confidence=0.6):
+    """Cut `text` near each fraction in `ratios` (ascending, in (0, 1)), preferring its own
+    punctuation. Where no mark is close enough the cut falls on the nearest space, scored like a
+    weaker mark by its distance to the target. Text without spaces is cut at the character itself
+    and keeps the score of the nearest mark, which is below `min_confidence`: such a cut may land
+    inside a word, so the caller should escalate.
+    Returns (parts, confidence) or None if a part would come out empty."""
+    text = text.strip()
+    spaced = is_spaced(text)
+    marks = [(m.end(), 1.0 if m.group().strip()[0] in SENTENCE_END else 0.9)
+             for m in BOUNDARY_MARKS.finditer(text) if 0 < m.end() < len(text)]
+    spaces = [m.end() for m in re.finditer(r'\s+', text)]
+    cuts, confidence = [], 1.0
+    for ratio in ratios:
+        target = len(text) * ratio
+        after = cuts[-1] if cuts else 0
+        scored = [(strength - DISTANCE_PENALTY * abs(offset - target) / len(text), offset)
+                  for offset, strength in marks if offset > after]
+        score, offset = max(scored, default=(0, None))
+        if score < min_confidence:
+            if spaced:
+                offset = min((s for s in spaces if s > after), key=lambda s: abs(s - target), default=None)
+                if offset is not None:
+                    score = max(score, SPACE_STRENGTH - DISTANCE_PENALTY * abs(offset - target) / len(text))
+            else:
+                offset = max(after + 1, round(target))
+        if offset is None or offset >= len(text):
+            return None
+        cuts.append(offset)
+        confidence = min(confidence, score)
+    edges = [0] + cuts + [len(text)]
+    parts = [text[a:b].strip() for a, b in zip(edges, edges[1:])]
+    if not all(re.search(r'\w', part) for part in parts):
+        return None
+    return parts, round(confidence, 3)
+
+def split_subtitle(source, translation, num_parts, language, joiner, nlp=None, min_confidence=0.6):
+    """Split a subtitle line and its translation into `num_parts` aligned parts without an LLM:
+    the source at its boundaries, the translation at the same length ratios. Returns
+    (source_parts, translation_parts, confidence) or None when either side is not confident."""
+    source_split = rule_split(source, num_parts, count_units(source, joiner), language, joiner, nlp, min_confidence)
+    if source_split is None:
+        return None
+    source_parts, source_confidence = source_split
+    lengths = [len(part) for part in source_parts]
+    ratios = [sum(lengths[:k]) / sum(lengths) for k in range(1, num_parts)]
+    translation_split = split_at_ratios(str(translation), ratios, min_confidence)
+    if translation_split is None or translation_split[1] < min_confidence:
+        return None
+    translation_parts, translation_confidence = translation_split
+    return source_parts, translation_parts, min(source_confidence, translation_confidence)
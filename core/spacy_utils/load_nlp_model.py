@@ -1,22 +1,22 @@
 import os,sys
-import spacy
-from spacy.cli import download
 from rich import print
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from core.step2_whisper import get_whisper_language
+from core.media_context import job_context
 from core.config_utils import load_key
 
-SPACY_MODEL_MAP = load_key("spacy_model_map")
-
 def get_spacy_model(language: str):
-    model = SPACY_MODEL_MAP.get(language.lower(), "en_core_web_md")
-    if language not in SPACY_MODEL_MAP:
+    spacy_model_map = load_key("spacy_model_map")
+    model = spacy_model_map.get(language.lower(), "en_core_web_md")
+    if language not in spacy_model_map:
         print(f"[yellow]Spacy model does not support '{language}', using en_core_web_md model as fallback...[/yellow]")
     return model
 
 def init_nlp():
+    # spaCy takes seconds to import, so only pay for it when a model is actually loaded
+    import spacy
+    from spacy.cli import download
     try:
-        language = "en" if load_key("whisper.language") == "en" else get_whisper_language()
+        language = "en" if load_key("whisper.language") == "en" else job_context().detected_language
         model = get_spacy_model(language)
         print(f"[blue]⏳ Loading NLP Spacy model: <{model}> ...[/blue]")
         try:
@@ -1,23 +1,19 @@
 import warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 import os,sys
-import pandas as pd
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from core.spacy_utils.load_nlp_model import init_nlp
-from core.step2_whisper import get_whisper_language
-from core.config_utils import load_key, get_joiner
+from core.media_context import job_context
+from core.config_utils import get_joiner
+from core.transcript_store import load_transcript
 from rich import print
 
 def split_by_mark(nlp):
-    whisper_language = load_key("whisper.language")
-    language = get_whisper_language() if whisper_language == 'auto' else whisper_language # consider force english case
+    language = job_context().language
     joiner = get_joiner(language)
     print(f"[blue]🔍 Using {language} language joiner: '{joiner}'[/blue]")
-    chunks = pd.read_excel("output/log/cleaned_chunks.xlsx")
-    chunks.text = chunks.text.apply(lambda x: x.strip('"'))
-    
     # join with joiner
-    input_text = joiner.join(chunks.text.to_list())
+    input_text = load_transcript().joined(joiner)
 
     doc = nlp(input_text)
     assert doc.has_annotation("SENT_START")
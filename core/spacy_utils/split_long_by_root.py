@@ -3,8 +3,7 @@ warnings.filterwarnings("ignore", category=FutureWarning)
 import os,sys
 sys.path.append(os.path.abspath(os.path.join(__file__, '..', '..', '..')))
 from core.spacy_utils.load_nlp_model import init_nlp
-from core.config_utils import load_key, get_joiner
-from core.step2_whisper import get_whisper_language
+from core.media_context import job_context
 from rich import print
 import string
 
@@ -31,9 +30,7 @@ def split_long_sentence(doc):
     # rebuild sentences based on optimal split points
     sentences = []
     i = n
-    whisper_language = load_key("whisper.language")
-    language = get_whisper_language() if whisper_language == 'auto' else whisper_language # consider force english case
-    joiner = get_joiner(language)
+    joiner = job_context().joiner
     while i > 0:
         j = prev[i]
         sentences.append(joiner.join(tokens[j:i]).strip())
@@ -50,9 +47,7 @@ def split_extremely_long_sentence(doc):
     part_length = n // num_parts
     
     sentences = []
-    whisper_language = load_key("whisper.language")
-    language = get_whisper_language() if whisper_language == 'auto' else whisper_language # consider force english case
-    joiner = get_joiner(language)
+    joiner = job_context().joiner
     for i in range(num_parts):
         start = i * part_length
         end = start + part_length if i < num_parts - 1 else n
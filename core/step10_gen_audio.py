@@ -8,13 +8,10 @@ from rich.panel import Panel
 from rich.console import Console
 import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core.all_tts_functions.gpt_sovits_tts import gpt_sovits_tts_for_videolingo
-from core.all_tts_functions.openai_tts import openai_tts
-from core.all_tts_functions.fish_tts import fish_tts
-from core.all_tts_functions.azure_tts import azure_tts
 from core.prompts_storage import get_subtitle_trim_prompt
 from core.ask_gpt import ask_gpt
 from core.config_utils import load_key
+from core.telemetry import traced, span
 
 console = Console()
 
@@ -32,15 +29,21 @@ def parse_srt_time(time_str):
 
 def tts_main(text, save_as, number, task_df):
     TTS_METHOD = load_key("tts_method")
-    if TTS_METHOD == 'openai_tts':
-        openai_tts(text, save_as)
-    elif TTS_METHOD == 'gpt_sovits':
-        #! 注意 gpt_sovits_tts 只支持输出中文，输入中文或英文
-        gpt_sovits_tts_for_videolingo(text, save_as, number, task_df)
-    elif TTS_METHOD == 'fish_tts':
-        fish_tts(text, save_as)
-    elif TTS_METHOD == 'azure_tts':
-        azure_tts(text, save_as)
+    with span("tts", method=TTS_METHOD):
+        # Each backend pulls in its own SDK, so only the selected one is imported
+        if TTS_METHOD == 'openai_tts':
+            from core.all_tts_functions.openai_tts import openai_tts
+            openai_tts(text, save_as)
+        elif TTS_METHOD == 'gpt_sovits':
+            from core.all_tts_functions.gpt_sovits_tts import gpt_sovits_tts_for_videolingo
+            #! 注意 gpt_sovits_tts 只支持输出中文，输入中文或英文
+            gpt_sovits_tts_for_videolingo(text, save_as, number, task_df)
+        elif TTS_METHOD == 'fish_tts':
+            from core.all_tts_functions.fish_tts import fish_tts
+            fish_tts(text, save_as)
+        elif TTS_METHOD == 'azure_tts':
+            from core.all_tts_functions.azure_tts import azure_tts
+            azure_tts(text, save_as)
 
 def generate_audio(text, target_duration, save_as, number, task_df):
     MIN_SPEED_FACTOR = load_key("speed_factor.min")
@@ -100,6 +103,7 @@ def generate_audio(text, target_duration, save_as, number, task_df):
     if os.path.exists(temp_filename):
         os.remove(temp_filename)
 
+@traced("ffmpeg atempo")
 def change_audio_speed(input_file, output_file, speed_factor):
     atempo = speed_factor
     cmd = ['ffmpeg', '-i', input_file, '-filter:a', f'atempo={atempo}', '-y', output_file]
@@ -117,6 +121,7 @@ def change_audio_speed(input_file, output_file, speed_factor):
                 rprint(f"[red]Error: Failed to change audio speed, maximum retry attempts reached ({max_retries})[/red]")
                 raise e  # Re-raise the exception if all retries failed
 
+@traced("step10 tts")
 def process_sovits_tasks():
     tasks_df = pd.read_excel("output/audio/sovits_tasks.xlsx")
     error_tasks = []
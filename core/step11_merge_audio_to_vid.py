@@ -1,14 +1,18 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.config_utils import load_key
+from core.telemetry import traced
+from core.audio_timeline import render_timeline
+from core.media_context import job_context
+from core.step7_merge_sub_to_vid import get_encoder_choice, build_subtitle_filter, generate_placeholder_video, run_ffmpeg
+from core.encoder_probe import scale_resolution, record_render_time
 from datetime import datetime
 import pandas as pd
 import subprocess
-from pydub import AudioSegment
+import time
 from rich import print as rprint
 import numpy as np
 import soundfile as sf
-import cv2
 
 def time_to_datetime(time_str):
     return datetime.strptime(time_str, '%H:%M:%S.%f')
@@ -28,41 +32,62 @@ def merge_all_audio():
     
     # Get the sample rate of the first audio file
     first_audio = f'output/audio/segs/{df.iloc[0]["number"]}.wav'
-    sample_rate = AudioSegment.from_wav(first_audio).frame_rate
+    sample_rate = sf.info(first_audio).samplerate
 
-    # Create an empty AudioSegment object
-    merged_audio = AudioSegment.silent(duration=0, frame_rate=sample_rate)
+    # Place every segment at its exact sample offset on the timeline
+    segments = [
+        ((time_to_datetime(row['start_time']) - datetime(1900, 1, 1)).total_seconds(), f'output/audio/segs/{row["number"]}.wav')
+        for _, row in df.iterrows()
+    ]
+    render_timeline(segments, output_audio, sample_rate, crossfade=0.005)
+    rprint(f"[bold green]Audio file successfully merged, output file: {output_audio}[/bold green]")
 
-    prev_target_start_time = None
-    prev_actual_duration = 0
-    
-    for index, row in df.iterrows():
-        number = row['number']
-        start_time = row['start_time']
-        input_audio = f'output/audio/segs/{number}.wav'
-        
-        if not os.path.exists(input_audio):
-            rprint(f"[bold yellow]Warning: File {input_audio} does not exist, skipping this file.[/bold yellow]")
-            continue
-        
-        audio_segment = AudioSegment.from_wav(input_audio)
-        actual_duration = len(audio_segment) / 1000  # Convert to seconds
-        target_start_time = time_to_datetime(start_time)
-        
-        silence_duration = (target_start_time - datetime(1900, 1, 1)).total_seconds() if prev_target_start_time is None else (target_start_time - prev_target_start_time).total_seconds() - prev_actual_duration
-        
-        if silence_duration > 0:
-            silence = AudioSegment.silent(duration=int(silence_duration * 1000), frame_rate=sample_rate)
-            merged_audio += silence
-        
-        merged_audio += audio_segment
-        
-        prev_target_start_time = target_start_time
-        prev_actual_duration = actual_duration
+def build_audio_mix_filter(original_volume, dub_volume, background='1:a', vocal='2:a', dub='3:a'):
+    return f'[{background}]volume=1[a1];[{vocal}]volume={original_volume}[a2];[{dub}]volume={dub_volume}[a3];[a1][a2][a3]amix=inputs=3:duration=first:dropout_transition=3[a]'
 
-    # Export the merged audio
-    merged_audio.export(output_audio, format="wav")
-    rprint(f"[bold green]Audio file successfully merged, output file: {output_audio}[/bold green]")
+def build_single_pass_cmd(video_file, en_srt, trans_srt, background_file, original_vocal, audio_file, output_file, resolution, original_volume, dub_volume, encoder_choice, intermediate_video=None, source_audio=True):
+    """One ffmpeg graph: scale + subtitle burn-in on the video and the three-way audio mix, decoded and encoded once.
+    If `intermediate_video` is given, the same encoded video is also written with the source audio (when
+    `source_audio`, i.e. the source has an audio stream) through the tee muxer."""
+    target_width, target_height = scale_resolution(*resolution.split('x'), encoder_choice['scale'])
+    filter_complex = (
+        f"[0:v]{build_subtitle_filter(target_width, target_height, en_srt, trans_srt)}{encoder_choice['vf_suffix']}[v];"
+        + build_audio_mix_filter(original_volume, dub_volume)
+    )
+    cmd = ['ffmpeg', '-y'] + encoder_choice['input_args'] + ['-i', video_file, '-i', background_file, '-i', original_vocal, '-i', audio_file,
+           '-filter_complex', filter_complex.encode('utf-8'), '-map', '[v]', '-map', '[a]']
+    if intermediate_video and source_audio:
+        cmd += ['-map', '0:a:0']
+    cmd += ['-r', '30'] + encoder_choice['params'] + ['-c:a', 'aac', '-b:a', '192k']
+    if intermediate_video:
+        intermediate_streams = 'v:0,a:1' if source_audio else 'v:0'
+        cmd += ['-f', 'tee', f"[select=\\'v:0,a:0\\':f=mp4]{output_file}|[select=\\'{intermediate_streams}\\':f=mp4]{intermediate_video}"]
+    else:
+        cmd += [output_file]
+    return cmd
+
+def merge_subs_and_audio_single_pass(output_file):
+    """Render subtitles and the dubbed audio mix straight from the source video"""
+    en_srt = "output/src_subtitles.srt"
+    trans_srt = "output/trans_subtitles.srt"
+    if not os.path.exists(en_srt) or not os.path.exists(trans_srt):
+        raise FileNotFoundError("Subtitle files not found in the 'output' directory.")
+
+    choice = get_encoder_choice()
+    video_file = job_context().video_file
+    intermediate_video = "output/output_video_with_subs.mp4" if load_key("single_pass_render.keep_intermediate") else None
+    cmd = build_single_pass_cmd(
+        video_file, en_srt, trans_srt,
+        'output/audio/background.wav', 'output/audio/original_vocal.wav', "output/trans_vocal_total.wav",
+        output_file, load_key("resolution"), load_key("original_volume"), load_key("dub_volume"),
+        choice, intermediate_video, job_context().media.has_audio
+    )
+    print("🎬 Start rendering subtitles and dubbed audio in a single pass (30 FPS)...")
+    start_time = time.time()
+    if not run_ffmpeg(cmd, "Single pass subtitle and audio render"):
+        raise RuntimeError("Single pass render failed. Please check the logs above.")
+    record_render_time(choice, job_context().duration, time.time() - start_time, desc='single pass render')
+    rprint(f"[bold green]Video with subtitles and dubbed audio saved to {output_file}[/bold green]")
 
 def merge_video_audio():
     """Merge video and audio, and reduce video volume"""
@@ -77,22 +102,18 @@ def merge_video_audio():
         return
     
     if load_key("resolution") == '0x0':
-        rprint("[bold yellow]Warning: A 0-second black video will be generated as a placeholder as Resolution is set to 0x0.[/bold yellow]")
-
-        # Create a black frame
-        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_file, fourcc, 1, (1920, 1080))
-        out.write(frame)
-        out.release()
+        generate_placeholder_video(output_file)
+        return
 
-        rprint("[bold green]Placeholder video has been generated.[/bold green]")
+    # Skip the intermediate subtitle video and decode the source only once
+    if load_key("single_pass_render.enabled") and not os.path.exists(video_file):
+        merge_subs_and_audio_single_pass(output_file)
         return
 
     # Merge video and audio
     original_volume = load_key("original_volume")
     dub_volume = load_key("dub_volume")
-    cmd = ['ffmpeg', '-y', '-i', video_file, '-i', background_file, '-i', original_vocal, '-i', audio_file, '-filter_complex', f'[1:a]volume=1[a1];[2:a]volume={original_volume}[a2];[3:a]volume={dub_volume}[a3];[a1][a2][a3]amix=inputs=3:duration=first:dropout_transition=3[a]', '-map', '0:v', '-map', '[a]', '-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k', output_file]
+    cmd = ['ffmpeg', '-y', '-i', video_file, '-i', background_file, '-i', original_vocal, '-i', audio_file, '-filter_complex', build_audio_mix_filter(original_volume, dub_volume), '-map', '0:v', '-map', '[a]', '-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k', output_file]
 
     try:
         subprocess.run(cmd, check=True)
@@ -104,6 +125,7 @@ def merge_video_audio():
     if os.path.exists('tmp_audio.wav'):
         os.remove('tmp_audio.wav')
 
+@traced("step11 merge audio")
 def merge_main():
     merge_all_audio()
     merge_video_audio()
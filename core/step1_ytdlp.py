@@ -1,10 +1,10 @@
 import os,sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-import glob
 from yt_dlp import YoutubeDL
 import re
 import subprocess
-from core.config_utils import load_key
+from core.telemetry import traced
+from core.media_context import find_video_file, probe_media
 
 def sanitize_filename(filename):
     # Remove or replace illegal characters
@@ -14,6 +14,7 @@ def sanitize_filename(filename):
     # Use default name if filename is empty
     return filename if filename else 'video'
 
+@traced("step1 download")
 def download_video_ytdlp(url, save_path='output', resolution='1080', cutoff_time=None):
     allowed_resolutions = ['360', '1080', 'best']
     if resolution not in allowed_resolutions:
@@ -46,9 +47,7 @@ def download_video_ytdlp(url, save_path='output', resolution='1080', cutoff_time
         print(f"Cutoff time: {cutoff_time}, Now checking video duration...")
         video_file = find_video_files(save_path)
         
-        # Use librosa to get video duration
-        import librosa
-        duration = librosa.get_duration(filename=video_file)
+        duration = probe_media(video_file).duration
         
         if duration > cutoff_time:
             print(f"Video duration ({duration:.2f}s) is longer than cutoff time. Cutting the video...")
@@ -70,15 +69,7 @@ def download_video_ytdlp(url, save_path='output', resolution='1080', cutoff_time
             print(f"Video duration ({duration:.2f}s) is not longer than cutoff time. No need to cut.")
 
 def find_video_files(save_path='output'):
-    video_files = [file for file in glob.glob(save_path + "/*") if os.path.splitext(file)[1][1:].lower() in load_key("allowed_video_formats")]
-    # change \\ to /, this happen on windows
-    if sys.platform.startswith('win'):
-        video_files = [file.replace("\\", "/") for file in video_files]
-    video_files = [file for file in video_files if not file.startswith("output/output")]
-    # if num != 1, raise ValueError
-    if len(video_files) != 1:
-        raise ValueError(f"Number of videos found is not unique. Please check. Number of videos found: {len(video_files)}")
-    return video_files[0]
+    return find_video_file(save_path)
 
 if __name__ == '__main__':
     # Example usage
@@ -1,21 +1,16 @@
 import os,sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-import json
-from core.step1_ytdlp import find_video_files
+from core.media_context import job_context
 from core.config_utils import load_key
+from core.telemetry import traced
 
 def get_whisper_language():
-    try:
-        with open("output/log/transcript_language.json", "r", encoding='utf-8') as f:
-            language = json.load(f)["language"]
-        return language
-    except:
-        print("Unable to read language information")
-        return None
+    return job_context().detected_language
 
+@traced("step2 transcribe")
 def transcribe():
     WHISPER_METHOD = load_key("whisper.method")
-    video_file = find_video_files()
+    video_file = job_context().video_file
     if WHISPER_METHOD == 'whisperx':
         from core.all_whisper_methods.whisperX import transcribe as ts
     elif WHISPER_METHOD == 'whisperxapi':
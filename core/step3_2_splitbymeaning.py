@@ -6,8 +6,12 @@ from core.prompts_storage import get_split_prompt
 from difflib import SequenceMatcher
 import math
 from core.spacy_utils.load_nlp_model import init_nlp
-from core.config_utils import load_key, get_joiner
-from core.step2_whisper import get_whisper_language
+from core.config_utils import load_key
+from core.telemetry import traced
+from core.llm_backend import llm_workers, print_llm_stats
+from core.model_router import route, router_tiers, router_settings, print_router_stats, reset_router_stats, HEURISTIC
+from core.rule_split import rule_split
+from core.media_context import job_context
 from rich.console import Console
 from rich.table import Table
 
@@ -18,13 +22,14 @@ def tokenize_sentence(sentence, nlp):
     doc = nlp(sentence)
     return [token.text for token in doc]
 
-def find_split_positions(original, modified):
+def match_split_positions(original, modified):
+    """Offsets in `original` where the `[br]`-marked `modified` text splits it, and the lowest
+    similarity of any matched part (None if a part could not be placed)"""
     split_positions = []
     parts = modified.split('[br]')
     start = 0
-    whisper_language = load_key("whisper.language")
-    language = get_whisper_language() if whisper_language == 'auto' else whisper_language
-    joiner = get_joiner(language)
+    joiner = job_context().joiner
+    min_similarity = 1.0
 
     for i in range(len(parts) - 1):
         max_similarity = 0
@@ -40,30 +45,62 @@ def find_split_positions(original, modified):
                 max_similarity = left_similarity
                 best_split = j
 
-        if max_similarity < 0.9:
-            console.print(f"[yellow]Warning: low similarity found at the best split point: {max_similarity}[/yellow]")
-        if best_split is not None:
-            split_positions.append(best_split)
-            start = best_split
-        else:
-            console.print(f"[yellow]Warning: Unable to find a suitable split point for the {i+1}th part.[/yellow]")
+        if best_split is None:
+            return split_positions, None
+        split_positions.append(best_split)
+        start = best_split
+        min_similarity = min(min_similarity, max_similarity)
 
+    return split_positions, min_similarity
+
+def find_split_positions(original, modified):
+    split_positions, similarity = match_split_positions(original, modified)
+    if similarity is None:
+        console.print(f"[yellow]Warning: Unable to find a suitable split point for the {len(split_positions)+1}th part.[/yellow]")
+    elif similarity < 0.9:
+        console.print(f"[yellow]Warning: low similarity found at the best split point: {similarity}[/yellow]")
     return split_positions
 
-def split_sentence(sentence, num_parts, word_limit=18, index=-1, retry_attempt=0):
-    """Split a long sentence using GPT and return the result as a string."""
+def split_sentence(sentence, num_parts, word_limit=18, index=-1, retry_attempt=0, nlp=None):
+    """Split a long sentence using GPT and return the result as a string.
+
+    With llm.router enabled, the rule split and smaller models are tried first; their answer is
+    kept only if it has `num_parts` parts that match the sentence closely enough."""
     split_prompt = get_split_prompt(sentence, num_parts, word_limit)
     def valid_split(response_data):
         if 'best' not in response_data:
             return {"status": "error", "message": "Missing required key: `best`"}
         return {"status": "success", "message": "Split completed"}
-    response_data = ask_gpt(split_prompt + ' ' * retry_attempt, response_json=True, valid_def=valid_split, log_title='sentence_splitbymeaning')
-    best = response_data['best']
-    if f"1" in best:
-        best = 1
-    elif f"2" in best:
-        best = 2
-    best_split = response_data[f"split_{best}"]
+    def ask(model=None, max_retries=10):
+        response_data = ask_gpt(split_prompt + ' ' * retry_attempt, response_json=True, valid_def=valid_split,
+                                log_title='sentence_splitbymeaning', model=model, max_retries=max_retries)
+        best = response_data['best']
+        if f"1" in best:
+            best = 1
+        elif f"2" in best:
+            best = 2
+        return response_data[f"split_{best}"]
+
+    attempts = []
+    tiers = router_tiers()
+    if tiers:
+        router_set = router_settings()
+        language, joiner = job_context().language, job_context().joiner
+        def heuristic():
+            result = rule_split(sentence, num_parts, word_limit, language, joiner, nlp)
+            return '[br]'.join(result[0]) if result else None
+        def small_model(model):
+            def run():
+                answer = ask(model, router_set["max_retries"])
+                _, similarity = match_split_positions(sentence, answer)
+                parts = [part for part in answer.split('[br]') if part.strip()]
+                confident = similarity is not None and similarity >= router_set["min_similarity"] and len(parts) == num_parts
+                return answer if confident else None
+            return run
+        attempts = [(tier, heuristic if tier == HEURISTIC else small_model(tier)) for tier in tiers]
+    attempts.append((load_key("api.model"), ask))
+    best_split = route('split', attempts)
+
     split_points = find_split_positions(sentence, best_split)
     # split the sentence based on the split points
     for i, split_point in enumerate(split_points):
@@ -82,7 +119,7 @@ def split_sentence(sentence, num_parts, word_limit=18, index=-1, retry_attempt=0
     table.add_row("Original", sentence, style="yellow")
     table.add_row("Split", best_split.replace('\n', ' ||'), style="yellow")
     console.print(table)
-    
+
     return best_split
 
 def parallel_split_sentences(sentences, max_length, max_workers, nlp, retry_attempt=0):
@@ -97,7 +134,7 @@ def parallel_split_sentences(sentences, max_length, max_workers, nlp, retry_atte
             # print("Tokenization result:", tokens)
             num_parts = math.ceil(len(tokens) / max_length)
             if len(tokens) > max_length:
-                future = executor.submit(split_sentence, sentence, num_parts, max_length, index=index, retry_attempt=retry_attempt)
+                future = executor.submit(split_sentence, sentence, num_parts, max_length, index=index, retry_attempt=retry_attempt, nlp=nlp)
                 futures.append((future, index, num_parts, sentence))
             else:
                 new_sentences[index] = [sentence]
@@ -112,6 +149,7 @@ def parallel_split_sentences(sentences, max_length, max_workers, nlp, retry_atte
 
     return [sentence for sublist in new_sentences for sentence in sublist]
 
+@traced("step3.2 split by meaning")
 def split_sentences_by_meaning():
     """The main function to split sentences by meaning."""
     # read input sentences
@@ -119,14 +157,17 @@ def split_sentences_by_meaning():
         sentences = [line.strip() for line in f.readlines()]
 
     nlp = init_nlp()
+    reset_router_stats()
     # 🔄 process sentences multiple times to ensure all are split
     for retry_attempt in range(3):
-        sentences = parallel_split_sentences(sentences, max_length=load_key("max_split_length"), max_workers=load_key("max_workers"), nlp=nlp, retry_attempt=retry_attempt)
+        sentences = parallel_split_sentences(sentences, max_length=load_key("max_split_length"), max_workers=llm_workers(), nlp=nlp, retry_attempt=retry_attempt)
 
     # 💾 save results
     with open('output/log/sentence_splitbymeaning.txt', 'w', encoding='utf-8') as f:
         f.write('\n'.join(sentences))
     console.print('[green]✅ All sentences have been successfully split![/green]')
+    print_llm_stats()
+    print_router_stats()
 
 if __name__ == '__main__':
     # print(split_sentence('Which makes no sense to the... average guy who always pushes the character creation slider all the way to the right.', 2, 22))
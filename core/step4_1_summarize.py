@@ -1,32 +1,37 @@
 import os, sys, json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.telemetry import traced
 from core.ask_gpt import ask_gpt
-import pandas as pd
+from core.transcript_store import load_transcript
 from core.prompts_storage import get_summary_prompt
 
 def combine_chunks():
     """Combine the text chunks identified by whisper into a single long text"""
-    df = pd.read_excel('output/log/cleaned_chunks.xlsx')
-    df['text'] = df['text'].str.strip('"').str.strip()
-    combined_text = ' '.join(df['text'])
+    combined_text = load_transcript().joined(' ')
     return combined_text[:4000]  #! Return only the first 4000 characters
 
+def format_terms(terms):
+    return '\n'.join(
+        f'{i+1}. "{term["original"]}": "{term["translation"]}",'
+        f' meaning: {term["explanation"]}'
+        for i, term in enumerate(terms)
+    )
+
 def search_things_to_note_in_prompt(sentence):
     """Search for terms to note in the given sentence"""
     with open('output/log/terminology.json', 'r', encoding='utf-8') as file:
         things_to_note = json.load(file)
-    things_to_note_list = [term['original'] for term in things_to_note['terms'] if term['original'].lower() in sentence.lower()]
-    if things_to_note_list:
-        prompt = '\n'.join(
-            f'{i+1}. "{term["original"]}": "{term["translation"]}",'
-            f' meaning: {term["explanation"]}'
-            for i, term in enumerate(things_to_note['terms'])
-            if term['original'] in things_to_note_list
-        )
-        return prompt
-    else:
-        return None
+    terms = [term for term in things_to_note['terms'] if term['original'].lower() in sentence.lower()]
+    return format_terms(terms) if terms else None
+
+def get_glossary_prompt():
+    """All terms of the video. Unlike the per-chunk search it is the same for every chunk, so the
+    translation prompts can keep it in their cached prefix"""
+    with open('output/log/terminology.json', 'r', encoding='utf-8') as file:
+        terms = json.load(file)['terms']
+    return format_terms(terms) if terms else None
 
+@traced("step4.1 summarize")
 def get_summary():
     src_content = combine_chunks()
     summary_prompt = get_summary_prompt(src_content)
@@ -4,10 +4,13 @@ import pandas as pd
 import json
 import concurrent.futures
 from core.translate_once import translate_lines
-from core.step4_1_summarize import search_things_to_note_in_prompt
+from core.step4_1_summarize import get_glossary_prompt
 from core.step8_gen_audio_task import check_len_then_trim
 from core.step6_generate_final_timeline import align_timestamp
+from core.transcript_store import load_transcript
 from core.config_utils import load_key
+from core.telemetry import traced
+from core.llm_backend import llm_workers, print_llm_stats
 from rich.console import Console
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
@@ -41,14 +44,14 @@ def get_after_content(chunks, chunk_index):
     return None if chunk_index == len(chunks) - 1 else chunks[chunk_index + 1].split('\n')[:2] # Get first 2 lines
 
 # 🔍 Translate a single chunk
-def translate_chunk(chunk, chunks, theme_prompt, i):
-    things_to_note_prompt = search_things_to_note_in_prompt(chunk)
+def translate_chunk(chunk, chunks, theme_prompt, glossary_prompt, i):
     previous_content_prompt = get_previous_content(chunks, i)
     after_content_prompt = get_after_content(chunks, i)
-    translation, english_result = translate_lines(chunk, previous_content_prompt, after_content_prompt, things_to_note_prompt, theme_prompt, i)
+    translation, english_result = translate_lines(chunk, previous_content_prompt, after_content_prompt, glossary_prompt, theme_prompt, i)
     return i, english_result, translation
 
 # 🚀 Main function to translate all chunks
+@traced("step4.2 translate")
 def translate_all():
     # Check if the file exists
     if os.path.exists("output/log/translation_results.xlsx"):
@@ -64,6 +67,8 @@ def translate_all():
 
     with open('output/log/terminology.json', 'r', encoding='utf-8') as file:
         theme_prompt = json.load(file).get('theme')
+    # The whole glossary rather than the terms found in each chunk: it keeps the prompt prefix identical across chunks
+    glossary_prompt = get_glossary_prompt()
 
     # 🔄 Use concurrent execution for translation
     with Progress(
@@ -72,10 +77,10 @@ def translate_all():
         transient=True,
     ) as progress:
         task = progress.add_task("[cyan]Translating chunks...", total=len(chunks))
-        with concurrent.futures.ThreadPoolExecutor(max_workers=load_key("max_workers")) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=llm_workers()) as executor:
             futures = []
             for i, chunk in enumerate(chunks):
-                future = executor.submit(translate_chunk, chunk, chunks, theme_prompt, i)
+                future = executor.submit(translate_chunk, chunk, chunks, theme_prompt, glossary_prompt, i)
                 futures.append(future)
 
             results = []
@@ -92,11 +97,10 @@ def translate_all():
         trans_text.extend(translation.split('\n'))
     
     # Trim long translation text
-    df_text = pd.read_excel('output/log/cleaned_chunks.xlsx')
-    df_text['text'] = df_text['text'].str.strip('"').str.strip()
+    transcript = load_transcript()
     df_translate = pd.DataFrame({'Source': src_text, 'Translation': trans_text})
     subtitle_output_configs = [('trans_subs_for_audio.srt', ['Translation'])]
-    df_time = align_timestamp(df_text, df_translate, subtitle_output_configs, output_dir=None, for_display=False)
+    df_time = align_timestamp(transcript, df_translate, subtitle_output_configs, output_dir=None, for_display=False)
     console.print(df_time)
     # apply check_len_then_trim to df_time['Translation'], only when duration > MIN_TRIM_DURATION.
     df_time['Translation'] = df_time.apply(lambda x: check_len_then_trim(x['Translation'], x['duration']) if x['duration'] > load_key("min_trim_duration") else x['Translation'], axis=1)
@@ -104,6 +108,7 @@ def translate_all():
     
     df_time.to_excel("output/log/translation_results.xlsx", index=False)
     console.print("[bold green]✅ Translation completed and results saved.[/bold green]")
+    print_llm_stats()
 
 if __name__ == '__main__':
     translate_all()
\ No newline at end of file
@@ -2,12 +2,19 @@ import sys, os
 import pandas as pd
 from typing import List, Tuple
 import concurrent.futures
+from difflib import SequenceMatcher
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.step3_2_splitbymeaning import split_sentence
+from core.media_context import job_context
+from core.spacy_utils.load_nlp_model import init_nlp
+from core.rule_split import split_subtitle
 from core.ask_gpt import ask_gpt
 from core.prompts_storage import get_align_prompt
 from core.config_utils import load_key
+from core.telemetry import traced
+from core.llm_backend import llm_workers, print_llm_stats
+from core.model_router import route, router_tiers, router_settings, print_router_stats, reset_router_stats, HEURISTIC
 from rich.panel import Panel
 from rich.console import Console
 from rich.table import Table
@@ -35,33 +42,64 @@ def calc_len(text: str) -> float:
 
 def align_subs(src_sub: str, tr_sub: str, src_part: str) -> Tuple[List[str], List[str]]:
     align_prompt = get_align_prompt(src_sub, tr_sub, src_part)
+    src_parts = src_part.split('\n')
     
     def valid_align(response_data):
         # check if the best is in the response_data
         if 'best' not in response_data:
             return {"status": "error", "message": "Missing required key: `best`"}
         return {"status": "success", "message": "Align completed"}
-    parsed = ask_gpt(align_prompt, response_json=True, valid_def=valid_align, log_title='align_subs')
+    def ask(model=None, max_retries=10):
+        parsed = ask_gpt(align_prompt, response_json=True, valid_def=valid_align, log_title='align_subs', model=model, max_retries=max_retries)
+        best = int(parsed['best'])
+        align_data = parsed[f'align_{best}']
+        return [item[f'target_part_{i+1}'].strip() for i, item in enumerate(align_data)]
 
-    best = int(parsed['best'])
-    align_data = parsed[f'align_{best}']
-    
-    src_parts = src_part.split('\n')
-    tr_parts = [item[f'target_part_{i+1}'].strip() for i, item in enumerate(align_data)]
-    
-    table = Table(title="🔗 Aligned parts")
+    attempts = []
+    tiers = router_tiers(task_has_heuristic=False)
+    if tiers:
+        router_set = router_settings()
+        def small_model(model):
+            def run():
+                parts = ask(model, router_set["max_retries"])
+                # the parts must cover the whole translation, in order, without rewording it
+                similarity = SequenceMatcher(None, ''.join(tr_sub.split()), ''.join(''.join(parts).split())).ratio()
+                confident = len(parts) == len(src_parts) and all(parts) and similarity >= router_set["min_similarity"]
+                return parts if confident else None
+            return run
+        attempts = [(tier, small_model(tier)) for tier in tiers]
+    attempts.append((load_key("api.model"), ask))
+    tr_parts = route('align', attempts)
+    show_aligned_parts(src_parts, tr_parts)
+    return src_parts, tr_parts
+
+def show_aligned_parts(src_parts, tr_parts, title="🔗 Aligned parts"):
+    table = Table(title=title)
     table.add_column("Language", style="cyan")
     table.add_column("Parts", style="magenta")
     table.add_row("SRC_LANG", "\n".join(src_parts))
     table.add_row("TARGET_LANG", "\n".join(tr_parts))
     console.print(table)
-    
-    return src_parts, tr_parts
+
+def load_rule_nlp():
+    """spaCy model for the rule split, or None (connector words are used instead) if it cannot load"""
+    try:
+        return init_nlp()
+    except ValueError as e:
+        console.print(f"[yellow]⚠️ {e}, the rule split falls back to punctuation and connector words[/yellow]")
+        return None
 
 def split_align_subs(src_lines: List[str], tr_lines: List[str], max_retry=5) -> Tuple[List[str], List[str]]:
     subtitle_set = load_key("subtitle")
     MAX_SUB_LENGTH = subtitle_set["max_length"]
     TARGET_SUB_MULTIPLIER = subtitle_set["target_multiplier"]
+    # 🚀 Fast path: with the heuristic tier on, lines are split locally and only unclear ones reach the LLM
+    use_rules = HEURISTIC in router_tiers()
+    if use_rules:
+        nlp = load_rule_nlp()
+        language, joiner = job_context().language, job_context().joiner
+    else:
+        nlp = None
     for attempt in range(max_retry):
         console.print(Panel(f"🔄 Split attempt {attempt + 1}", expand=False))
         to_split = []
@@ -78,10 +116,22 @@ def split_align_subs(src_lines: List[str], tr_lines: List[str], max_retry=5) ->
                 console.print(table)
         
         def process(i):
-            split_src = split_sentence(src_lines[i], num_parts=2).strip()
-            src_lines[i], tr_lines[i] = align_subs(src_lines[i], tr_lines[i], split_src)
+            src, tr = str(src_lines[i]), str(tr_lines[i])
+            def rule_path():
+                result = split_subtitle(src, tr, 2, language, joiner, nlp)
+                if result is None:
+                    return None
+                src_parts, tr_parts, confidence = result
+                show_aligned_parts(src_parts, tr_parts, title=f"✂️ Rule split (confidence {confidence:.2f})")
+                return src_parts, tr_parts
+            def llm_path():
+                split_src = split_sentence(src, num_parts=2, nlp=nlp).strip()
+                return align_subs(src, tr, split_src)
+            attempts = [(HEURISTIC, rule_path)] if use_rules else []
+            attempts.append(('llm', llm_path))
+            src_lines[i], tr_lines[i] = route('subtitle', attempts)
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=load_key("max_workers")) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=llm_workers()) as executor:
             executor.map(process, to_split)
         
         # Flatten `src_lines` and `tr_lines`
@@ -93,6 +143,7 @@ def split_align_subs(src_lines: List[str], tr_lines: List[str], max_retry=5) ->
     
     return src_lines, tr_lines
 
+@traced("step5 split for subtitles")
 def split_for_sub_main():
     if os.path.exists("output/log/translation_results_for_subtitles.xlsx"):
         console.print("[yellow]🚨 File `translation_results_for_subtitles.xlsx` already exists, skipping this step.[/yellow]")
@@ -102,9 +153,12 @@ def split_for_sub_main():
     df = pd.read_excel("output/log/translation_results.xlsx")
     src_lines = df['Source'].tolist()
     tr_lines = df['Translation'].tolist()
+    reset_router_stats()
     src_lines, tr_lines = split_align_subs(src_lines, tr_lines, max_retry=5)
     pd.DataFrame({'Source': src_lines, 'Translation': tr_lines}).to_excel("output/log/translation_results_for_subtitles.xlsx", index=False)
     console.print("[bold green]✅ Subtitles splitting completed![/bold green]")
+    print_llm_stats()
+    print_router_stats()
 
 if __name__ == '__main__':
     split_for_sub_main()
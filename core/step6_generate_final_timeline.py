@@ -3,8 +3,9 @@ import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from difflib import SequenceMatcher
 import re
-from core.config_utils import load_key, get_joiner
-from core.step2_whisper import get_whisper_language
+from core.telemetry import traced
+from core.media_context import job_context
+from core.transcript_store import load_transcript
 from rich.panel import Panel
 from rich.console import Console
 
@@ -28,12 +29,13 @@ def remove_punctuation(text):
     text = re.sub(r'[^\w\s]', '', text)
     return text.strip()
 
-def get_sentence_timestamps(df_words, df_sentences):
+def get_sentence_timestamps(transcript, df_sentences):
     time_stamp_list = []
     word_index = 0
-    whisper_language = load_key("whisper.language")
-    language = get_whisper_language() if whisper_language == 'auto' else whisper_language
-    joiner = get_joiner(language)
+    joiner = job_context().joiner
+    # Clean every word once instead of on each matching attempt
+    words = [remove_punctuation(word.lower()) for word in transcript.words()]
+    starts, ends = transcript.start, transcript.end
 
     for idx,sentence in df_sentences['Source'].items():
         sentence = remove_punctuation(sentence.lower())
@@ -42,8 +44,8 @@ def get_sentence_timestamps(df_words, df_sentences):
         current_phrase = ""
         start_index = word_index  # record the index of the word where the current sentence starts
 
-        while word_index < len(df_words):
-            word = remove_punctuation(df_words['text'][word_index].lower())
+        while word_index < len(words):
+            word = words[word_index]
 
             current_phrase += word + joiner
 
@@ -51,8 +53,8 @@ def get_sentence_timestamps(df_words, df_sentences):
             if similarity > best_match['score']:
                 best_match = {
                     'score': similarity,
-                    'start': df_words['start'][start_index],
-                    'end': df_words['end'][word_index],
+                    'start': starts[start_index],
+                    'end': ends[word_index],
                     'word_count': word_index - start_index + 1,
                     'phrase': current_phrase
                 }
@@ -76,17 +78,12 @@ def get_sentence_timestamps(df_words, df_sentences):
     
     return time_stamp_list
 
-def align_timestamp(df_text, df_translate, subtitle_output_configs: list, output_dir: str, for_display: bool = True):
+def align_timestamp(transcript, df_translate, subtitle_output_configs: list, output_dir: str, for_display: bool = True):
     """Align timestamps and add a new timestamp column to df_translate"""
     df_trans_time = df_translate.copy()
 
-    # Assign an ID to each word in df_text['text'] and create a new DataFrame
-    words = df_text['text'].str.split(expand=True).stack().reset_index(level=1, drop=True).reset_index()
-    words.columns = ['id', 'word']
-    words['id'] = words['id'].astype(int)
-
     # Process timestamps ⏰
-    time_stamp_list = get_sentence_timestamps(df_text, df_translate)
+    time_stamp_list = get_sentence_timestamps(transcript, df_translate)
     df_trans_time['timestamp'] = time_stamp_list
     df_trans_time['duration'] = df_trans_time['timestamp'].apply(lambda x: x[1] - x[0])
 
@@ -116,9 +113,9 @@ def align_timestamp(df_text, df_translate, subtitle_output_configs: list, output
     
     return df_trans_time
 
+@traced("step6 align timestamps")
 def align_timestamp_main():
-    df_text = pd.read_excel('output/log/cleaned_chunks.xlsx')
-    df_text['text'] = df_text['text'].str.strip('"').str.strip()
+    transcript = load_transcript()
     df_translate = pd.read_excel('output/log/translation_results_for_subtitles.xlsx')
     df_translate['Translation'] = df_translate['Translation'].apply(lambda x: str(x).strip('。').strip('，') if pd.notna(x) else '')
     subtitle_output_configs = [ 
@@ -127,7 +124,7 @@ def align_timestamp_main():
         ('bilingual_src_trans_subtitles.srt', ['Source', 'Translation']),
         ('bilingual_trans_src_subtitles.srt', ['Translation', 'Source'])
     ]
-    align_timestamp(df_text, df_translate, subtitle_output_configs, 'output')
+    align_timestamp(transcript, df_translate, subtitle_output_configs, 'output')
     console.print(Panel("[bold green]🎉📝 Subtitles generation completed! Please check in the `output` folder 👀[/bold green]"))
 
     # for audio
@@ -137,7 +134,7 @@ def align_timestamp_main():
         ('src_subs_for_audio.srt', ['Source']),
         ('trans_subs_for_audio.srt', ['Translation'])
     ]
-    align_timestamp(df_text, df_translate_for_audio, subtitle_output_configs, 'output/audio')
+    align_timestamp(transcript, df_translate_for_audio, subtitle_output_configs, 'output/audio')
     console.print(Panel("[bold green]🎉📝 Audio subtitles generation completed! Please check in the `output/audio` folder 👀[/bold green]"))
     
 
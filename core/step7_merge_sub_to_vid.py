@@ -1,7 +1,10 @@
 import os, subprocess, time, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.config_utils import load_key
-from core.step1_ytdlp import find_video_files
+from core.telemetry import traced, span
+from core.media_context import job_context
+from core.chunked_render import render_chunked
+from core.encoder_probe import SOFTWARE_ENCODERS, get_capabilities, select_encoder, scale_resolution, record_render_time, preset_for
 from rich import print as rprint
 import cv2
 import numpy as np
@@ -27,70 +30,30 @@ TRANS_OUTLINE_WIDTH = 2
 TRANS_BACK_COLOR = '&H00000000'  
 
 def check_gpu_support():
-    """Check if NVIDIA GPU encoding is supported"""
-    try:
-        # Check for NVIDIA GPU encoding support
-        result = subprocess.run(['ffmpeg', '-encoders'], capture_output=True, text=True)
-        return 'h264_nvenc' in result.stdout
-    except Exception:
-        return False
+    """Check if any hardware video encoder is usable, probed once per ffmpeg binary and cached on disk"""
+    return any(e not in SOFTWARE_ENCODERS for e in get_capabilities())
 
-def merge_subtitles_to_video():
-    # Check GPU support
-    use_gpu = check_gpu_support()
-    if use_gpu:
-        rprint("[bold green]NVIDIA GPU encoding support detected, will use GPU acceleration.[/bold green]")
+def get_encoder_choice(profile=None):
+    """Resolve the configured encoding profile to an encoder available on this machine"""
+    choice = select_encoder(profile or load_key("video_encoding.profile"))
+    if choice['hardware']:
+        rprint(f"[bold green]Hardware encoder {choice['encoder']} detected, will use GPU acceleration ({choice['profile']}).[/bold green]")
     else:
-        rprint("[bold yellow]No GPU encoding support detected, falling back to CPU encoding.[/bold yellow]")
-
-    RESOLUTION = load_key("resolution")
-    TARGET_WIDTH, TARGET_HEIGHT = RESOLUTION.split('x')
-    video_file = find_video_files()
-    output_video = "output/output_video_with_subs.mp4"
-    os.makedirs(os.path.dirname(output_video), exist_ok=True)
-
-    # Check resolution
-    if RESOLUTION == '0x0':
-        rprint("[bold yellow]Warning: A 0-second black video will be generated as a placeholder as Resolution is set to 0x0.[/bold yellow]")
-        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_video, fourcc, 1, (1920, 1080))
-        out.write(frame)
-        out.release()
-        rprint("[bold green]Placeholder video has been generated.[/bold green]")
-        return
+        rprint(f"[bold yellow]No GPU encoding support detected, falling back to CPU encoding with {choice['encoder']} ({choice['profile']}).[/bold yellow]")
+    return choice
 
-    en_srt = "output/src_subtitles.srt"
-    trans_srt = "output/trans_subtitles.srt"
-
-    if not os.path.exists(en_srt) or not os.path.exists(trans_srt):
-        print("Subtitle files not found in the 'output' directory.")
-        exit(1)
+def override_preset(choice, preset):
+    """The encoder params of `choice` with an x264 preset name, translated for other encoders (svt-av1 takes numbers)"""
+    params = list(choice['params'])
+    if '-preset' in params:
+        params[params.index('-preset') + 1] = preset_for(choice['encoder'], preset)
+    return params
 
-    # Select encoder and parameters based on GPU support
-    if use_gpu:
-        encoder = 'h264_nvenc'
-        encoding_params = [
-            '-c:v', encoder,
-            '-preset', 'p4',  # NVENC preset, p4 balances performance and quality
-            '-rc:v', 'vbr',   # Variable bitrate
-            '-cq:v', '23',    # Quality parameter, similar to CRF
-            '-b:v', '0',      # Auto bitrate
-            '-maxrate:v', '130M',  # Maximum bitrate
-            '-bufsize:v', '130M',  # Buffer size
-        ]
-    else:
-        encoder = 'libx264'
-        encoding_params = [
-            '-c:v', encoder,
-            '-preset', 'medium',
-            '-crf', '23',
-        ]
-
-    # Define base FFmpeg command parameters
-    base_vf = (
-        f"scale={TARGET_WIDTH}:{TARGET_HEIGHT}:force_original_aspect_ratio=decrease,"
-        f"pad={TARGET_WIDTH}:{TARGET_HEIGHT}:(ow-iw)/2:(oh-ih)/2,"
+def build_subtitle_filter(target_width, target_height, en_srt, trans_srt):
+    """Scale + pad to the target resolution and burn in the source and translated subtitles"""
+    return (
+        f"scale={target_width}:{target_height}:force_original_aspect_ratio=decrease,"
+        f"pad={target_width}:{target_height}:(ow-iw)/2:(oh-ih)/2,"
         f"subtitles={en_srt}:force_style='Fontsize={SRC_FONT_SIZE},FontName={FONT_NAME}," 
         f"PrimaryColour={SRC_FONT_COLOR},OutlineColour={SRC_OUTLINE_COLOR},BorderStyle=1,"
         f"Outline={SRC_OUTLINE_WIDTH}',"
@@ -99,25 +62,24 @@ def merge_subtitles_to_video():
         f"Outline={TRANS_OUTLINE_WIDTH},Alignment=2,MarginV=25'"
     )
 
-    # Generate 30fps video
-    print("🎬 Start merging subtitles to video (30 FPS)...")
-    ffmpeg_cmd = [
-        'ffmpeg', '-i', video_file,
-        '-vf', base_vf.encode('utf-8'),
-        '-r', '30',
-    ] + encoding_params + [
-        '-y',
-        output_video
-    ]
+def generate_placeholder_video(output_video):
+    rprint("[bold yellow]Warning: A 0-second black video will be generated as a placeholder as Resolution is set to 0x0.[/bold yellow]")
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(output_video, fourcc, 1, (1920, 1080))
+    out.write(frame)
+    out.release()
+    rprint("[bold green]Placeholder video has been generated.[/bold green]")
 
-    def run_ffmpeg(cmd, desc):
+def run_ffmpeg(cmd, desc):
+    with span("ffmpeg", desc=desc):
         start_time = time.time()
         process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
                                  universal_newlines=True, encoding='utf-8')
         try:
             for line in process.stdout:
                 print(line, end='')
-            
+        
             process.wait()
             if process.returncode == 0:
                 print(f"\n[{desc} completed in {time.time() - start_time:.2f} seconds.]")
@@ -131,8 +93,61 @@ def merge_subtitles_to_video():
                 process.kill()
             return False
 
+@traced("step7 merge subtitles")
+def merge_subtitles_to_video():
+    choice = get_encoder_choice()
+
+    RESOLUTION = load_key("resolution")
+    TARGET_WIDTH, TARGET_HEIGHT = RESOLUTION.split('x')
+    video_file = job_context().video_file
+    output_video = "output/output_video_with_subs.mp4"
+    os.makedirs(os.path.dirname(output_video), exist_ok=True)
+
+    # Check resolution
+    if RESOLUTION == '0x0':
+        generate_placeholder_video(output_video)
+        return
+
+    en_srt = "output/src_subtitles.srt"
+    trans_srt = "output/trans_subtitles.srt"
+
+    if not os.path.exists(en_srt) or not os.path.exists(trans_srt):
+        print("Subtitle files not found in the 'output' directory.")
+        exit(1)
+
+    TARGET_WIDTH, TARGET_HEIGHT = scale_resolution(TARGET_WIDTH, TARGET_HEIGHT, choice['scale'])
+    start_time = time.time()
+
+    chunked_set = load_key("chunked_render")
+    if chunked_set["enabled"] and not choice['hardware']:
+        # Split the CPU encode into keyframe-aligned chunks rendered by parallel ffmpeg processes
+        render_chunked(
+            video_file, [en_srt, trans_srt], output_video,
+            lambda srts: build_subtitle_filter(TARGET_WIDTH, TARGET_HEIGHT, srts[0], srts[1]),
+            override_preset(choice, chunked_set["preset"]),
+            workers=chunked_set["workers"]
+        )
+        record_render_time(choice, job_context().duration, time.time() - start_time, desc='chunked subtitle render')
+        print(f"🎉🎥 Video has been generated successfully! Please check in the `output` folder 👀")
+        print(f"Output video: {output_video}")
+        return
+
+    base_vf = build_subtitle_filter(TARGET_WIDTH, TARGET_HEIGHT, en_srt, trans_srt) + choice['vf_suffix']
+
+    # Generate 30fps video
+    print("🎬 Start merging subtitles to video (30 FPS)...")
+    ffmpeg_cmd = ['ffmpeg'] + choice['input_args'] + [
+        '-i', video_file,
+        '-vf', base_vf.encode('utf-8'),
+        '-r', '30',
+    ] + choice['params'] + [
+        '-y',
+        output_video
+    ]
+
     # Execute video generation
     if run_ffmpeg(ffmpeg_cmd, "30 FPS video generation"):
+        record_render_time(choice, job_context().duration, time.time() - start_time, desc='subtitle render')
         print(f"🎉🎥 Video has been generated successfully! Please check in the `output` folder 👀")
         print(f"Output video: {output_video}")
     else:
@@ -9,6 +9,7 @@ from rich import print as rprint
 from rich.panel import Panel
 from rich.console import Console
 from core.config_utils import load_key  
+from core.telemetry import traced
 
 console = Console()
 speed_factor = load_key("speed_factor")
@@ -154,6 +155,7 @@ def process_srt():
 
     return df
 
+@traced("step8 audio tasks")
 def gen_audio_task_main():
     output_dir = 'output/audio'
     tasks_file = os.path.join(output_dir, 'sovits_tasks.xlsx')
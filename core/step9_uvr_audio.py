@@ -1,16 +1,22 @@
 import re
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from third_party.uvr5.uvr5_for_videolingo import uvr5_for_videolingo
+from core.telemetry import traced
 from rich import print as rprint
 from rich.panel import Panel
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
 import pandas as pd
+import numpy as np
 import soundfile as sf
+import json
+from concurrent.futures import ThreadPoolExecutor
 
 console = Console()
 
+REFER_SCORES = 'output/audio/refers/scores.json'
+MIN_REF_SECONDS, MAX_REF_SECONDS = 3, 10  # GPT-SoVITS only accepts references in this range
+
 def parse_srt(srt_content):
     pattern = re.compile(r'(\d+)\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n((?:.+\n)+)')
     matches = pattern.findall(srt_content)
@@ -21,21 +27,66 @@ def time_to_ms(time_str):
     s, ms = s.split(',')
     return int(h) * 3600000 + int(m) * 60000 + int(s) * 1000 + int(ms)  # 将时间字符串转换为毫秒
 
+def read_frames(f, start_time, end_time):
+    """Read only [start_time, end_time) seconds from an open SoundFile"""
+    start = max(0, int(start_time * f.samplerate))
+    end = min(f.frames, int(end_time * f.samplerate))
+    f.seek(start)
+    return f.read(max(0, end - start), dtype='float32')
+
 def extract_audio(input_video, start_time, end_time, output_file):
-    start_ms = time_to_ms(start_time)
-    end_ms = time_to_ms(end_time)
-    
     with console.status("[bold green]Extracting audio..."):
-        # Read audio file
-        data, samplerate = sf.read(input_video)
-        # Calculate start and end samples
-        start_sample = int(start_ms * samplerate / 1000)
-        end_sample = int(end_ms * samplerate / 1000)
-        # Extract audio segment
-        extract = data[start_sample:end_sample]
-        # Save extracted audio
-        sf.write(output_file, extract, samplerate)
+        with sf.SoundFile(input_video) as f:
+            extract = read_frames(f, time_to_ms(start_time) / 1000, time_to_ms(end_time) / 1000)
+            sf.write(output_file, extract, f.samplerate)
+
+def score_reference(clip, samplerate):
+    """Duration, loudness and a rough SNR (loud half of 20ms frames vs the quietest 10%)"""
+    mono = clip.mean(axis=1) if clip.ndim > 1 else clip
+    duration = len(mono) / samplerate
+    frame = int(0.02 * samplerate)
+    n = len(mono) // frame
+    if n < 10:
+        return {'duration': round(duration, 2), 'rms_db': -100.0, 'snr_db': 0.0, 'usable': False}
+    energy = np.sort(np.square(mono[:n * frame].reshape(n, frame)).mean(axis=1)) + 1e-10
+    noise = energy[:max(1, n // 10)].mean()
+    signal = energy[n // 2:].mean()
+    return {
+        'duration': round(duration, 2),
+        'rms_db': round(float(10 * np.log10(energy.mean())), 1),
+        'snr_db': round(float(10 * np.log10(signal / noise)), 1),
+        'usable': MIN_REF_SECONDS <= duration <= MAX_REF_SECONDS,
+    }
 
+def pick_best_reference(scores):
+    """Cleanest usable clip, or the cleanest one that is not too long if none fits the range.
+    None when no clip was extracted"""
+    if not scores:
+        return None
+    candidates = [n for n, s in scores.items() if s['usable']] or \
+                 [n for n, s in scores.items() if s['duration'] <= MAX_REF_SECONDS] or list(scores)
+    return max(candidates, key=lambda n: (scores[n]['snr_db'], scores[n]['rms_db']))
+
+def extract_references(df, vocal_path, refers_dir, workers=4, on_clip=None):
+    """Cut one reference clip per task. Clips are read with seek/read so only their own frames
+    are in memory, and written by a thread pool; at most 2 * workers clips wait for writing."""
+    scores = {}
+    with sf.SoundFile(vocal_path) as f, ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for _, row in df.iterrows():
+            number = int(row['number'])
+            clip = read_frames(f, time_to_seconds(row['start_time']), time_to_seconds(row['end_time']))
+            scores[number] = score_reference(clip, f.samplerate)
+            pending.append(executor.submit(sf.write, os.path.join(refers_dir, f"{number}.wav"), clip, f.samplerate))
+            if len(pending) >= workers * 2:
+                pending.pop(0).result()
+            if on_clip is not None:
+                on_clip()
+        for future in pending:
+            future.result()
+    return scores
+
+@traced("step9 uvr")
 def uvr_audio_main():
     output_dir = 'output/audio'
 
@@ -43,6 +94,8 @@ def uvr_audio_main():
     if os.path.exists(os.path.join(output_dir, 'background.wav')):
         rprint(Panel(f"{os.path.join(output_dir, 'background.wav')} already exists, skip uvr5 processing.", title="Info", border_style="blue"))
     else:
+        # UVR5 loads torch and its models, so it is imported only when separation actually runs
+        from third_party.uvr5.uvr5_for_videolingo import uvr5_for_videolingo
         uvr5_for_videolingo(
             'output/audio/raw_full_audio.wav',
             'output/audio',
@@ -71,23 +124,11 @@ def uvr_audio_main():
         
         with progress:
             extract_task = progress.add_task("[cyan]Extracting audio segments...", total=len(df))
-            
-            # Read the full audio file once
-            data, samplerate = sf.read(original_vocal_path)
-            
-            for _, row in df.iterrows():
-                number = row['number']
-                start_time = time_to_seconds(row['start_time'])
-                end_time = time_to_seconds(row['end_time'])
-                output_file = os.path.join(refers_dir, f"{number}.wav")
-                # Calculate start and end samples
-                start_sample = int(start_time * samplerate)
-                end_sample = int(end_time * samplerate)
-                # Extract and Save audio segment
-                extract = data[start_sample:end_sample]
-                sf.write(output_file, extract, samplerate)
-                
-                progress.update(extract_task, advance=1)
+            scores = extract_references(df, original_vocal_path, refers_dir,
+                                        on_clip=lambda: progress.update(extract_task, advance=1))
+
+        with open(REFER_SCORES, 'w', encoding='utf-8') as f:
+            json.dump({'best': pick_best_reference(scores), 'clips': scores}, f, ensure_ascii=False, indent=4)
         rprint(Panel(f"Audio segments extracted and saved in {refers_dir}", title="Success", border_style="green"))
     
 def time_to_seconds(time_str):
@@ -0,0 +1,242 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import time
+import threading
+import functools
+from itertools import count
+from core.config_utils import load_key
+
+TRACE_FILE = 'output/log/trace.jsonl'
+CHROME_TRACE_FILE = 'output/log/trace_chrome.json'
+COUNTERS = ('llm_calls', 'llm_tokens_in', 'llm_tokens_out', 'cache_hits', 'prefix_hits', 'llm_eval_ms')
+
+# When disabled, `span` hands out this shared no-op context and `traced` calls straight through,
+# so instrumented code only pays for one attribute lookup
+class _NoopSpan:
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+    def add(self, key, n=1):
+        pass
+
+_NOOP = _NoopSpan()
+
+class _State:
+    enabled = None  # resolved from config on first use, re-read by start_trace at the start of each run
+    trace_file = TRACE_FILE
+    finished = []
+    lock = threading.Lock()
+    local = threading.local()
+    root_thread = threading.main_thread().ident  # the thread that started the trace (Streamlit runs scripts off the main thread)
+    root_stack = []  # spans opened by root_thread; worker threads without spans attach here
+    ids = count(1)
+
+_state = _State()
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+def _child_cpu():
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def _io_bytes():
+    """(read, written) bytes of this process: /proc on Linux, psutil elsewhere, None if neither works"""
+    try:
+        with open('/proc/self/io', 'rb') as f:
+            fields = dict(line.split(b': ') for line in f.read().splitlines())
+        return int(fields[b'read_bytes']), int(fields[b'write_bytes'])
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+        io = psutil.Process().io_counters()
+        return io.read_bytes, io.write_bytes
+    except Exception:
+        return None
+
+def _stack():
+    stack = getattr(_state.local, 'stack', None)
+    if stack is None:
+        stack = _state.root_stack if threading.get_ident() == _state.root_thread else []
+        _state.local.stack = stack
+    return stack
+
+def _current():
+    stack = _stack()
+    if stack:
+        return stack[-1]
+    return _state.root_stack[-1] if _state.root_stack else None
+
+class Span:
+    """One timed region. Counters added inside it also count for its parents once it closes."""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def __enter__(self):
+        parent = _current()
+        self.id = next(_state.ids)
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.tid = threading.get_ident()
+        self.io = _io_bytes()
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        self.cpu = time.process_time()
+        self.child_cpu = _child_cpu()
+        _stack().append(self)
+        return self
+
+    def add(self, key, n=1):
+        with _state.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def __exit__(self, exc_type, exc, tb):
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        io = _io_bytes()
+        record = {
+            'id': self.id,
+            'parent': self.parent.id if self.parent is not None else None,
+            'name': self.name,
+            'depth': self.depth,
+            'tid': self.tid,
+            'ts': self.wall,
+            'wall_s': round(time.perf_counter() - self.start, 6),
+            'cpu_s': round(time.process_time() - self.cpu, 6),
+            'child_cpu_s': round(_child_cpu() - self.child_cpu, 6),
+            'peak_rss_mb': _peak_rss_mb(),
+            'read_bytes': io[0] - self.io[0] if io and self.io else None,
+            'write_bytes': io[1] - self.io[1] if io and self.io else None,
+            'error': exc_type.__name__ if exc_type else None,
+            **self.counters,
+            **self.attrs,
+        }
+        with _state.lock:
+            if self.parent is not None:
+                for key, n in self.counters.items():
+                    self.parent.counters[key] = self.parent.counters.get(key, 0) + n
+            _state.finished.append(record)
+            os.makedirs(os.path.dirname(_state.trace_file) or '.', exist_ok=True)
+            with open(_state.trace_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return False
+
+def enabled():
+    """`telemetry.enabled`, read once per trace: toggling the config takes effect at the next start_trace"""
+    if _state.enabled is None:
+        try:
+            _state.enabled = bool(load_key("telemetry.enabled"))
+        except KeyError:
+            _state.enabled = False
+    return _state.enabled
+
+def start_trace(trace_file=TRACE_FILE, enable=None):
+    """Begin a new trace (one per video or UI/CLI run): re-read the config, forget previous spans
+    and truncate the trace file so it only holds this run"""
+    _state.enabled = enable
+    _state.trace_file = trace_file
+    _state.finished = []
+    _state.root_stack.clear()
+    _state.root_thread = threading.get_ident()
+    _state.local = threading.local()
+    if enabled() and os.path.exists(trace_file):
+        os.remove(trace_file)
+    return enabled()
+
+def finish_trace():
+    """Print the per-span table and export the Chrome trace if `telemetry.chrome_trace` is on"""
+    print_summary()
+    if enabled() and load_key("telemetry.chrome_trace") and os.path.exists(_state.trace_file):
+        export_chrome_trace(_state.trace_file)
+
+def span(name, **attrs):
+    """`with span("step4 translate"):` records wall/CPU time, peak RSS, I/O and counters"""
+    if not enabled():
+        return _NOOP
+    return Span(name, attrs)
+
+def traced(name=None):
+    """Decorator form of `span`, checked on every call so it follows the current trace's setting"""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return fn(*args, **kwargs)
+            with Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def add(key, n=1):
+    """Add to a counter (llm_calls, llm_tokens_in/out, llm_eval_ms, cache_hits, prefix_hits) of the innermost open span"""
+    if not enabled():
+        return
+    current = _current()
+    if current is not None:
+        current.add(key, n)
+
+def export_chrome_trace(trace_file=TRACE_FILE, output_file=CHROME_TRACE_FILE):
+    """Convert the JSON-lines trace into Chrome's trace format (chrome://tracing, Perfetto)"""
+    events = []
+    with open(trace_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            args = {k: v for k, v in record.items() if k not in ('name', 'ts', 'wall_s', 'tid')}
+            events.append({
+                'name': record['name'], 'ph': 'X', 'pid': 0, 'tid': record['tid'],
+                'ts': record['ts'] * 1e6, 'dur': record['wall_s'] * 1e6, 'args': args,
+            })
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    return output_file
+
+def summarize(max_depth=1):
+    """Totals per span name for spans up to `max_depth`, in the order they first started"""
+    rows = {}
+    for record in _state.finished:
+        if record['depth'] > max_depth:
+            continue
+        row = rows.setdefault(record['name'], {'depth': record['depth'], 'first_ts': record['ts'], 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                              'peak_rss_mb': 0.0, 'read_bytes': 0, 'write_bytes': 0,
+                                              **dict.fromkeys(COUNTERS, 0)})
+        row['calls'] += 1
+        row['first_ts'] = min(row['first_ts'], record['ts'])
+        for key in ('wall_s', 'cpu_s', 'read_bytes', 'write_bytes') + COUNTERS:
+            row[key] += record.get(key) or 0
+        row['cpu_s'] += record.get('child_cpu_s') or 0
+        row['peak_rss_mb'] = max(row['peak_rss_mb'], record.get('peak_rss_mb') or 0)
+    return dict(sorted(rows.items(), key=lambda x: x[1]['first_ts']))
+
+def print_summary(max_depth=1):
+    if not enabled() or not _state.finished:
+        return
+    from rich.console import Console
+    from rich.table import Table
+    table = Table(title="Pipeline telemetry")
+    for column in ("Span", "Calls", "Wall s", "CPU s", "Peak RSS MB", "Read MB", "Written MB", "LLM calls", "Tokens in/out", "Tokens/s", "Cache hits", "Prefix hits"):
+        table.add_column(column, justify="left" if column == "Span" else "right")
+    for name, row in summarize(max_depth).items():
+        rate = f"{row['llm_tokens_out'] / (row['llm_eval_ms'] / 1000):.1f}" if row['llm_eval_ms'] else '-'
+        table.add_row(
+            "  " * row['depth'] + name, str(row['calls']), f"{row['wall_s']:.2f}", f"{row['cpu_s']:.2f}",
+            f"{row['peak_rss_mb']:.0f}", f"{row['read_bytes'] / (1 << 20):.1f}", f"{row['write_bytes'] / (1 << 20):.1f}",
+            str(row['llm_calls']), f"{row['llm_tokens_in']}/{row['llm_tokens_out']}", rate, str(row['cache_hits']), str(row['prefix_hits']),
+        )
+    Console().print(table)
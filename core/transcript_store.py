@@ -0,0 +1,152 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+import pandas as pd
+
+CLEANED_CHUNKS = 'output/log/cleaned_chunks.xlsx'
+
+class Transcript:
+    """Word-level transcript kept as flat columns instead of one record per word.
+
+    All words live in one string `text`, separated by single spaces; word i is
+    text[char_start[i]:char_end[i]]. `start`, `end` (seconds) and `score` are float arrays
+    (score is NaN where the transcriber gave none). Two sorted indexes make lookups O(log n):
+    `char_start` for text offsets, and the start-time order with a running max of end times
+    for time ranges, which also holds when whisper emits slightly out-of-order words.
+    """
+
+    def __init__(self, words, start, end, score=None):
+        words = [str(w) for w in words]
+        lengths = np.fromiter((len(w) for w in words), dtype=np.int32, count=len(words))
+        self.char_start = np.zeros(len(words), dtype=np.int32)
+        if len(words) > 1:
+            np.cumsum(lengths[:-1] + 1, out=self.char_start[1:])
+        self.char_end = self.char_start + lengths
+        self.text = ' '.join(words)
+        self.start = np.asarray(start, dtype=np.float64)
+        self.end = np.asarray(end, dtype=np.float64)
+        self.score = np.full(len(words), np.nan, dtype=np.float32) if score is None else np.asarray(score, dtype=np.float32)
+
+        # Whisper output is almost always in start order already; only keep a permutation when it is not
+        self._by_start = None if np.all(np.diff(self.start) >= 0) else np.argsort(self.start, kind='stable').astype(np.int32)
+        self._sorted_start = self.start if self._by_start is None else self.start[self._by_start]
+        sorted_end = self.end if self._by_start is None else self.end[self._by_start]
+        self._max_end = np.maximum.accumulate(sorted_end) if len(words) else sorted_end
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """From the cleaned_chunks columns (text, start, end[, score]); quotes added on save are removed"""
+        words = df['text'].astype(str).str.strip('"').str.strip()
+        score = df['score'].to_numpy() if 'score' in df.columns else None
+        return cls(words.to_list(), df['start'].to_numpy(), df['end'].to_numpy(), score)
+
+    def to_dataframe(self):
+        return pd.DataFrame({'text': self.words(), 'start': self.start, 'end': self.end, 'score': self.score})
+
+    def __len__(self):
+        return len(self.start)
+
+    def word(self, i):
+        return self.text[self.char_start[i]:self.char_end[i]]
+
+    def words(self, lo=0, hi=None):
+        hi = len(self) if hi is None else hi
+        return [self.text[s:e] for s, e in zip(self.char_start[lo:hi].tolist(), self.char_end[lo:hi].tolist())]
+
+    def joined(self, joiner=' '):
+        """The full text with `joiner` between words, without copying word by word for the default space"""
+        return self.text if joiner == ' ' else joiner.join(self.words())
+
+    def in_time_range(self, t0, t1):
+        """Indices (in transcript order) of the words overlapping [t0, t1)"""
+        lo = np.searchsorted(self._max_end, t0, side='right')  # every word before lo ends by t0
+        hi = np.searchsorted(self._sorted_start, t1, side='left')  # every word from hi starts at/after t1
+        if lo >= hi:
+            return np.zeros(0, dtype=np.int64)
+        if self._by_start is None:
+            candidates = np.arange(lo, hi)
+            return candidates[self.end[lo:hi] > t0]
+        candidates = self._by_start[lo:hi]
+        return np.sort(candidates[self.end[candidates] > t0])
+
+    def word_at_char(self, offset):
+        """Index of the word containing (or the last word before) char `offset` of `text`"""
+        return max(int(np.searchsorted(self.char_start, offset, side='right')) - 1, 0)
+
+    def words_in_span(self, char_lo, char_hi):
+        """[first, last + 1) word indices touching the text span [char_lo, char_hi)"""
+        first = int(np.searchsorted(self.char_end, char_lo, side='right'))
+        last = int(np.searchsorted(self.char_start, char_hi, side='left'))
+        return first, max(first, last)
+
+    def span_times(self, char_lo, char_hi):
+        """(start, end) seconds of the words covering a text span"""
+        first, last = self.words_in_span(char_lo, char_hi)
+        if first >= last:
+            raise ValueError(f"No words in span [{char_lo}, {char_hi})")
+        return float(self.start[first]), float(self.end[last - 1])
+
+    def nbytes(self):
+        arrays = {id(a): a for a in (self.char_start, self.char_end, self.start, self.end, self.score,
+                                     self._sorted_start, self._max_end) + ((self._by_start,) if self._by_start is not None else ())}
+        return sys.getsizeof(self.text) + sum(a.nbytes for a in arrays.values())
+
+_cache = {}
+
+def load_transcript(path=CLEANED_CHUNKS):
+    """Load cleaned_chunks.xlsx once per process; steps 3-8 share the same object until the file changes"""
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if key not in _cache:
+        _cache.clear()
+        _cache[key] = Transcript.from_dataframe(pd.read_excel(path))
+    return _cache[key]
+
+if __name__ == '__main__':
+    # Memory and lookup cost against a DataFrame of dict-per-word records, on a synthetic hour of speech
+    import time
+    import tracemalloc
+
+    n = 20000
+    rng = np.random.default_rng(0)
+    starts = np.cumsum(rng.uniform(0.1, 0.3, n))
+    vocab = ['word%d' % i for i in range(3000)]
+    words = ['%s' % vocab[i] for i in rng.integers(0, len(vocab), n)]
+
+    def traced(build):
+        tracemalloc.start()
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return result, size
+
+    # Each word string is allocated inside the traced block, as when reading the xlsx
+    records, records_mem = traced(lambda: [{'text': w + '', 'start': s, 'end': s + 0.2, 'score': 0.9}
+                                           for w, s in zip(words, starts.tolist())])
+    df, df_mem = traced(lambda: pd.DataFrame(records))
+    df_mem += records_mem
+    del records
+    store, store_mem = traced(lambda: Transcript(words, starts, starts + 0.2, np.full(n, 0.9)))
+
+    queries = rng.uniform(0, starts[-1], 1000)
+    t = time.perf_counter()
+    df_hits = [df.index[(df['start'] < q + 5) & (df['end'] > q)].to_numpy() for q in queries]
+    df_time = time.perf_counter() - t
+    t = time.perf_counter()
+    store_hits = [store.in_time_range(q, q + 5) for q in queries]
+    store_time = time.perf_counter() - t
+    assert all(np.array_equal(a, b) for a, b in zip(df_hits, store_hits))
+
+    offsets = rng.integers(0, len(store.text), 1000)
+    t = time.perf_counter()
+    for o in offsets:
+        (df['text'].str.len() + 1).cumsum().searchsorted(o, side='right')
+    df_char = time.perf_counter() - t
+    t = time.perf_counter()
+    for o in offsets:
+        store.word_at_char(o)
+    store_char = time.perf_counter() - t
+
+    print(f"{n} words")
+    print(f"memory      records + DataFrame {df_mem / 1024:8.0f} KB | store {store_mem / 1024:8.0f} KB ({store.nbytes() / 1024:.0f} KB kept)")
+    print(f"time range  DataFrame {df_time * 1000:8.1f} ms | store {store_time * 1000:8.1f} ms (1000 queries)")
+    print(f"char offset DataFrame {df_char * 1000:8.1f} ms | store {store_char * 1000:8.1f} ms (1000 queries)")
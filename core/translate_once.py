@@ -1,7 +1,7 @@
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.ask_gpt import ask_gpt
-from core.prompts_storage import generate_shared_prompt, get_prompt_faithfulness, get_prompt_expressiveness
+from core.prompts_storage import generate_video_context, generate_neighbor_context, get_prompt_faithfulness, get_prompt_expressiveness
 from rich.panel import Panel
 from rich.console import Console
 from rich.table import Table
@@ -32,7 +32,9 @@ def valid_translate_result(result: dict, required_keys: list, required_sub_keys:
     return {"status": "success", "message": "Translation completed"}
 
 def translate_lines(lines, previous_content_prompt, after_cotent_prompt, things_to_note_prompt, summary_prompt, index = 0):
-    shared_prompt = generate_shared_prompt(previous_content_prompt, after_cotent_prompt, summary_prompt, things_to_note_prompt)
+    # The video context leads both prompts and is identical for every chunk, the neighbours change per chunk
+    video_context = generate_video_context(summary_prompt, things_to_note_prompt)
+    neighbor_context = generate_neighbor_context(previous_content_prompt, after_cotent_prompt)
 
     # Retry translation if the length of the original text and the translated text are not the same, or if the specified key is missing
     def retry_translation(prompt, step_name):
@@ -52,14 +54,14 @@ def translate_lines(lines, previous_content_prompt, after_cotent_prompt, things_
         raise ValueError(f'[red]❌ {step_name.capitalize()} translation of block {index} failed after 10 retries. Please check your input text.[/red]')
 
     ## Step 1: Faithful to the Original Text
-    prompt1 = get_prompt_faithfulness(lines, shared_prompt)
+    prompt1 = get_prompt_faithfulness(lines, video_context, neighbor_context)
     faith_result = retry_translation(prompt1, 'faithfulness')
 
     for i in faith_result:
         faith_result[i]["direct"] = faith_result[i]["direct"].replace('\n', ' ')
 
     ## Step 2: Express Smoothly  
-    prompt2 = get_prompt_expressiveness(faith_result, lines, shared_prompt)
+    prompt2 = get_prompt_expressiveness(faith_result, lines, video_context, neighbor_context)
     express_result = retry_translation(prompt2, 'expressiveness')
 
     table = Table(title="Translation Results", show_header=False, box=box.ROUNDED)
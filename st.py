@@ -2,6 +2,8 @@ import streamlit as st
 import os, sys
 from st_components.imports_and_utils import *
 from core.config_utils import load_key
+from core import telemetry
+from st_components.job_section import job_section
 
 # SET PATH
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -31,6 +33,8 @@ def text_processing_section():
                 st.rerun()
             if st.button("Merge Subtitles to Video", key="merge_subtitles_button"):
                 step7_merge_sub_to_vid.merge_subtitles_to_video()
+            if os.path.exists("output/trans_subtitles.srt"):
+                preview_section()
         else:
             st.success("Subtitle translation is complete! It's recommended to download the srt file and process it yourself.")
             if load_key("resolution") != "0x0":
@@ -42,22 +46,53 @@ def text_processing_section():
                 st.rerun()
             return True
 
+def preview_section():
+    """Review subtitles without the full burn-in: soft subtitle tracks plus optional low-res clips"""
+    with st.expander("Quick Preview", expanded=True):
+        if st.button("Generate Subtitle Preview", key="soft_preview_button"):
+            with st.spinner("Muxing subtitle tracks..."):
+                try:
+                    preview_render.mux_soft_subtitles()
+                except RuntimeError as e:
+                    st.error(str(e))
+        preview_video = preview_render.get_soft_preview_path()
+        if os.path.exists(preview_video):
+            st.video(preview_video, subtitles={"Source": preview_render.SRC_SRT, "Translation": preview_render.TRANS_SRT})
+
+        ranges_text = st.text_input("Burned-in preview ranges", placeholder="00:01:00-00:01:30, 125-140", key="preview_ranges")
+        if st.button("Render Preview Clips", key="burned_preview_button") and ranges_text:
+            try:
+                ranges = preview_render.parse_time_ranges(ranges_text)
+            except ValueError as e:
+                st.error(f"Invalid ranges: {e}")
+                return
+            with st.spinner("Rendering preview clips..."):
+                clips, failed = preview_render.render_burned_clips(ranges)
+            for clip in clips:
+                st.video(clip)
+            if failed:
+                st.error("Failed to render preview clips for " + ", ".join(f"{start:.1f}s-{end:.1f}s" for start, end in failed) + ". Please check the logs.")
+
 def process_text():
-    with st.spinner("Using Whisper for transcription..."):
-        step2_whisper.transcribe()
-    with st.spinner("Splitting long sentences..."):  
-        step3_1_spacy_split.split_by_spacy()
-        step3_2_splitbymeaning.split_sentences_by_meaning()
-    with st.spinner("Summarizing and translating..."):
-        step4_1_summarize.get_summary()
-        if load_key("pause_before_translate"):
-            input("⚠️ PAUSE_BEFORE_TRANSLATE. Go to `output/log/terminology.json` to edit terminology. Then press ENTER to continue...")
-        step4_2_translate_all.translate_all()
-    with st.spinner("Processing and aligning subtitles..."): 
-        step5_splitforsub.split_for_sub_main()
-        step6_generate_final_timeline.align_timestamp_main()
-    # with st.spinner("Merging subtitles to video..."):
-    #     step7_merge_sub_to_vid.merge_subtitles_to_video()
+    telemetry.start_trace()
+    try:
+        with st.spinner("Using Whisper for transcription..."):
+            step2_whisper.transcribe()
+        with st.spinner("Splitting long sentences..."):  
+            step3_1_spacy_split.split_by_spacy()
+            step3_2_splitbymeaning.split_sentences_by_meaning()
+        with st.spinner("Summarizing and translating..."):
+            step4_1_summarize.get_summary()
+            if load_key("pause_before_translate"):
+                input("⚠️ PAUSE_BEFORE_TRANSLATE. Go to `output/log/terminology.json` to edit terminology. Then press ENTER to continue...")
+            step4_2_translate_all.translate_all()
+        with st.spinner("Processing and aligning subtitles..."): 
+            step5_splitforsub.split_for_sub_main()
+            step6_generate_final_timeline.align_timestamp_main()
+        # with st.spinner("Merging subtitles to video..."):
+        #     step7_merge_sub_to_vid.merge_subtitles_to_video()
+    finally:
+        telemetry.finish_trace()
     
     st.success("Subtitle processing complete! 🎉")
     st.balloons()
@@ -90,14 +125,18 @@ def audio_processing_section():
                 st.rerun()
 
 def process_audio():
-    with st.spinner("Generate audio tasks"): 
-        step8_gen_audio_task.gen_audio_task_main()
-    with st.spinner("UVR5 Process"):
-        step9_uvr_audio.uvr_audio_main()
-    with st.spinner("Generate audio"):
-        step10_gen_audio.process_sovits_tasks()
-    with st.spinner("Merge audio into the video"):
-        step11_merge_audio_to_vid.merge_main()
+    telemetry.start_trace()
+    try:
+        with st.spinner("Generate audio tasks"): 
+            step8_gen_audio_task.gen_audio_task_main()
+        with st.spinner("UVR5 Process"):
+            step9_uvr_audio.uvr_audio_main()
+        with st.spinner("Generate audio"):
+            step10_gen_audio.process_sovits_tasks()
+        with st.spinner("Merge audio into the video"):
+            step11_merge_audio_to_vid.merge_main()
+    finally:
+        telemetry.finish_trace()
     
     st.success("Audio processing complete! 🎇")
     st.balloons()
@@ -112,6 +151,9 @@ def main():
     with st.sidebar:
         page_setting()
         st.markdown(give_star_button, unsafe_allow_html=True)
+    if load_key("job_server.enabled"):
+        job_section()
+        return
     download_video_section()
     text_processing_section()
     audio_processing_section()
@@ -1,8 +1,14 @@
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core import step2_whisper, step1_ytdlp, step3_1_spacy_split, step3_2_splitbymeaning
-from core import step4_1_summarize, step4_2_translate_all, step5_splitforsub, step6_generate_final_timeline 
-from core import step7_merge_sub_to_vid, step8_gen_audio_task, step9_uvr_audio, step10_gen_audio, step11_merge_audio_to_vid
+from core.lazy_import import lazy_module
+# Step modules are imported when a button first runs them, not on every page load
+step1_ytdlp, step2_whisper = lazy_module('core.step1_ytdlp'), lazy_module('core.step2_whisper')
+step3_1_spacy_split, step3_2_splitbymeaning = lazy_module('core.step3_1_spacy_split'), lazy_module('core.step3_2_splitbymeaning')
+step4_1_summarize, step4_2_translate_all = lazy_module('core.step4_1_summarize'), lazy_module('core.step4_2_translate_all')
+step5_splitforsub, step6_generate_final_timeline = lazy_module('core.step5_splitforsub'), lazy_module('core.step6_generate_final_timeline')
+step7_merge_sub_to_vid, step8_gen_audio_task = lazy_module('core.step7_merge_sub_to_vid'), lazy_module('core.step8_gen_audio_task')
+step9_uvr_audio, step10_gen_audio = lazy_module('core.step9_uvr_audio'), lazy_module('core.step10_gen_audio')
+step11_merge_audio_to_vid, preview_render = lazy_module('core.step11_merge_audio_to_vid'), lazy_module('core.preview_render')
 from core.onekeycleanup import cleanup  
 from core.delete_retry_dubbing import delete_dubbing_files
 from core.ask_gpt import ask_gpt
@@ -0,0 +1,61 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import requests
+from core.config_utils import load_key
+
+# ------------
+# Client of the job server (core/job_server.py). The web UI only submits and watches jobs
+# through it; the work runs in the server's workers.
+# ------------
+
+TIMEOUT = 10
+
+class JobServerError(Exception):
+    pass
+
+def base_url():
+    return f"http://{load_key('job_server.host')}:{load_key('job_server.port')}"
+
+def _call(method, path, timeout=TIMEOUT, **kwargs):
+    try:
+        response = requests.request(method, base_url() + path, timeout=timeout, **kwargs)
+    except requests.RequestException as e:
+        raise JobServerError(f"Job server not reachable at {base_url()}, start it with `python -m core.job_server`: {e}")
+    if response.status_code >= 400:
+        try:
+            message = response.json().get('error', response.text)
+        except ValueError:
+            message = response.text
+        raise JobServerError(f"{response.status_code}: {message}")
+    return response
+
+def health():
+    return _call('GET', '/health').json()
+
+def upload(name, data):
+    """Send the bytes of a video file, returns the upload id to submit a job with"""
+    return _call('POST', '/uploads', params={'filename': name}, data=data, timeout=None).json()['upload']
+
+def submit(**spec):
+    return _call('POST', '/jobs', json=spec).json()
+
+def list_jobs(limit=20):
+    return _call('GET', '/jobs', params={'limit': limit}).json()['jobs']
+
+def get_job(job_id):
+    return _call('GET', f'/jobs/{job_id}').json()
+
+def cancel(job_id):
+    return _call('POST', f'/jobs/{job_id}/cancel').json()
+
+def events(job_id, after=0):
+    return _call('GET', f'/jobs/{job_id}/events', params={'after': after}).json()['events']
+
+def log_tail(job_id, lines=50):
+    return _call('GET', f'/jobs/{job_id}/log', params={'tail': lines}).json()['lines']
+
+def artifacts(job_id):
+    return _call('GET', f'/jobs/{job_id}/artifacts').json()['artifacts']
+
+def download(job_id, path):
+    return _call('GET', f'/jobs/{job_id}/artifacts/{path}', timeout=None).content
@@ -0,0 +1,74 @@
+import streamlit as st
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from time import sleep
+from core.config_utils import load_key
+from st_components import job_client
+
+STATUS_ICONS = {'queued': '⏳', 'running': '⚙️', 'done': '✅', 'failed': '❌', 'cancelled': '🚫'}
+REFRESH_SECONDS = 3
+
+def job_section():
+    """Submit videos to the job server and follow its jobs. Jobs keep running when the page reloads"""
+    st.header("Jobs")
+    try:
+        job_client.health()
+    except job_client.JobServerError as e:
+        st.error(str(e))
+        return
+    submit_form()
+    jobs_list()
+
+def submit_form():
+    with st.container(border=True):
+        url = st.text_input("Enter YouTube link:", key="job_url")
+        uploaded_file = st.file_uploader("Or upload video", type=load_key("allowed_video_formats"), key="job_upload")
+        dubbing = st.checkbox("Also dub the video", key="job_dubbing")
+        if st.button("Submit Job", key="submit_job_button", use_container_width=True):
+            if not url and not uploaded_file:
+                st.warning("Enter a link or upload a video first")
+                return
+            try:
+                if uploaded_file:
+                    upload_id = job_client.upload(uploaded_file.name, uploaded_file.getvalue())
+                    job = job_client.submit(upload=upload_id, dubbing=dubbing)
+                else:
+                    job = job_client.submit(url=url, dubbing=dubbing)
+            except job_client.JobServerError as e:
+                st.error(str(e))
+                return
+            st.success(f"Job {job['id']} queued")
+
+def jobs_list():
+    jobs = job_client.list_jobs()
+    if not jobs:
+        st.info("No jobs yet")
+        return
+    for job in jobs:
+        job_card(job)
+    active = any(job['status'] in ('queued', 'running') for job in jobs)
+    if active and st.toggle("Auto refresh", value=True, key="jobs_auto_refresh"):
+        sleep(REFRESH_SECONDS)
+        st.rerun()
+
+def job_card(job):
+    source = job['spec'].get('url') or job['spec'].get('upload') or job['spec'].get('video_path') or job['spec'].get('seed')
+    progress = job['progress']
+    with st.expander(f"{STATUS_ICONS.get(job['status'], '')} {job['id']} · {job['status']} · {source}", expanded=job['status'] == 'running'):
+        st.progress(progress['done'] / max(progress['total'], 1), text=f"{progress['done']}/{progress['total']} {progress['step'] or ''}")
+        if job['error']:
+            st.error(job['error'])
+        if job['status'] in ('queued', 'running'):
+            if st.button("Cancel", key=f"cancel_{job['id']}"):
+                job_client.cancel(job['id'])
+                st.rerun()
+            st.code('\n'.join(job_client.log_tail(job['id'], 15)) or ' ')
+        else:
+            artifacts_section(job['id'])
+
+def artifacts_section(job_id):
+    files = [a['path'] for a in job_client.artifacts(job_id) if '/' not in a['path']]
+    for path in sorted(p for p in files if p.endswith('.srt')):
+        st.download_button(label=path, data=job_client.download(job_id, path), file_name=path, key=f"{job_id}_{path}")
+    for path in sorted(p for p in files if p.startswith('output_') and p.endswith('.mp4')):
+        st.markdown(f"[{path}]({job_client.base_url()}/jobs/{job_id}/artifacts/{path})")
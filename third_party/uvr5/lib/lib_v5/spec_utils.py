@@ -7,6 +7,80 @@ import librosa
 import numpy as np
 import soundfile as sf
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _pool():
+    """Shared pool for STFT/iSTFT/resample work. Only leaf tasks are submitted to it, nothing
+    running inside the pool waits on the pool, so concurrent separation jobs can share it."""
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="spec")
+
+
+def _stereo_pair(wave, mid_side=False, mid_side_b2=False, reverse=False):
+    if reverse:
+        return np.flip(wave[0]), np.flip(wave[1])
+    elif mid_side:
+        return np.add(wave[0], wave[1]) / 2, np.subtract(wave[0], wave[1])
+    elif mid_side_b2:
+        return np.add(wave[1], wave[0] * 0.5), np.subtract(wave[0], wave[1] * 0.5)
+    return wave[0], wave[1]
+
+
+def _merge_pair(wave_left, wave_right, mid_side=False, mid_side_b2=False, reverse=False):
+    """Inverse of `_stereo_pair`, into one preallocated Fortran-order (2, n) array"""
+    wave = np.empty((2, len(wave_left)), dtype=wave_left.dtype, order="F")
+    if reverse:
+        wave[0], wave[1] = np.flip(wave_left), np.flip(wave_right)
+    elif mid_side:
+        np.add(wave_left, wave_right / 2, out=wave[0])
+        np.subtract(wave_left, wave_right / 2, out=wave[1])
+    elif mid_side_b2:
+        np.add(wave_right / 1.25, 0.4 * wave_left, out=wave[0])
+        np.subtract(wave_left / 1.25, 0.4 * wave_right, out=wave[1])
+    else:
+        wave[0], wave[1] = wave_left, wave_right
+    return wave
+
+
+def _submit_stft(spec, channel, wave, n_fft, hop_length):
+    """Compute one channel's STFT in the pool, writing straight into `spec[channel]`"""
+
+    def run():
+        spec[channel] = librosa.stft(np.asfortranarray(wave), n_fft=n_fft, hop_length=hop_length)
+
+    return _pool().submit(run)
+
+
+def _submit_stereo_stft(wave, hop_length, n_fft, mid_side=False, mid_side_b2=False, reverse=False):
+    # center=True with an even n_fft gives 1 + n // hop_length frames
+    spec = np.empty(
+        (2, n_fft // 2 + 1, 1 + wave.shape[1] // hop_length), dtype=np.complex64, order="F"
+    )
+    pair = _stereo_pair(wave, mid_side, mid_side_b2, reverse)
+    return spec, [_submit_stft(spec, c, pair[c], n_fft, hop_length) for c in range(2)]
+
+
+def _submit_stereo_istft(spec, hop_length):
+    return [
+        _pool().submit(librosa.istft, np.asfortranarray(spec[c]), hop_length=hop_length)
+        for c in range(2)
+    ]
+
+
+def resample_mt(wave, orig_sr, target_sr, res_type):
+    """librosa.resample of a (2, n) wave with both channels resampled in parallel"""
+    futures = [
+        _pool().submit(librosa.resample, wave[c], orig_sr=orig_sr, target_sr=target_sr, res_type=res_type)
+        for c in range(wave.shape[0])
+    ]
+    first = futures[0].result()
+    out = np.empty((len(futures), len(first)), dtype=first.dtype, order="F")
+    out[0] = first
+    for c in range(1, len(futures)):
+        out[c] = futures[c].result()
+    return out
 
 
 def crop_center(h1, h2):
@@ -54,36 +128,39 @@ def wave_to_spectrogram(
 def wave_to_spectrogram_mt(
     wave, hop_length, n_fft, mid_side=False, mid_side_b2=False, reverse=False
 ):
-    import threading
+    spec, futures = _submit_stereo_stft(wave, hop_length, n_fft, mid_side, mid_side_b2, reverse)
+    for future in futures:
+        future.result()
 
-    if reverse:
-        wave_left = np.flip(np.asfortranarray(wave[0]))
-        wave_right = np.flip(np.asfortranarray(wave[1]))
-    elif mid_side:
-        wave_left = np.asfortranarray(np.add(wave[0], wave[1]) / 2)
-        wave_right = np.asfortranarray(np.subtract(wave[0], wave[1]))
-    elif mid_side_b2:
-        wave_left = np.asfortranarray(np.add(wave[1], wave[0] * 0.5))
-        wave_right = np.asfortranarray(np.subtract(wave[0], wave[1] * 0.5))
-    else:
-        wave_left = np.asfortranarray(wave[0])
-        wave_right = np.asfortranarray(wave[1])
+    return spec
 
-    def run_thread(**kwargs):
-        global spec_left
-        spec_left = librosa.stft(**kwargs)
 
-    thread = threading.Thread(
-        target=run_thread,
-        kwargs={"y": wave_left, "n_fft": n_fft, "hop_length": hop_length},
-    )
-    thread.start()
-    spec_right = librosa.stft(wave_right, n_fft=n_fft, hop_length=hop_length)
-    thread.join()
+def wave_to_spectrogram_bands(wave, mp):
+    """Spectrograms of every band of `mp` from the (2, n) wave of the highest band.
 
-    spec = np.asfortranarray([spec_left, spec_right])
+    The resampling chain down the bands is sequential, but each band's STFTs start in the
+    pool as soon as its wave exists, so they overlap with the next resample.
+    """
+    bands_n = len(mp.param["band"])
+    specs, futures = {}, []
+    for d in range(bands_n, 0, -1):
+        bp = mp.param["band"][d]
+        if d < bands_n:
+            wave = resample_mt(
+                wave,
+                orig_sr=mp.param["band"][d + 1]["sr"],
+                target_sr=bp["sr"],
+                res_type=bp["res_type"],
+            )
+        specs[d], band_futures = _submit_stereo_stft(
+            wave, bp["hl"], bp["n_fft"],
+            mp.param["mid_side"], mp.param["mid_side_b2"], mp.param["reverse"],
+        )
+        futures += band_futures
+    for future in futures:
+        future.result()
 
-    return spec
+    return specs
 
 
 def combine_spectrograms(specs, mp):
@@ -317,37 +394,9 @@ def spectrogram_to_wave(spec, hop_length, mid_side, mid_side_b2, reverse):
 
 
 def spectrogram_to_wave_mt(spec, hop_length, mid_side, reverse, mid_side_b2):
-    import threading
-
-    spec_left = np.asfortranarray(spec[0])
-    spec_right = np.asfortranarray(spec[1])
+    wave_left, wave_right = (f.result() for f in _submit_stereo_istft(spec, hop_length))
 
-    def run_thread(**kwargs):
-        global wave_left
-        wave_left = librosa.istft(**kwargs)
-
-    thread = threading.Thread(
-        target=run_thread, kwargs={"stft_matrix": spec_left, "hop_length": hop_length}
-    )
-    thread.start()
-    wave_right = librosa.istft(spec_right, hop_length=hop_length)
-    thread.join()
-
-    if reverse:
-        return np.asfortranarray([np.flip(wave_left), np.flip(wave_right)])
-    elif mid_side:
-        return np.asfortranarray(
-            [np.add(wave_left, wave_right / 2), np.subtract(wave_left, wave_right / 2)]
-        )
-    elif mid_side_b2:
-        return np.asfortranarray(
-            [
-                np.add(wave_right / 1.25, 0.4 * wave_left),
-                np.subtract(wave_left / 1.25, 0.4 * wave_right),
-            ]
-        )
-    else:
-        return np.asfortranarray([wave_left, wave_right])
+    return _merge_pair(wave_left, wave_right, mid_side, mid_side_b2, reverse)
 
 
 def cmb_spectrogram_to_wave(spec_m, mp, extra_bins_h=None, extra_bins=None):
@@ -365,7 +414,7 @@ def cmb_spectrogram_to_wave(spec_m, mp, extra_bins_h=None, extra_bins=None):
 
     for d in range(1, bands_n + 1):
         bp = mp.param["band"][d]
-        spec_s = np.ndarray(
+        spec_s = np.zeros(
             shape=(2, bp["n_fft"] // 2 + 1, spec_m.shape[2]), dtype=complex
         )
         h = bp["crop_stop"] - bp["crop_start"]
@@ -436,6 +485,65 @@ def cmb_spectrogram_to_wave(spec_m, mp, extra_bins_h=None, extra_bins=None):
     return wave.T
 
 
+def _band_spectrogram(spec_m, mp, d, offset, extra_bins_h=None, extra_bins=None):
+    """Band `d` of a combined spectrogram, filtered the same way as in `cmb_spectrogram_to_wave`"""
+    bands_n = len(mp.param["band"])
+    bp = mp.param["band"][d]
+    spec_s = np.zeros(shape=(2, bp["n_fft"] // 2 + 1, spec_m.shape[2]), dtype=complex)
+    h = bp["crop_stop"] - bp["crop_start"]
+    spec_s[:, bp["crop_start"] : bp["crop_stop"], :] = spec_m[:, offset : offset + h, :]
+
+    if d == bands_n:  # higher
+        if extra_bins_h:  # if --high_end_process bypass
+            max_bin = bp["n_fft"] // 2
+            spec_s[:, max_bin - extra_bins_h : max_bin, :] = extra_bins[:, :extra_bins_h, :]
+        if bp["hpf_start"] > 0:
+            spec_s = fft_hp_filter(spec_s, bp["hpf_start"], bp["hpf_stop"] - 1)
+    elif d == 1:  # lower
+        spec_s = fft_lp_filter(spec_s, bp["lpf_start"], bp["lpf_stop"])
+    else:  # mid
+        spec_s = fft_hp_filter(spec_s, bp["hpf_start"], bp["hpf_stop"] - 1)
+        spec_s = fft_lp_filter(spec_s, bp["lpf_start"], bp["lpf_stop"])
+    return spec_s, offset + h
+
+
+def cmb_spectrogram_to_wave_mt(spec_m, mp, extra_bins_h=None, extra_bins=None):
+    """Parallel `cmb_spectrogram_to_wave`: the iSTFTs of all bands and channels run at once in
+    the shared pool, then the band waves are summed up the resampling chain as before."""
+    spec_m = np.where(np.isnan(spec_m), 0, spec_m)
+    if extra_bins is not None:
+        extra_bins = np.where(np.isnan(extra_bins), 0, extra_bins)
+
+    bands_n = len(mp.param["band"])
+    offset = 0
+    futures = {}
+    for d in range(1, bands_n + 1):
+        spec_s, offset = _band_spectrogram(spec_m, mp, d, offset, extra_bins_h, extra_bins)
+        futures[d] = _submit_stereo_istft(spec_s, mp.param["band"][d]["hl"])
+
+    def band_wave(d):
+        wave_left, wave_right = (f.result() for f in futures[d])
+        return _merge_pair(
+            wave_left, wave_right, mp.param["mid_side"], mp.param["mid_side_b2"], mp.param["reverse"]
+        )
+
+    wave = band_wave(1)
+    for d in range(1, bands_n):
+        bp = mp.param["band"][d]
+        if d > 1:  # mid
+            wave = np.add(wave, band_wave(d))
+        wave = resample_mt(
+            wave,
+            orig_sr=bp["sr"],
+            target_sr=mp.param["band"][d + 1]["sr"],
+            res_type="sinc_fastest" if d == 1 else "scipy",
+        )
+    if bands_n > 1:
+        wave = np.add(wave, band_wave(bands_n))
+
+    return wave.T
+
+
 def fft_lp_filter(spec, bin_start, bin_stop):
     g = 1.0
     for b in range(bin_start, bin_stop):
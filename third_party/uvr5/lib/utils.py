@@ -31,28 +31,39 @@ def inference(X_spec, device, model, aggressiveness, data):
         X_mag_pad, roi_size, n_window, device, model, aggressiveness, is_half=True
     ):
         model.eval()
+        # Stack `batch_size` windows per forward pass; the windows go through one reused
+        # (pinned on CUDA) buffer and predictions land in a preallocated array.
+        batch_size = max(1, int(data.get("batch_size", 1)))
+        window_size = data["window_size"]
+        on_cuda = torch.device(device).type == "cuda"
         with torch.no_grad():
-            preds = []
-
-            iterations = [n_window]
-
-            total_iterations = sum(iterations)
-            for i in tqdm(range(n_window)):
-                start = i * roi_size
-                X_mag_window = X_mag_pad[
-                    None, :, :, start : start + data["window_size"]
-                ]
-                X_mag_window = torch.from_numpy(X_mag_window)
-                if is_half:
-                    X_mag_window = X_mag_window.half()
-                X_mag_window = X_mag_window.to(device)
-
-                pred = model.predict(X_mag_window, aggressiveness)
-
-                pred = pred.detach().cpu().numpy()
-                preds.append(pred[0])
-
-            pred = np.concatenate(preds, axis=2)
+            buffer = torch.empty(
+                (batch_size,) + X_mag_pad.shape[:2] + (window_size,),
+                dtype=torch.float16 if is_half else torch.float32,
+                pin_memory=on_cuda,
+            )
+            pred = None
+            for first in tqdm(range(0, n_window, batch_size)):
+                n = min(batch_size, n_window - first)
+                for k in range(n):
+                    start = (first + k) * roi_size
+                    buffer[k].copy_(
+                        torch.from_numpy(X_mag_pad[:, :, start : start + window_size])
+                    )
+                X_mag_window = buffer[:n].to(device, non_blocking=on_cuda)
+
+                batch_pred = model.predict(X_mag_window, aggressiveness)
+
+                batch_pred = batch_pred.detach().cpu().numpy()
+                if pred is None:
+                    pred = np.empty(
+                        batch_pred.shape[1:3] + (n_window * roi_size,),
+                        dtype=batch_pred.dtype,
+                    )
+                # (n, C, bins, roi) -> windows side by side along the time axis
+                pred[:, :, first * roi_size : (first + n) * roi_size] = (
+                    batch_pred.transpose(1, 2, 0, 3).reshape(pred.shape[0], pred.shape[1], -1)
+                )
         return pred
 
     def preprocess(X_spec):
@@ -72,10 +83,9 @@ def inference(X_spec, device, model, aggressiveness, data):
 
     X_mag_pad = np.pad(X_mag_pre, ((0, 0), (0, 0), (pad_l, pad_r)), mode="constant")
 
-    if list(model.state_dict().values())[0].dtype == torch.float16:
-        is_half = True
-    else:
-        is_half = False
+    is_half = getattr(model, "is_half", None)  # set by non-torch backends, see vr_onnx
+    if is_half is None:
+        is_half = list(model.state_dict().values())[0].dtype == torch.float16
     pred = _execute(
         X_mag_pad, roi_size, n_window, device, model, aggressiveness, is_half
     )
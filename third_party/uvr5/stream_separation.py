@@ -0,0 +1,215 @@
+import os
+import sys
+import time
+import queue
+import threading
+import librosa
+import numpy as np
+import soundfile as sf
+
+_DONE = object()
+SAMPLE_BYTES = {"PCM_S8": 1, "PCM_U8": 1, "PCM_16": 2, "PCM_24": 3, "PCM_32": 4, "FLOAT": 4, "DOUBLE": 8}
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process, None where the resource module is missing (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def fit_length(wave, length):
+    """Trim or zero-pad a (channels, n) wave to exactly `length` samples"""
+    if wave.shape[1] >= length:
+        return wave[:, :length]
+    return np.pad(wave, ((0, 0), (0, length - wave.shape[1])))
+
+
+def iter_windows(music_file, target_sr, res_type, window_seconds, overlap_seconds, stats=None):
+    """Read the source in overlapping windows, only one window in memory at a time.
+
+    Yields (start, end, wave) where start/end are source frames and wave is a stereo
+    float32 (2, n) array resampled to `target_sr`. Consecutive windows share
+    `overlap_seconds` of audio. Bytes read are added to `stats["bytes_read"]`.
+    """
+    stats = {} if stats is None else stats
+    with sf.SoundFile(music_file) as f:
+        src_sr, total = f.samplerate, f.frames
+        frame_bytes = f.channels * SAMPLE_BYTES.get(f.subtype, 2)
+        window = int(window_seconds * src_sr)
+        overlap = int(overlap_seconds * src_sr)
+        start = 0
+        while start < total:
+            end = min(start + window + overlap, total)
+            f.seek(start)
+            data = f.read(end - start, dtype="float32", always_2d=True).T
+            stats["bytes_read"] = stats.get("bytes_read", 0) + (end - start) * frame_bytes
+            if data.shape[0] == 1:
+                data = np.repeat(data, 2, axis=0)
+            data = data[:2]
+            if src_sr != target_sr:
+                data = librosa.resample(data, orig_sr=src_sr, target_sr=target_sr, res_type=res_type)
+            yield start, end, np.asfortranarray(data)
+            if end == total:
+                break
+            start += window
+
+
+class CrossfadeWriter:
+    """Write overlapping chunks to a wav file, linearly crossfading where they overlap.
+
+    Chunks are placed at absolute sample offsets and must arrive in order. Only the last
+    `overlap` samples stay in memory, everything before them is final and goes to disk.
+    """
+
+    def __init__(self, path, samplerate, channels, overlap, subtype="PCM_16"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = sf.SoundFile(path, "w", samplerate=samplerate, channels=channels, subtype=subtype)
+        self.overlap = overlap
+        self.bytes_per_frame = channels * SAMPLE_BYTES.get(subtype, 2)
+        self.bytes_written = 0
+        self.pending = np.zeros((channels, 0), dtype=np.float32)
+        self.pos = 0  # absolute offset of pending[:, 0]
+
+    def write(self, chunk, offset):
+        shared = max(0, min(self.pos + self.pending.shape[1] - offset, chunk.shape[1], self.pending.shape[1]))
+        head = self.pending[:, : self.pending.shape[1] - shared]
+        self._flush(head)
+        if shared > 0:
+            fade = np.linspace(0.0, 1.0, shared, dtype=np.float32)
+            chunk = chunk.copy()
+            chunk[:, :shared] = self.pending[:, -shared:] * (1.0 - fade) + chunk[:, :shared] * fade
+        keep = min(self.overlap, chunk.shape[1])
+        self._flush(chunk[:, : chunk.shape[1] - keep])
+        self.pending = chunk[:, chunk.shape[1] - keep :]
+
+    def _flush(self, data):
+        if data.shape[1]:
+            self.file.write(np.clip(data.T, -1.0, 1.0))
+            self.pos += data.shape[1]
+            self.bytes_written += data.shape[1] * self.bytes_per_frame
+
+    def close(self):
+        self._flush(self.pending)
+        self.pending = self.pending[:, :0]
+        self.file.close()
+
+
+def _produce(items, q_out, name, timings, errors):
+    it = iter(items)
+    try:
+        while not errors:
+            t = time.perf_counter()
+            try:
+                meta, value = next(it)
+            except StopIteration:
+                break
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - t
+            q_out.put((meta, value))
+    except BaseException as e:
+        errors.append(e)
+    finally:
+        q_out.put(_DONE)
+
+
+def _consume(fn, q_in, q_out, name, timings, errors):
+    while True:
+        item = q_in.get()
+        if item is _DONE:
+            q_out.put(_DONE)
+            return
+        if errors:
+            continue  # keep draining so upstream threads never block
+        meta, value = item
+        try:
+            t = time.perf_counter()
+            value = fn(value)
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - t
+            q_out.put((meta, value))
+        except BaseException as e:
+            errors.append(e)
+
+
+def run_pipeline(items, stages, timings=None, queue_size=2):
+    """Producer/consumer pipeline: `items` yields (meta, value), every (name, fn) stage runs
+    in its own thread and maps value -> value. Yields (meta, value) from the last stage.
+
+    Bounded queues keep at most `queue_size` items waiting between two stages, so stage N+1
+    works on window k while stage N is already busy with window k+1.
+    """
+    timings = {} if timings is None else timings
+    errors = []
+    q = queue.Queue(maxsize=queue_size)
+    threads = [threading.Thread(target=_produce, args=(items, q, "read", timings, errors), daemon=True)]
+    for name, fn in stages:
+        q_next = queue.Queue(maxsize=queue_size)
+        threads.append(threading.Thread(target=_consume, args=(fn, q, q_next, name, timings, errors), daemon=True))
+        q = q_next
+    for thread in threads:
+        thread.start()
+    item = None
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                break
+            if not errors:
+                yield item
+    finally:
+        if item is not _DONE:
+            errors.append(GeneratorExit())  # the caller stopped early, tell the reader to stop
+            while item is not _DONE:
+                item = q.get()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+
+def stream_separate(music_file, stages, output_files, model_sr, res_type, output_sr,
+                    window_seconds=60, overlap_seconds=3, on_window=None, timings=None,
+                    channels=2, stats=None):
+    """Run `stages` over overlapping windows of `music_file` and stream the result to disk.
+
+    `stages` is a list of (name, fn). The first fn takes a (2, n) float32 wave at `model_sr`,
+    each next one takes the previous result, and the last returns one wave per entry of
+    `output_files`. Stages run concurrently on consecutive windows, see `run_pipeline`.
+    Each output is downmixed to `channels`, resampled to `output_sr` and crossfaded over the
+    overlap straight into 16-bit files, so peak memory depends on the window size and not on
+    the length of the input, and nothing else touches the disk.
+    Seconds spent per stage (plus "read" and "write") are accumulated into `timings`; bytes
+    read/written and the peak RSS go into `stats`.
+    """
+    timings = {} if timings is None else timings
+    stats = {} if stats is None else stats
+    src_sr = sf.info(music_file).samplerate
+    overlap_out = int(round(overlap_seconds * output_sr))
+    windows = (
+        ((start, end, wave.shape[1]), wave)
+        for start, end, wave in iter_windows(music_file, model_sr, res_type, window_seconds, overlap_seconds, stats)
+    )
+    writers = [CrossfadeWriter(path, output_sr, channels, overlap_out) for path in output_files]
+    try:
+        for (start, end, length), outputs in run_pipeline(windows, stages, timings):
+            t = time.perf_counter()
+            out_start = int(round(start * output_sr / src_sr))
+            out_len = int(round(end * output_sr / src_sr)) - out_start
+            for writer, out in zip(writers, outputs):
+                out = fit_length(np.asarray(out, dtype=np.float32), length)
+                if channels == 1:
+                    out = out.mean(axis=0, keepdims=True)
+                if model_sr != output_sr:
+                    out = librosa.resample(out, orig_sr=model_sr, target_sr=output_sr)
+                writer.write(fit_length(out, out_len), out_start)
+            timings["write"] = timings.get("write", 0.0) + time.perf_counter() - t
+            if on_window is not None:
+                on_window(start, end, src_sr)
+    finally:
+        for writer in writers:
+            writer.close()
+    stats["bytes_written"] = stats.get("bytes_written", 0) + sum(w.bytes_written for w in writers)
+    stats["peak_rss_mb"] = peak_rss_mb()
+    return timings
@@ -1,107 +1,162 @@
 import os
 import sys
+import json
+import time
+import numpy as np
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from third_party.uvr5.vr import AudioPre, AudioPreDeEcho
+from third_party.uvr5.stream_separation import stream_separate
+from third_party.uvr5.music_detector import analyze
 import torch
-import gc
+import soundfile as sf
 from rich.console import Console
 from rich.panel import Panel
-from pydub import AudioSegment
+from rich.table import Table
 from core.config_utils import load_key
+from core.telemetry import traced
 
 console = Console()
 
-def process_segment(segment_file, save_dir, device, model_dir, segment_index):
-    console.print(Panel(f"[bold blue]Processing segment {segment_index}: {os.path.basename(segment_file)}[/bold blue]"))
-    
-    # Step 1: Vocal separation
-    console.print("[cyan]Starting vocal separation...[/cyan]")
-    ap = AudioPre(agg=10, model_path=os.path.join(model_dir, "uvr5_weights", "HP2_all_vocals.pth"), device=device, is_half=False)
-    ap._path_audio_(segment_file, save_dir, save_dir, format='wav')
-    
-    console.print("[cyan]Renaming files after vocal separation...[/cyan]")
-    vocal_step1 = os.path.join(save_dir, f'vocal_{os.path.basename(segment_file)}_10.wav')
-    instrument_step1 = os.path.join(save_dir, f'instrument_{os.path.basename(segment_file)}_10.wav')
-    os.rename(vocal_step1, os.path.join(save_dir, f'vocal_step1_{segment_index}.wav'))
-    os.rename(instrument_step1, os.path.join(save_dir, f'instrument_step1_{segment_index}.wav'))
-    
-    del ap
-    gc.collect()
-    torch.cuda.empty_cache()
-    
-    # Step 2: De-echo on the vocal from step 1
-    console.print("[cyan]Starting de-echo process...[/cyan]")
-    ap_deecho = AudioPreDeEcho(agg=10, model_path=os.path.join(model_dir, "uvr5_weights", "VR-DeEchoAggressive.pth"), device=device, is_half=False)
-    ap_deecho._path_audio_(os.path.join(save_dir, f'vocal_step1_{segment_index}.wav'), save_dir, save_dir, format='wav')
-    
-    vocal_step2 = os.path.join(save_dir, f'vocal_vocal_step1_{segment_index}.wav_10.wav')
-    instrument_step2 = os.path.join(save_dir, f'instrument_vocal_step1_{segment_index}.wav_10.wav')
-    os.rename(vocal_step2, os.path.join(save_dir, f'final_vocal_{segment_index}.wav'))
-    os.rename(instrument_step2, os.path.join(save_dir, f'echo_{segment_index}.wav'))
-    
-    del ap_deecho
-    gc.collect()
-    torch.cuda.empty_cache()
+OUTPUT_SR = 16000
+OUTPUT_CHANNELS = 2
+WINDOW_SECONDS = 60
+OVERLAP_SECONDS = 3
+BATCH_SIZE = 4
+DECISION_LOG = 'output/log/uvr5_decisions.json'
 
-def uvr5_for_videolingo(music_file, save_dir, background_file, original_vocal_file):
-    MODEL_DIR = load_key("model_dir")
+def get_device():
     if torch.backends.mps.is_available():
-        device = torch.device("mps")
-    elif torch.cuda.is_available():
-        device = torch.device("cuda")
-    else:
-        device = torch.device("cpu")
-    
-    console.print(Panel(f"[bold green]Starting UVR5 processing[/bold green]\nDevice: {device}"))
-    
-    # Load the full audio file
-    audio = AudioSegment.from_wav(music_file)
-    segment_duration = 10 * 60 * 1000  # 10 minutes in milliseconds
-
-    # Process audio in 10-minute segments
-    segment_count = 0
-    for start in range(0, len(audio), segment_duration):
-        end = min(start + segment_duration, len(audio))
-        segment = audio[start:end]
-        
-        # Process the segment
-        segment_file = os.path.join(save_dir, f"segment_{start//1000}_{end//1000}.wav")
-        segment.export(segment_file, format="wav")
-        
-        process_segment(segment_file, save_dir, device, MODEL_DIR, segment_count)
-        
-        # Clean up segment file
-        os.remove(segment_file)
-        segment_count += 1
-
-    # Combine all processed segments
-    final_vocal = AudioSegment.empty()
-    final_background = AudioSegment.empty()
-
-    for i in range(segment_count):
-        vocal = AudioSegment.from_wav(os.path.join(save_dir, f'final_vocal_{i}.wav'))
-        instrument = AudioSegment.from_wav(os.path.join(save_dir, f'instrument_step1_{i}.wav'))
-        echo = AudioSegment.from_wav(os.path.join(save_dir, f'echo_{i}.wav'))
-        
-        final_vocal += vocal
-        # Overlay echo on instrument instead of adding
-        background_segment = instrument.overlay(echo)
-        final_background += background_segment
-
-    # Export the final files with compression
-    export_params = {
-        "format": "wav",
-        "parameters": ["-acodec", "pcm_s16le", "-ar", "16000"]
-    }
-    final_vocal.export(original_vocal_file, **export_params)
-    final_background.export(background_file, **export_params)
-
-    # Clean up intermediate files
-    for i in range(segment_count):
-        os.remove(os.path.join(save_dir, f'vocal_step1_{i}.wav'))
-        os.remove(os.path.join(save_dir, f'instrument_step1_{i}.wav'))
-        os.remove(os.path.join(save_dir, f'final_vocal_{i}.wav'))
-        os.remove(os.path.join(save_dir, f'echo_{i}.wav'))
+        return torch.device("mps")
+    if torch.cuda.is_available():
+        return torch.device("cuda")
+    return torch.device("cpu")
+
+def get_batch_size(device):
+    """Windows per forward pass. Batching pays off on GPUs and multi-core BLAS, not on one or two cores"""
+    if device.type != "cpu" or (os.cpu_count() or 1) >= 4:
+        return BATCH_SIZE
+    return 1
+
+class SeparationPipeline:
+    """Vocal separation + de-echo with both nets loaded once.
+
+    The stage-1 vocal is handed to stage 2 in memory, and the two stages run in their own
+    threads on consecutive windows. Seconds spent per stage are collected in `timings`.
+    With `detect_music`, each window is first checked for background sound: speech-only
+    windows pass through untouched and quiet or noise-only ones skip the de-echo stage.
+    """
+
+    def __init__(self, model_dir, device=None, agg=10, batch_size=None, detect_music=None):
+        self.device = device or get_device()
+        self.detect_music = load_key("uvr5.detect_music") if detect_music is None else detect_music
+        self.decisions, self.windows = [], []
+        self.processed = {"separate": 0.0, "deecho": 0.0}  # seconds of audio each net actually ran on
+        if batch_size is None:
+            batch_size = get_batch_size(self.device)
+        start = time.perf_counter()
+        self.ap = AudioPre(agg=agg, model_path=os.path.join(model_dir, "uvr5_weights", "HP2_all_vocals.pth"), device=self.device, is_half=False, batch_size=batch_size)
+        self.ap_deecho = AudioPreDeEcho(agg=agg, model_path=os.path.join(model_dir, "uvr5_weights", "VR-DeEchoAggressive.pth"), device=self.device, is_half=False, batch_size=batch_size)
+        if self.device.type == "cpu" and load_key("uvr5.backend") == "onnx":
+            cache_dir = os.path.join(model_dir, "uvr5_onnx")
+            quantize = load_key("uvr5.quantize")
+            if not (self.ap.use_onnx(cache_dir, quantize) and self.ap_deecho.use_onnx(cache_dir, quantize)):
+                console.print("[yellow]ONNX backend unavailable, using torch for UVR5.[/yellow]")
+        self.timings = {"load": time.perf_counter() - start}
+
+    def detect(self, wave):
+        sr = self.ap.mp.param["sr"]
+        info = analyze(wave, sr) if self.detect_music else {"decision": "full"}
+        info["seconds"] = wave.shape[1] / sr
+        self.decisions.append(info)
+        return info, wave
+
+    def separate_vocals(self, detected):
+        info, wave = detected
+        if info["decision"] == "skip":
+            return info, np.zeros_like(wave), wave
+        self.processed["separate"] += info["seconds"]
+        instrument, vocal = self.ap.separate(wave)
+        return info, instrument, vocal
+
+    def deecho(self, stage1):
+        info, instrument, vocal = stage1
+        if info["decision"] != "full":
+            return vocal, instrument
+        self.processed["deecho"] += info["seconds"]
+        vocal, echo = self.ap_deecho.separate(vocal)
+        # Echo goes back into the background, like the previous overlay of the two files
+        return vocal, instrument + echo
+
+    def run(self, music_file, original_vocal_file, background_file):
+        top_band = self.ap.mp.param["band"][len(self.ap.mp.param["band"])]
+
+        def on_window(start, end, sr):
+            decision = self.decisions[len(self.windows)]
+            self.windows.append({"start": round(start / sr, 2), "end": round(end / sr, 2), **decision})
+            console.print(f"[cyan]Separated {start / sr:.0f}s - {end / sr:.0f}s ({decision['decision']})[/cyan]")
+
+        self.decisions, self.windows = [], []
+        self.processed = {"separate": 0.0, "deecho": 0.0}
+        self.io_stats = {}
+        start = time.perf_counter()
+        stream_separate(
+            music_file,
+            [("detect", self.detect), ("separate", self.separate_vocals), ("deecho", self.deecho)],
+            [original_vocal_file, background_file],
+            model_sr=self.ap.mp.param["sr"], res_type=top_band["res_type"], output_sr=OUTPUT_SR,
+            window_seconds=WINDOW_SECONDS, overlap_seconds=OVERLAP_SECONDS,
+            on_window=on_window, timings=self.timings, channels=OUTPUT_CHANNELS, stats=self.io_stats,
+        )
+        self.timings["total"] = time.perf_counter() - start
+        return self.timings
+
+    def summary(self):
+        """Decision counts and the net time saved by skipping, estimated from the measured cost per audio second"""
+        total = sum(w["seconds"] for w in self.windows)
+        counts = {}
+        for w in self.windows:
+            counts[w["decision"]] = counts.get(w["decision"], 0) + 1
+        saved = 0.0
+        for stage, processed in self.processed.items():
+            if processed > 0:
+                saved += (total - processed) * self.timings.get(stage, 0.0) / processed
+        return {"windows": counts, "audio_seconds": round(total, 2), "estimated_seconds_saved": round(saved, 2)}
+
+    def save_decisions(self, music_file, log_file=DECISION_LOG):
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        with open(log_file, 'w', encoding='utf-8') as f:
+            json.dump({"file": music_file, "summary": self.summary(), "windows": self.windows}, f, ensure_ascii=False, indent=4)
+
+    def print_timings(self, audio_seconds):
+        table = Table(title="UVR5 stage timings")
+        table.add_column("Stage")
+        table.add_column("Seconds", justify="right")
+        table.add_column("Per hour of audio", justify="right")
+        for stage, seconds in self.timings.items():
+            table.add_row(stage, f"{seconds:.2f}", f"{seconds * 3600 / max(audio_seconds, 1e-6):.1f}")
+        console.print(table)
+
+        per_hour = 3600 / max(audio_seconds, 1e-6)
+        read_mb = self.io_stats.get("bytes_read", 0) / (1 << 20)
+        written_mb = self.io_stats.get("bytes_written", 0) / (1 << 20)
+        peak = self.io_stats.get("peak_rss_mb")
+        console.print(
+            f"[cyan]Disk I/O: read {read_mb:.1f} MB ({read_mb * per_hour:.0f} MB/h of audio), "
+            f"written {written_mb:.1f} MB ({written_mb * per_hour:.0f} MB/h of audio), "
+            f"peak RSS {'n/a' if peak is None else f'{peak:.0f} MB'}[/cyan]"
+        )
+
+@traced("uvr5 separation")
+def uvr5_for_videolingo(music_file, save_dir, background_file, original_vocal_file):
+    pipeline = SeparationPipeline(load_key("model_dir"))
+    console.print(Panel(f"[bold green]Starting UVR5 processing[/bold green]\nDevice: {pipeline.device}"))
+
+    pipeline.run(music_file, original_vocal_file, background_file)
+    pipeline.print_timings(sf.info(music_file).duration)
+    if pipeline.detect_music:
+        pipeline.save_decisions(music_file)
+        summary = pipeline.summary()
+        console.print(f"[cyan]Music detection: {summary['windows']}, about {summary['estimated_seconds_saved']:.0f}s of separation skipped[/cyan]")
 
     console.print(Panel("[bold green]UVR5 processing completed successfully[/bold green]"))
 
@@ -111,4 +166,4 @@ if __name__ == '__main__':
         'output/audio',
         'output/audio/background.wav',
         'output/audio/original_vocal.wav'
-    )
\ No newline at end of file
+    )
@@ -1,4 +1,4 @@
-import os,sys
+import os,sys,subprocess
 parent_directory = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import logging,pdb
@@ -15,14 +15,129 @@ from lib.lib_v5.nets_new import CascadedNet
 from lib.utils import inference
 
 
-class AudioPre:
-    def __init__(self, agg, model_path, device, is_half, tta=False):
+def load_wave(music_file, mp):
+    """Decode a file to the stereo float32 wave of the highest band, the input of `_VRSeparator.separate`"""
+    bp = mp.param["band"][len(mp.param["band"])]
+    X_wave, _ = librosa.core.load(  # 理论上librosa读取可能对某些音频有bug，应该上ffmpeg读取，但是太麻烦了弃坑
+        music_file,
+        sr       = bp["sr"],
+        mono     = False,
+        dtype    = np.float32,
+        res_type = bp["res_type"],
+    )
+    if X_wave.ndim == 1:
+        X_wave = np.asfortranarray([X_wave, X_wave])
+    return X_wave
+
+
+def _to_int16(block):
+    return np.clip(block * 32768, -32768, 32767).astype(np.int16)
+
+
+def write_wave(path, wave, sr, block_size=1 << 18):
+    """Write a float (n, channels) wave as 16-bit PCM block by block, so there is never a
+    full-length int16 copy. wav/flac go through soundfile, other formats are piped into ffmpeg"""
+    channels = wave.shape[1] if wave.ndim > 1 else 1
+    if os.path.splitext(path)[1].lower() in (".wav", ".flac"):
+        with sf.SoundFile(path, "w", samplerate=sr, channels=channels, subtype="PCM_16") as f:
+            for start in range(0, len(wave), block_size):
+                f.write(_to_int16(wave[start : start + block_size]))
+        return
+    cmd = [
+        "ffmpeg", "-y", "-v", "error", "-f", "s16le", "-ar", str(sr), "-ac", str(channels),
+        "-i", "pipe:0", "-vn", "-q:a", "2", path,
+    ]
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    try:
+        for start in range(0, len(wave), block_size):
+            process.stdin.write(_to_int16(wave[start : start + block_size]).tobytes())
+    finally:
+        process.stdin.close()
+        process.wait()
+
+
+class _VRSeparator:
+    def _aggressiveness(self):
+        aggresive_set = float(self.data["agg"] / 100)
+        return {
+            "value": aggresive_set,
+            "split_bin": self.mp.param["band"][1]["crop_stop"],
+        }
+
+    def use_onnx(self, cache_dir, quantize=False, num_threads=None):
+        """Swap the torch net for an onnxruntime CPU session exported into `cache_dir`.
+        Keeps torch (and returns False) when onnxruntime is missing or the export fails"""
+        from vr_onnx import load_onnx_model
+
+        onnx_model = load_onnx_model(
+            self.model, self.model_path, cache_dir, self._aggressiveness(),
+            2, self.mp.param["bins"] + 1, self.data["window_size"], quantize, num_threads,
+        )
+        if onnx_model is None:
+            return False
+        self.model = onnx_model
+        return True
+
+    def _predict(self, X_wave):
+        X_spec_s = spec_utils.wave_to_spectrogram_bands(X_wave, self.mp)
+        input_high_end_h = input_high_end = None
+        if self.data["high_end_process"] != "none":
+            bp = self.mp.param["band"][len(self.mp.param["band"])]
+            input_high_end_h = (bp["n_fft"] // 2 - bp["crop_stop"]) + (
+                self.mp.param["pre_filter_stop"] - self.mp.param["pre_filter_start"]
+            )
+            input_high_end = X_spec_s[len(self.mp.param["band"])][
+                :, bp["n_fft"] // 2 - input_high_end_h : bp["n_fft"] // 2, :
+            ]
+
+        X_spec_m = spec_utils.combine_spectrograms(X_spec_s, self.mp)
+        with torch.no_grad():
+            pred, X_mag, X_phase = inference(
+                X_spec_m, self.device, self.model, self._aggressiveness(), self.data
+            )
+        # Postprocess
+        if self.data["postprocess"]:
+            pred_inv = np.clip(X_mag - pred, 0, np.inf)
+            pred = spec_utils.mask_silence(pred, pred_inv)
+        y_spec_m = pred * X_phase
+        v_spec_m = X_spec_m - y_spec_m
+        return y_spec_m, v_spec_m, input_high_end_h, input_high_end
+
+    def _to_wave(self, spec_m, input_high_end_h, input_high_end):
+        if self.data["high_end_process"].startswith("mirroring"):
+            input_high_end_ = spec_utils.mirroring(
+                self.data["high_end_process"], spec_m, input_high_end, self.mp
+            )
+            return spec_utils.cmb_spectrogram_to_wave_mt(
+                spec_m, self.mp, input_high_end_h, input_high_end_
+            )
+        return spec_utils.cmb_spectrogram_to_wave_mt(spec_m, self.mp)
+
+    def _save(self, wave, root, head, name, format):
+        os.makedirs(root, exist_ok=True)
+        path = os.path.join(root, head + "{}_{}.{}".format(name, self.data["agg"], format))
+        write_wave(path, wave, self.mp.param["sr"])
+
+    def separate(self, X_wave):
+        """In-memory separation of a (2, n) wave at `self.mp.param["sr"]`.
+        Returns (predicted, residual) waves: instrument/vocal for AudioPre, dry vocal/echo for AudioPreDeEcho"""
+        y_spec_m, v_spec_m, input_high_end_h, input_high_end = self._predict(X_wave)
+        # cmb_spectrogram_to_wave returns (n, 2) for soundfile, transpose back to (2, n)
+        return (
+            self._to_wave(y_spec_m, input_high_end_h, input_high_end).T,
+            self._to_wave(v_spec_m, input_high_end_h, input_high_end).T,
+        )
+
+
+class AudioPre(_VRSeparator):
+    def __init__(self, agg, model_path, device, is_half, tta=False, batch_size=1):
         self.model_path = model_path
         self.device = device
         self.data = {
             # Processing Options
             "postprocess": False,
             "tta": tta,
+            "batch_size": batch_size,
             # Constants
             "window_size": 512,
             "agg": agg,
@@ -47,165 +162,33 @@ class AudioPre:
         if ins_root is None and vocal_root is None:
             return "No save root."
         name = os.path.basename(music_file)
-        if ins_root is not None:
-            os.makedirs(ins_root, exist_ok=True)
-        if vocal_root is not None:
-            os.makedirs(vocal_root, exist_ok=True)
-        X_wave, y_wave, X_spec_s, y_spec_s = {}, {}, {}, {}
-        bands_n = len(self.mp.param["band"])
-        # print(bands_n)
-        for d in range(bands_n, 0, -1):
-            bp = self.mp.param["band"][d]
-            if d == bands_n:  # high-end band
-                (
-                    X_wave[d],
-                    _,
-                ) = librosa.core.load(  # 理论上librosa读取可能对某些音频有bug，应该上ffmpeg读取，但是太麻烦了弃坑
-                    music_file,
-                    sr       = bp["sr"],
-                    mono     = False,
-                    dtype    = np.float32,
-                    res_type = bp["res_type"],
-                )
-                if X_wave[d].ndim == 1:
-                    X_wave[d] = np.asfortranarray([X_wave[d], X_wave[d]])
-            else:  # lower bands
-                X_wave[d] = librosa.core.resample(
-                    X_wave[d + 1],
-                    orig_sr   = self.mp.param["band"][d + 1]["sr"],
-                    target_sr = bp["sr"],
-                    res_type  = bp["res_type"],
-                )
-            # Stft of wave source
-            X_spec_s[d] = spec_utils.wave_to_spectrogram_mt(
-                X_wave[d],
-                bp["hl"],
-                bp["n_fft"],
-                self.mp.param["mid_side"],
-                self.mp.param["mid_side_b2"],
-                self.mp.param["reverse"],
-            )
-            # pdb.set_trace()
-            if d == bands_n and self.data["high_end_process"] != "none":
-                input_high_end_h = (bp["n_fft"] // 2 - bp["crop_stop"]) + (
-                    self.mp.param["pre_filter_stop"] - self.mp.param["pre_filter_start"]
-                )
-                input_high_end = X_spec_s[d][
-                    :, bp["n_fft"] // 2 - input_high_end_h : bp["n_fft"] // 2, :
-                ]
-
-        X_spec_m = spec_utils.combine_spectrograms(X_spec_s, self.mp)
-        aggresive_set = float(self.data["agg"] / 100)
-        aggressiveness = {
-            "value": aggresive_set,
-            "split_bin": self.mp.param["band"][1]["crop_stop"],
-        }
-        with torch.no_grad():
-            pred, X_mag, X_phase = inference(
-                X_spec_m, self.device, self.model, aggressiveness, self.data
-            )
-        # Postprocess
-        if self.data["postprocess"]:
-            pred_inv = np.clip(X_mag - pred, 0, np.inf)
-            pred = spec_utils.mask_silence(pred, pred_inv)
-        y_spec_m = pred * X_phase
-        v_spec_m = X_spec_m - y_spec_m
+        X_wave = load_wave(music_file, self.mp)
+        y_spec_m, v_spec_m, input_high_end_h, input_high_end = self._predict(X_wave)
 
         if is_hp3 == True:
             ins_root,vocal_root = vocal_root,ins_root
 
         if ins_root is not None:
-            if self.data["high_end_process"].startswith("mirroring"):
-                input_high_end_ = spec_utils.mirroring(
-                    self.data["high_end_process"], y_spec_m, input_high_end, self.mp
-                )
-                wav_instrument = spec_utils.cmb_spectrogram_to_wave(
-                    y_spec_m, self.mp, input_high_end_h, input_high_end_
-                )
-            else:
-                wav_instrument = spec_utils.cmb_spectrogram_to_wave(y_spec_m, self.mp)
+            wav_instrument = self._to_wave(y_spec_m, input_high_end_h, input_high_end)
             logger.info("%s instruments done" % name)
-            if is_hp3 == True:
-                head = "vocal_"
-            else:
-                head = "instrument_"
-            if format in ["wav", "flac"]:
-                sf.write(
-                    os.path.join(
-                        ins_root,
-                        head + "{}_{}.{}".format(name, self.data["agg"], format),
-                    ),
-                    (np.array(wav_instrument) * 32768).astype("int16"),
-                    self.mp.param["sr"],
-                )  #
-            else:
-                path = os.path.join(
-                    ins_root, head + "{}_{}.wav".format(name, self.data["agg"])
-                )
-                sf.write(
-                    path,
-                    (np.array(wav_instrument) * 32768).astype("int16"),
-                    self.mp.param["sr"],
-                )
-                if os.path.exists(path):
-                    opt_format_path = path[:-4] + ".%s" % format
-                    os.system("ffmpeg -i %s -vn %s -q:a 2 -y" % (path, opt_format_path))
-                    if os.path.exists(opt_format_path):
-                        try:
-                            os.remove(path)
-                        except:
-                            pass
+            head = "vocal_" if is_hp3 == True else "instrument_"
+            self._save(wav_instrument, ins_root, head, name, format)
         if vocal_root is not None:
-            if is_hp3 == True:
-                head = "instrument_"
-            else:
-                head = "vocal_"
-            if self.data["high_end_process"].startswith("mirroring"):
-                input_high_end_ = spec_utils.mirroring(
-                    self.data["high_end_process"], v_spec_m, input_high_end, self.mp
-                )
-                wav_vocals = spec_utils.cmb_spectrogram_to_wave(
-                    v_spec_m, self.mp, input_high_end_h, input_high_end_
-                )
-            else:
-                wav_vocals = spec_utils.cmb_spectrogram_to_wave(v_spec_m, self.mp)
+            wav_vocals = self._to_wave(v_spec_m, input_high_end_h, input_high_end)
             logger.info("%s vocals done" % name)
-            if format in ["wav", "flac"]:
-                sf.write(
-                    os.path.join(
-                        vocal_root,
-                        head + "{}_{}.{}".format(name, self.data["agg"], format),
-                    ),
-                    (np.array(wav_vocals) * 32768).astype("int16"),
-                    self.mp.param["sr"],
-                )
-            else:
-                path = os.path.join(
-                    vocal_root, head + "{}_{}.wav".format(name, self.data["agg"])
-                )
-                sf.write(
-                    path,
-                    (np.array(wav_vocals) * 32768).astype("int16"),
-                    self.mp.param["sr"],
-                )
-                if os.path.exists(path):
-                    opt_format_path = path[:-4] + ".%s" % format
-                    os.system("ffmpeg -i %s -vn %s -q:a 2 -y" % (path, opt_format_path))
-                    if os.path.exists(opt_format_path):
-                        try:
-                            os.remove(path)
-                        except:
-                            pass
+            head = "instrument_" if is_hp3 == True else "vocal_"
+            self._save(wav_vocals, vocal_root, head, name, format)
 
 
-class AudioPreDeEcho:
-    def __init__(self, agg, model_path, device, is_half, tta=False):
+class AudioPreDeEcho(_VRSeparator):
+    def __init__(self, agg, model_path, device, is_half, tta=False, batch_size=1):
         self.model_path = model_path
         self.device = device
         self.data = {
             # Processing Options
             "postprocess": False,
             "tta": tta,
+            "batch_size": batch_size,
             # Constants
             "window_size": 512,
             "agg": agg,
@@ -231,141 +214,14 @@ class AudioPreDeEcho:
         if ins_root is None and vocal_root is None:
             return "No save root."
         name = os.path.basename(music_file)
-        if ins_root is not None:
-            os.makedirs(ins_root, exist_ok=True)
-        if vocal_root is not None:
-            os.makedirs(vocal_root, exist_ok=True)
-        X_wave, y_wave, X_spec_s, y_spec_s = {}, {}, {}, {}
-        bands_n = len(self.mp.param["band"])
-        # print(bands_n)
-        for d in range(bands_n, 0, -1):
-            bp = self.mp.param["band"][d]
-            if d == bands_n:  # high-end band
-                (
-                    X_wave[d],
-                    _,
-                ) = librosa.core.load(  # 理论上librosa读取可能对某些音频有bug，应该上ffmpeg读取，但是太麻烦了弃坑
-                    music_file,
-                    sr       = bp["sr"],
-                    mono     = False,
-                    dtype    = np.float32,
-                    res_type = bp["res_type"],
-                )
-                if X_wave[d].ndim == 1:
-                    X_wave[d] = np.asfortranarray([X_wave[d], X_wave[d]])
-            else:  # lower bands
-                X_wave[d] = librosa.core.resample(
-                    X_wave[d + 1],
-                    orig_sr   = self.mp.param["band"][d + 1]["sr"],
-                    target_sr = bp["sr"],
-                    res_type  = bp["res_type"],
-                )
-            # Stft of wave source
-            X_spec_s[d] = spec_utils.wave_to_spectrogram_mt(
-                X_wave[d],
-                bp["hl"],
-                bp["n_fft"],
-                self.mp.param["mid_side"],
-                self.mp.param["mid_side_b2"],
-                self.mp.param["reverse"],
-            )
-            # pdb.set_trace()
-            if d == bands_n and self.data["high_end_process"] != "none":
-                input_high_end_h = (bp["n_fft"] // 2 - bp["crop_stop"]) + (
-                    self.mp.param["pre_filter_stop"] - self.mp.param["pre_filter_start"]
-                )
-                input_high_end = X_spec_s[d][
-                    :, bp["n_fft"] // 2 - input_high_end_h : bp["n_fft"] // 2, :
-                ]
-
-        X_spec_m = spec_utils.combine_spectrograms(X_spec_s, self.mp)
-        aggresive_set = float(self.data["agg"] / 100)
-        aggressiveness = {
-            "value": aggresive_set,
-            "split_bin": self.mp.param["band"][1]["crop_stop"],
-        }
-        with torch.no_grad():
-            pred, X_mag, X_phase = inference(
-                X_spec_m, self.device, self.model, aggressiveness, self.data
-            )
-        # Postprocess
-        if self.data["postprocess"]:
-            pred_inv = np.clip(X_mag - pred, 0, np.inf)
-            pred = spec_utils.mask_silence(pred, pred_inv)
-        y_spec_m = pred * X_phase
-        v_spec_m = X_spec_m - y_spec_m
+        X_wave = load_wave(music_file, self.mp)
+        y_spec_m, v_spec_m, input_high_end_h, input_high_end = self._predict(X_wave)
 
         if ins_root is not None:
-            if self.data["high_end_process"].startswith("mirroring"):
-                input_high_end_ = spec_utils.mirroring(
-                    self.data["high_end_process"], y_spec_m, input_high_end, self.mp
-                )
-                wav_instrument = spec_utils.cmb_spectrogram_to_wave(
-                    y_spec_m, self.mp, input_high_end_h, input_high_end_
-                )
-            else:
-                wav_instrument = spec_utils.cmb_spectrogram_to_wave(y_spec_m, self.mp)
+            wav_instrument = self._to_wave(y_spec_m, input_high_end_h, input_high_end)
             logger.info("%s instruments done" % name)
-            if format in ["wav", "flac"]:
-                sf.write(
-                    os.path.join(
-                        ins_root,
-                        "vocal_{}_{}.{}".format(name, self.data["agg"], format),
-                    ),
-                    (np.array(wav_instrument) * 32768).astype("int16"),
-                    self.mp.param["sr"],
-                )  #
-            else:
-                path = os.path.join(
-                    ins_root, "vocal_{}_{}.wav".format(name, self.data["agg"])
-                )
-                sf.write(
-                    path,
-                    (np.array(wav_instrument) * 32768).astype("int16"),
-                    self.mp.param["sr"],
-                )
-                if os.path.exists(path):
-                    opt_format_path = path[:-4] + ".%s" % format
-                    os.system("ffmpeg -i %s -vn %s -q:a 2 -y" % (path, opt_format_path))
-                    if os.path.exists(opt_format_path):
-                        try:
-                            os.remove(path)
-                        except:
-                            pass
+            self._save(wav_instrument, ins_root, "vocal_", name, format)
         if vocal_root is not None:
-            if self.data["high_end_process"].startswith("mirroring"):
-                input_high_end_ = spec_utils.mirroring(
-                    self.data["high_end_process"], v_spec_m, input_high_end, self.mp
-                )
-                wav_vocals = spec_utils.cmb_spectrogram_to_wave(
-                    v_spec_m, self.mp, input_high_end_h, input_high_end_
-                )
-            else:
-                wav_vocals = spec_utils.cmb_spectrogram_to_wave(v_spec_m, self.mp)
+            wav_vocals = self._to_wave(v_spec_m, input_high_end_h, input_high_end)
             logger.info("%s vocals done" % name)
-            if format in ["wav", "flac"]:
-                sf.write(
-                    os.path.join(
-                        vocal_root,
-                        "instrument_{}_{}.{}".format(name, self.data["agg"], format),
-                    ),
-                    (np.array(wav_vocals) * 32768).astype("int16"),
-                    self.mp.param["sr"],
-                )
-            else:
-                path = os.path.join(
-                    vocal_root, "instrument_{}_{}.wav".format(name, self.data["agg"])
-                )
-                sf.write(
-                    path,
-                    (np.array(wav_vocals) * 32768).astype("int16"),
-                    self.mp.param["sr"],
-                )
-                if os.path.exists(path):
-                    opt_format_path = path[:-4] + ".%s" % format
-                    os.system("ffmpeg -i %s -vn %s -q:a 2 -y" % (path, opt_format_path))
-                    if os.path.exists(opt_format_path):
-                        try:
-                            os.remove(path)
-                        except:
-                            pass
+            self._save(wav_vocals, vocal_root, "instrument_", name, format)
@@ -0,0 +1,193 @@
+import os
+import copy
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+import numpy as np
+import torch
+
+OPSET = 17
+
+
+class _PredictWrapper(torch.nn.Module):
+    """`model.predict` with the aggressiveness baked in, so the exported graph takes only the magnitude"""
+
+    def __init__(self, model, aggressiveness):
+        super().__init__()
+        self.model = model
+        self.aggressiveness = aggressiveness
+
+    def forward(self, x):
+        return self.model.predict(x, self.aggressiveness)
+
+
+class _MeanOverHeight(torch.nn.Module):
+    """AdaptiveAvgPool2d((1, None)) as a plain mean, which exports with a dynamic batch axis"""
+
+    def forward(self, x):
+        return x.mean(dim=2, keepdim=True)
+
+
+def _exportable(model):
+    model = copy.deepcopy(model).float().cpu().eval().requires_grad_(False)
+    for module in model.modules():
+        for name, child in module.named_children():
+            if isinstance(child, torch.nn.AdaptiveAvgPool2d) and tuple(child.output_size) == (1, None):
+                setattr(module, name, _MeanOverHeight())
+    return model
+
+
+def onnx_cache_path(model_path, cache_dir, aggressiveness, quantize):
+    with open(model_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    suffix = "_int8" if quantize else ""
+    return os.path.join(
+        cache_dir, "%s_%s_agg%s%s.onnx" % (name, digest, aggressiveness["value"], suffix)
+    )
+
+
+def export_onnx(model, aggressiveness, in_channels, bins, window_size, onnx_path):
+    wrapper = _PredictWrapper(_exportable(model), aggressiveness)
+    dummy = torch.rand(1, in_channels, bins, window_size)
+    os.makedirs(os.path.dirname(onnx_path) or ".", exist_ok=True)
+    tmp_path = onnx_path + ".tmp"
+    # Tracing without autograd keeps the export's peak memory close to a normal forward pass
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            (dummy,),
+            tmp_path,
+            input_names=["x_mag"],
+            output_names=["pred"],
+            dynamic_axes={"x_mag": {0: "batch"}, "pred": {0: "batch"}},
+            opset_version=OPSET,
+            dynamo=False,
+        )
+    os.replace(tmp_path, onnx_path)
+
+
+def quantize_onnx(fp32_path, int8_path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp_path = int8_path + ".tmp"
+    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, int8_path)
+
+
+class OnnxVRModel:
+    """Drop-in for the torch VR nets in `lib.utils.inference`: same `offset` and `predict`,
+    running an exported graph on onnxruntime CPU threads."""
+
+    is_half = False
+
+    def __init__(self, onnx_path, offset, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or os.cpu_count() or 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            onnx_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.offset = offset
+        logger.info("ONNX load done: %s" % onnx_path)
+
+    def eval(self):
+        return self
+
+    def predict(self, x_mag, aggressiveness=None):
+        x = x_mag.detach().cpu().numpy().astype(np.float32, copy=False)
+        (pred,) = self.session.run(None, {"x_mag": x})
+        return torch.from_numpy(pred)
+
+
+def load_onnx_model(model, model_path, cache_dir, aggressiveness, in_channels, bins,
+                    window_size=512, quantize=False, num_threads=None):
+    """Export `model` once per weights file / aggressiveness into `cache_dir` and load it with
+    onnxruntime. Returns None when onnxruntime (or the export) is unavailable, so callers keep
+    the torch model."""
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        logger.warning("onnxruntime is not installed, using torch for %s" % model_path)
+        return None
+
+    fp32_path = onnx_cache_path(model_path, cache_dir, aggressiveness, False)
+    try:
+        if not os.path.exists(fp32_path):
+            export_onnx(model, aggressiveness, in_channels, bins, window_size, fp32_path)
+        onnx_path = fp32_path
+        if quantize:
+            onnx_path = onnx_cache_path(model_path, cache_dir, aggressiveness, True)
+            if not os.path.exists(onnx_path):
+                quantize_onnx(fp32_path, onnx_path)
+        return OnnxVRModel(onnx_path, model.offset, num_threads)
+    except Exception as e:
+        logger.warning("ONNX export of %s failed, using torch: %s" % (model_path, e))
+        return None
+
+
+if __name__ == "__main__":
+    # Parity and speed check on randomly initialised nets, no weights needed:
+    #   python third_party/uvr5/vr_onnx.py [--int8]
+    # Exits 1 if an ONNX output differs from torch by more than the tolerance.
+    import argparse
+    import sys
+    import tempfile
+    import time
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from lib.lib_v5 import nets_61968KB as Nets
+    from lib.lib_v5.nets_new import CascadedNet
+
+    parser = argparse.ArgumentParser(description="ONNX vs torch parity of the UVR5 VR nets")
+    parser.add_argument("--int8", action="store_true", help="also check the dynamic int8 models (slow, memory hungry)")
+    parser.add_argument("--atol", type=float, default=1e-5, help="max abs difference allowed for fp32")
+    parser.add_argument("--int8-atol", type=float, default=1e-3, help="max abs difference allowed for int8")
+    args = parser.parse_args()
+    # The quantizer logs every tensor it cannot handle on the root logger
+    logging.getLogger().setLevel(logging.ERROR)
+
+    torch.manual_seed(0)
+    bins = 672
+    aggressiveness = {"value": 0.1, "split_bin": 85}
+    x = torch.rand(1, 2, bins + 1, 512)
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, model in [
+            ("HP2", Nets.CascadedASPPNet(bins * 2)),
+            ("DeEcho", CascadedNet(bins * 2, 48)),
+        ]:
+            model.eval()
+            weights = os.path.join(tmp, name + ".pth")
+            torch.save(model.state_dict(), weights)
+            start = time.perf_counter()
+            with torch.no_grad():
+                ref = model.predict(x, aggressiveness).numpy()
+            torch_time = time.perf_counter() - start
+            for quantize in (False, True) if args.int8 else (False,):
+                label = "%s %s" % (name, "int8" if quantize else "fp32")
+                atol = args.int8_atol if quantize else args.atol
+                onnx_model = load_onnx_model(
+                    model, weights, tmp, aggressiveness, 2, bins + 1, quantize=quantize
+                )
+                if onnx_model is None:
+                    failures.append("%s: export failed" % label)
+                    continue
+                onnx_model.predict(x)  # warm up
+                start = time.perf_counter()
+                pred = onnx_model.predict(x).numpy()
+                elapsed = time.perf_counter() - start
+                diff = float(np.abs(pred - ref).max()) if pred.shape == ref.shape else float("inf")
+                ok = pred.shape == ref.shape and np.allclose(pred, ref, rtol=0, atol=atol)
+                print(
+                    "%-11s max abs diff %.2e (atol %.0e) %s | torch %.2fs onnx %.2fs"
+                    % (label, diff, atol, "ok" if ok else "MISMATCH", torch_time, elapsed)
+                )
+                if not ok:
+                    failures.append("%s: max abs diff %.2e > %.0e" % (label, diff, atol))
+    print("parity %s" % ("failed: " + "; ".join(failures) if failures else "ok"))
+    sys.exit(1 if failures else 0)